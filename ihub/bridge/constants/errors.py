@@ -21,7 +21,7 @@ class CannotStartOverOngoingDuty(Exception):
 class UnfinishedDutyError(Exception):
     def __init__(self, duty_end=None):
         duty_end = "|UNKNOWN TIME|" if not duty_end else "|{: %d %b %Y, %H:%M:%S}|".format(duty_end)
-        self.message = ("User's ongoing duty hasn't reach the duty end time but try to create new duty."
+        self.message = ("User's ongoing duty hasn't reach the duty end time %s but try to create new duty. "
             "Finish user's active duty first!" % duty_end)
         super().__init__(self.message)
 
@@ -30,3 +30,22 @@ class MaxDutyCountError(Exception):
     def __init__(self):
         self.message = "Maximum duty count handled by manager is reached. Cannot add more duty."
         super().__init__(self.message)
+
+
+class UserNotFoundError(Exception):
+    def __init__(self, matric=None):
+        self.message = "No user is registered with matric no. %s." % matric
+        super().__init__(self.message)
+
+
+class SelfDebtError(Exception):
+    def __init__(self):
+        self.message = ("Cannot specify yourself as in-debt friend. "
+            "Do you mistype friend matric no. with yours?")
+        super().__init__(self.message)
+
+
+class DuplicateAssignmentError(Exception):
+    def __init__(self, matric=None):
+        self.message = "User with matric no. %s is assigned more than once in the roster." % matric
+        super().__init__(self.message)
@@ -2,9 +2,12 @@ from functools import wraps
 from rest_framework.response import Response
 from rest_framework.views import status
 
+from bridge.tracing import span
+
 def manager_refresh(func):
     @wraps(func)
     def _func(self, *args, **kwargs):
-        self.refresh() # from BaseManager interface
+        with span('manager_refresh'):
+            self.refresh() # from BaseManager interface
         return func(self, *args, **kwargs)
     return _func
\ No newline at end of file
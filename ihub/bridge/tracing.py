@@ -0,0 +1,232 @@
+"""
+Module tracing.py
+
+Method level tracing: nested spans with wall time and SQL statement count,
+to tell where the time of a duty call goes.
+
+    @traced()
+    def start_duty(self, user, debtee=None): ...
+
+    with span('manager_refresh'):
+        ...
+
+The outermost span of a thread is the root of a trace. Whether a trace is
+recorded is drawn once at its root, with probability TRACE_SAMPLE_RATE (0,
+the default, turns tracing off), so a trace is always complete. Finished
+traces are queued to a writer thread appending them as JSON lines to
+TRACE_PATH (by default a file of the user in the temp directory); traced
+code never waits on the disk, traces beyond the queue size are dropped.
+Once the file reaches TRACE_MAX_BYTES it is moved to `<path>.1`, replacing
+the previous one. `manage.py trace_report` prints aggregates.
+
+SQL statements are counted on the default database connection of the thread.
+
+"""
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+DEFAULT_TRACE_PATH = os.path.join(tempfile.gettempdir(),
+    'ihub-traces-%d.jsonl' % (os.getuid() if hasattr(os, 'getuid') else 0))
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+QUEUE_SIZE = 10000
+
+_local = threading.local()
+
+
+def _count_query(execute, sql, params, many, context):
+    _local.queries += 1
+    return execute(sql, params, many, context)
+
+
+class span(object):
+    """Context manager timing a block as a span of the current trace.
+    """
+    __slots__ = ('name', 'node', 'start', 'queries')
+
+    def __init__(self, name):
+        self.name = name
+        self.node = None
+
+    def __enter__(self):
+        local = _local
+        depth = getattr(local, 'depth', 0)
+        if depth == 0:
+            rate = getattr(settings, 'TRACE_SAMPLE_RATE', 0)
+            local.stack = [] if rate and random.random() < rate else None
+            if local.stack is not None:
+                local.queries = 0
+                connection.execute_wrappers.append(_count_query)
+        local.depth = depth + 1
+        if local.stack is not None:
+            self.node = {'name': self.name}
+            self.queries = local.queries
+            self.start = time.perf_counter()
+            local.stack.append(self.node)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        local = _local
+        local.depth -= 1
+        node = self.node
+        if node is None:
+            return False
+        node['ms'] = (time.perf_counter() - self.start) * 1000
+        node['sql'] = local.queries - self.queries
+        if exc_type is not None:
+            node['error'] = exc_type.__name__
+        stack = local.stack
+        stack.pop()
+        if stack:
+            stack[-1].setdefault('children', []).append(node)
+        else:
+            connection.execute_wrappers.remove(_count_query)
+            local.stack = None
+            writer = get_trace_writer()
+            if writer is not None:
+                node['trace'] = uuid.uuid4().hex
+                node['ts'] = time.time()
+                writer.put(node)
+        return False
+
+
+def traced(name=None):
+    """Decorator running the function in a span, named after the function
+    qualified name (e.g. `DutyManager.start_duty`) by default.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def _func(*args, **kwargs):
+            # tracing off and no trace open: skip span bookkeeping
+            if not getattr(_local, 'depth', 0) and not getattr(settings, 'TRACE_SAMPLE_RATE', 0):
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return _func
+    return decorator
+
+
+class TraceWriter(object):
+    """Append traces to a JSON lines file from a daemon thread, moving a
+    full file aside first.
+    """
+    def __init__(self, path, maxsize=QUEUE_SIZE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, trace):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self.run, name='trace-writer', daemon=True)
+                    self._thread.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            # one write for everything queued meanwhile
+            traces = [self.queue.get()]
+            while True:
+                try:
+                    traces.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.rotate()
+                with open(self.path, 'a') as f:
+                    f.write(''.join(json.dumps(trace, separators=(',', ':')) + '\n' for trace in traces))
+            except OSError:
+                self.dropped += len(traces)
+            finally:
+                for _ in traces:
+                    self.queue.task_done()
+
+    def rotate(self):
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+        except FileNotFoundError:
+            pass
+
+    def flush(self):
+        """Wait until queued traces are written.
+        """
+        self.queue.join()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_trace_writer():
+    """Writer of the configured path, None when traces are not kept.
+    """
+    path = getattr(settings, 'TRACE_PATH', DEFAULT_TRACE_PATH)
+    if path is None:
+        return None
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = TraceWriter(path,
+                max_bytes=getattr(settings, 'TRACE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        return _writers[path]
+
+
+########################################
+# Reports
+########################################
+
+def read_traces(path):
+    """Traces of a JSON lines file, a line cut short by a crash is skipped.
+    """
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def aggregate(traces):
+    """Spans added up by call path, like the frames of a flame graph.
+
+    Returns:
+        dict: {(root name, ..., span name): [calls, total ms, self ms, SQL, self SQL, errors]}
+    """
+    paths = {}
+
+    def visit(node, parent):
+        path = parent + (node['name'], )
+        children = node.get('children', ())
+        row = paths.get(path)
+        if row is None:
+            row = paths[path] = [0, 0.0, 0.0, 0, 0, 0]
+        row[0] += 1
+        row[1] += node['ms']
+        row[2] += node['ms'] - sum(child['ms'] for child in children)
+        row[3] += node['sql']
+        row[4] += node['sql'] - sum(child['sql'] for child in children)
+        row[5] += 'error' in node
+        for child in children:
+            visit(child, path)
+
+    for trace in traces:
+        visit(trace, ())
+    return paths
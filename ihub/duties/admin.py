@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Duty, DutyManager
+from .models import (
+    ArchivedDuty, DebtBalance, Duty, DutyManager, DutySchedule, UserDutyStats
+)
 
 @admin.register(Duty)
 class DutyAdmin(admin.ModelAdmin):
@@ -8,7 +10,7 @@ class DutyAdmin(admin.ModelAdmin):
             'fields': ('__status__', 'last_active',)
         }),
         ('Duty Timeline', {
-            'fields': (('duty_start', 'duty_end'),
+            'fields': (('duty_start', 'duty_end'), 'schedule',
             )
         }),
         ('Tasks` Timeline', {
@@ -28,14 +30,50 @@ class DutyAdmin(admin.ModelAdmin):
     search_fields = ('duty_start', '__status__', 'user')
     ordering = ('duty_start', 'last_active')
     readonly_fields = [
-        '__status__', 'duty_start', 'duty_end',
+        '__status__', 'duty_start', 'duty_end', 'schedule',
         'task1_start', 'task1_end', 'task2_start', 'task2_end',
         'task3_start', 'task3_end',
     ]
 
+@admin.register(DutySchedule)
+class DutyScheduleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'duty_duration', 'task_window', 'task1_mark', 'task2_mark', 'task3_mark')
+
+    def get_readonly_fields(self, request, obj=None):
+        # editing would rewrite the task timeline of past duties
+        if obj is not None and obj.is_used():
+            return DutySchedule.TIMELINE_FIELDS
+        return super(DutyScheduleAdmin, self).get_readonly_fields(request, obj)
+
+@admin.register(ArchivedDuty)
+class ArchivedDutyAdmin(admin.ModelAdmin):
+    list_display = ('duty_id', 'duty_start', 'duty_end', 'user', 'debtee', 'archived_at')
+    list_filter = ('archived_at',)
+    date_hierarchy = 'duty_start'
+    raw_id_fields = ('user', 'debtee')
+    readonly_fields = [
+        'duty_id', 'schedule', 'duty_start', 'duty_end', 'last_active', 'archived_at',
+        'task1_start', 'task1_end', 'task2_start', 'task2_end',
+        'task3_start', 'task3_end',
+    ]
+
+@admin.register(UserDutyStats)
+class UserDutyStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'duty_count', 'hours_served', 'debts_owed')
+    search_fields = ('user__matric', 'user__email')
+    raw_id_fields = ('user',)
+
+@admin.register(DebtBalance)
+class DebtBalanceAdmin(admin.ModelAdmin):
+    list_display = ('debtor', 'creditor', 'amount')
+    search_fields = ('debtor__matric', 'creditor__matric')
+    raw_id_fields = ('debtor', 'creditor')
+
 class DutiesInline(admin.TabularInline):
     model = Duty
 
 @admin.register(DutyManager)
 class DutyManagerAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'capacity')
+    prepopulated_fields = {'slug': ('name',)}
     inlines = [DutiesInline, ]
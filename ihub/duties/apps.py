@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DutiesConfig(AppConfig):
     name = 'duties'
+
+    def ready(self):
+        # connect signal receivers
+        import duties.signals
@@ -0,0 +1,164 @@
+"""
+Module asgi.py
+
+ASGI application of the project. Django 2.2 views are synchronous, so:
+
+  * the duty event stream and long-polls of the duty details are served
+    natively on the event loop, an idle client costs a coroutine and a
+    queue rather than a thread;
+  * every other request, duty API included, runs the WSGI application on a
+    bounded thread pool (ASGI_THREADS), so database work (and a slow SQLite
+    lock) never blocks the event loop and never takes more threads than the
+    pool holds.
+
+Long-poll: `GET /duties/api/details/?wait=<seconds>` (or its v2 twin) answers
+once an event of the desk is published, or after `wait` seconds (at most
+LONGPOLL_TIMEOUT).
+
+"""
+import asyncio
+import json
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib import auth
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import Http404
+from django.urls import reverse
+
+from duties.conf import duty_settings
+from duties.events import get_broker
+from duties.routing import get_manager
+from users.authentication import get_authorization_key, get_token_user
+from utils.asgi import WsgiPool, build_environ, read_body, send_response
+
+
+def authorize(environ):
+    """Authenticated user and desk slug of a request, from its API token or
+    else its session.
+
+    Runs on the pool, it reads the session and the database.
+
+    Returns:
+        tuple: (status, desk slug), status is 200 when the request may go on
+    """
+    try:
+        request = WSGIRequest(environ)
+        key = get_authorization_key(environ.get('HTTP_AUTHORIZATION'))
+        if key is not None:
+            user = get_token_user(key)
+        else:
+            engine = import_module(settings.SESSION_ENGINE)
+            request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+            user = auth.get_user(request)
+        if user is None or not user.is_authenticated:
+            return 403, None
+        return 200, get_manager(request).slug
+    except Http404:
+        return 404, None
+    finally:
+        close_old_connections()
+
+
+class DutyASGIApplication(object):
+    """ASGI entry point wrapping the Django WSGI application.
+    """
+    def __init__(self, wsgi_application, max_workers=None):
+        self.pool = WsgiPool(wsgi_application, max_workers or duty_settings.ASGI_THREADS)
+        self.events_path = reverse('duties:duty-events')
+        self.details_paths = (reverse('duties:duty-details'), reverse('duties:duty-v2-details'))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError("Unsupported ASGI scope type '%s'" % scope['type'])
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        if scope['method'] == 'GET' and scope['path'] == self.events_path:
+            return await self.stream_events(scope, receive, send)
+        if scope['method'] == 'GET' and scope['path'] in self.details_paths and 'wait' in query:
+            return await self.long_poll(scope, receive, send)
+        return await self.pool(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.pool.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def subscribe(self, scope, receive, send):
+        """Authorize the request and subscribe it to its desk events.
+
+        Returns:
+            tuple: (environ, subscription), subscription is None when an
+                error response was sent
+        """
+        environ = build_environ(scope, await read_body(receive))
+        status, desk = await self.pool.run(authorize, environ)
+        if status != 200:
+            body = json.dumps({'success': False, 'message': "Request refused"}).encode()
+            await send_response(send, status, body)
+            return environ, None
+
+        last_event_id = environ.get('HTTP_LAST_EVENT_ID')
+        subscription = get_broker().subscribe_async(
+            asyncio.get_event_loop(), desk=desk,
+            last_event_id=int(last_event_id) if last_event_id and last_event_id.isdigit() else None,
+        )
+        return environ, subscription
+
+    async def stream_events(self, scope, receive, send):
+        environ, subscription = await self.subscribe(scope, receive, send)
+        if subscription is None:
+            return
+        heartbeat = duty_settings.EVENTS_HEARTBEAT
+        disconnect = asyncio.ensure_future(receive())
+        try:
+            await send({
+                'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')],
+            })
+            await send({'type': 'http.response.body',
+                'body': b"retry: %d\n\n" % (heartbeat * 1000), 'more_body': True})
+            while not subscription.dropped:
+                event = await subscription.get(heartbeat, disconnect)
+                if disconnect.done():
+                    break
+                data = event.encode() if event is not None else ": keep-alive\n\n"
+                await send({'type': 'http.response.body', 'body': data.encode(), 'more_body': True})
+            if not disconnect.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnect.cancel()
+            subscription.close()
+
+    async def long_poll(self, scope, receive, send):
+        environ, subscription = await self.subscribe(scope, receive, send)
+        if subscription is None:
+            return
+        try:
+            wait = float(parse_qs(environ['QUERY_STRING'])['wait'][0])
+        except ValueError:
+            wait = duty_settings.LONGPOLL_TIMEOUT
+        wait = max(0, min(wait, duty_settings.LONGPOLL_TIMEOUT))
+        disconnect = asyncio.ensure_future(receive())
+        try:
+            await subscription.get(wait, disconnect)
+        finally:
+            subscription.close()
+        if disconnect.done():
+            return
+        disconnect.cancel()
+
+        # answer with the regular details view, on the pool
+        environ['wsgi.input'].seek(0)
+        loop = asyncio.get_event_loop()
+        await self.pool.run(self.pool.respond, environ, send, loop)
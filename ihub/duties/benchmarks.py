@@ -0,0 +1,213 @@
+"""
+Module benchmarks.py
+
+Helpers shared by the benchmark management commands. Benchmarks are meant
+to run against a scratch database: seeding happens inside a transaction
+that the commands roll back once measurements are printed. Benchmarks
+serving real HTTP from several threads cannot roll back, they delete what
+they seeded instead.
+
+"""
+import asyncio
+import math
+import queue
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from duties.models import Duty
+from utils.random_supports import RandomSupport
+
+User = get_user_model()
+
+
+def seed_users(count):
+    """Bulk create users with unusable password (no hashing cost).
+
+    Args:
+        count (int): number of users to create
+
+    Returns:
+        list: the created users, with primary keys
+    """
+    users = []
+    for _ in range(count):
+        user = User(
+            email=RandomSupport.generate_email(),
+            matric=RandomSupport.generate_matric(new_ay=True),
+            name=RandomSupport.generate_name(),
+        )
+        user.set_unusable_password()
+        users.append(user)
+    User.objects.bulk_create(users)
+    # sqlite does not return primary keys from bulk_create
+    emails = [user.email for user in users]
+    return list(User.objects.filter(email__in=emails))
+
+
+def seed_finished_duties(count, users, batch_size=5000):
+    """Bulk create finished duties (detached from any manager) spread
+    backward in time, one duty slot per user per day.
+
+    Args:
+        count (int): number of duties to create
+        users (list): users owning the duties, round-robin
+        batch_size (int): rows per INSERT batch
+    """
+    now = timezone.now()
+    created = 0
+    while created < count:
+        batch = []
+        for idx in range(created, min(created + batch_size, count)):
+            duty = Duty(user=users[idx % len(users)])
+            duty.initialise_timings(now - timedelta(days=1 + idx // len(users)))
+            batch.append(duty)
+        Duty.objects.bulk_create(batch)
+        created += len(batch)
+
+
+def measure(func, *args, **kwargs):
+    """Run func once, capturing wall time and SQL statements.
+
+    Returns:
+        tuple: (result, elapsed seconds, captured queries)
+    """
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, ctx.captured_queries
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (pct within 0-100).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def explain(sql):
+    """Query plan of an already interpolated SELECT statement.
+
+    Returns:
+        list: plan lines as reported by the database
+    """
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        rows = cursor.fetchall()
+    # sqlite: (id, parent, notused, detail), others: (detail,)
+    return [row[-1] for row in rows]
+
+
+def table_bytes(table):
+    """On-disk size of table (without indexes), None when unknown.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s", [table])
+            except Exception:
+                return None # sqlite built without dbstat
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_table_size(%s)", [table])
+        else:
+            return None
+        return cursor.fetchone()[0]
+
+
+########################################
+# HTTP
+########################################
+
+def session_cookie(user):
+    """Cookie header value of a new logged in session of user.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return '%s=%s' % (settings.SESSION_COOKIE_NAME, session.session_key)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling requests on a fixed number of daemon threads,
+    like a threaded worker of a production WSGI server.
+    """
+    def __init__(self, address, application, threads):
+        super(PooledWSGIServer, self).__init__(address, _QuietHandler)
+        self.set_app(application)
+        self.requests = queue.Queue()
+        for _ in range(threads):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def process_request(self, request, client_address):
+        self.requests.put((request, client_address))
+
+    def work(self):
+        while True:
+            request, client_address = self.requests.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                pass
+            finally:
+                self.shutdown_request(request)
+
+
+async def http_request(port, path, headers=None, timeout=10, method='GET', body=b''):
+    """One HTTP/1.1 request to localhost, connection closed afterwards.
+
+    Returns:
+        tuple: (status code, response body bytes including any chunk framing)
+    """
+    async def exchange():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            lines = ['%s %s HTTP/1.1' % (method, path), 'Host: localhost', 'Connection: close',
+                'Content-Length: %d' % len(body)]
+            lines += ['%s: %s' % item for item in (headers or {}).items()]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split(b' ', 2)[1]), payload
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+async def open_stream(port, path, headers=None, timeout=10):
+    """Open a streamed GET and wait for its first body bytes.
+
+    Returns:
+        tuple: (reader, writer) of the open connection
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = ['GET %s HTTP/1.1' % path, 'Host: localhost', 'Accept: text/event-stream']
+    lines += ['%s: %s' % item for item in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    try:
+        await asyncio.wait_for(reader.readuntil(b'retry:'), timeout)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
@@ -0,0 +1,170 @@
+"""
+Module cache.py
+
+Per-process cache of the active duties of each manager, keyed by user id.
+
+The whole active set of a manager is loaded at once (it is bounded by the
+manager capacity), so a loaded cache answers both positive and negative
+lookups. Entries leave the cache exactly at their `duty_end`: a heap keeps
+the earliest expiry on top and is drained on every lookup. Any write to a
+Duty invalidates the caches through `post_save`/`post_delete` receivers
+(see duties/signals.py); bulk writes through DutyManager invalidate
+explicitly.
+
+Writes of other worker processes are only seen through a version token, the
+generation of the shared snapshot (SNAPSHOT_PATH). Without it, a loaded set
+is reused for ACTIVE_DUTIES_CACHE_TTL seconds at most, which bounds how
+long a duty started or finished by another worker goes unnoticed.
+
+Lookups hand out copies of the cached duties, callers may change them.
+
+"""
+import copy
+import heapq
+import threading
+import time
+
+from django.utils import timezone
+
+from duties.conf import duty_settings
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class ActiveDutyCache(object):
+    """Active duties of one manager, evicted at duty end.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._duties = None # {user_id: (duty, ...)}, None when not loaded
+        self._expiry = [] # heap of (duty_end, duty_id, user_id)
+        self._version = None
+        self._loaded_at = None # monotonic time of the load
+
+    ########################################
+    # Lookups
+    ########################################
+
+    def get_duties(self, user_id, loader, version=None):
+        """Active duties of user, loading the active set with loader on miss.
+
+        Args:
+            user_id (int): pk of the user
+            loader (callable): returns the iterable of active duties of the manager
+            version (callable): optional, returns a token that moves when the
+                active set was changed elsewhere
+
+        Returns:
+            tuple: active duties of the user, copies of the cached ones
+        """
+        return tuple(clone(duty) for duty in self._lookup(loader, version).get(user_id, tuple()))
+
+    def has_duties(self, user_id, loader, version=None):
+        """Whether user has an active duty, without copying any.
+        """
+        return user_id in self._lookup(loader, version)
+
+    def get_user_ids(self, loader, version=None):
+        """Ids of users having an active duty.
+        """
+        return list(self._lookup(loader, version))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+    ########################################
+    # Invalidation
+    ########################################
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._duties = None
+            self._expiry = []
+
+    ########################################
+    # Internals
+    ########################################
+
+    def _lookup(self, loader, version=None):
+        now = timezone.now()
+        current_version = version() if version is not None else None
+        ttl = duty_settings.ACTIVE_DUTIES_CACHE_TTL
+        with self._lock:
+            fresh = (current_version is not None or ttl is None
+                or (self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl))
+            if self._duties is not None and self._version == current_version and fresh:
+                self.hits += 1
+                self._evict(now)
+                return self._duties
+            self.misses += 1
+            generation = self._generation
+
+        # load outside the lock, drop it if invalidated meanwhile
+        loaded_at = time.monotonic()
+        duties = {}
+        expiry = []
+        for duty in loader():
+            duties[duty.user_id] = duties.get(duty.user_id, tuple()) + (duty,)
+            heapq.heappush(expiry, (duty.duty_end, duty.id, duty.user_id))
+
+        with self._lock:
+            if generation == self._generation:
+                self._duties, self._expiry = duties, expiry
+                self._version = current_version
+                self._loaded_at = loaded_at
+            self._evict_from(duties, expiry, now)
+        return duties
+
+    def _evict(self, now):
+        self._evict_from(self._duties, self._expiry, now)
+
+    @staticmethod
+    def _evict_from(duties, expiry, now):
+        # earliest-expiry first, stop at the first duty still ongoing
+        while expiry and expiry[0][0] <= now:
+            duty_end, duty_id, user_id = heapq.heappop(expiry)
+            remaining = tuple(duty for duty in duties.get(user_id, tuple()) if duty.id != duty_id)
+            if remaining:
+                duties[user_id] = remaining
+            else:
+                duties.pop(user_id, None)
+
+
+def clone(instance):
+    """Copy of a model instance and of its cached related instances.
+    """
+    copied = copy.copy(instance)
+    copied._state = copy.copy(instance._state)
+    copied._state.fields_cache = {
+        name: clone(related) if related is not None else None
+        for name, related in instance._state.fields_cache.items()
+    }
+    return copied
+
+
+def get_cache(manager_id):
+    """Process-wide cache of the manager with given pk.
+    """
+    with _caches_lock:
+        if manager_id not in _caches:
+            _caches[manager_id] = ActiveDutyCache()
+        return _caches[manager_id]
+
+
+def invalidate_caches():
+    """Invalidate the caches of every manager.
+    """
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
@@ -0,0 +1,58 @@
+"""
+Module conf.py
+
+Settings of the duties application, read from the `DUTIES` dictionary in
+project settings. Values are looked up on access, hence overriding settings
+in tests works without reloading anything.
+
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    # define active duties by `duty_end > now` at query time, so reads never write
+    'LAZY_EXPIRY': True,
+    # background sweep detaching finished duties from managers (seconds)
+    'SWEEP_INTERVAL': 60,
+    'SWEEP_DEBOUNCE': 5,
+    'SWEEP_BATCH_SIZE': 500,
+    # start the sweeper in serving processes (lazy expiry only), set False
+    # when `manage.py sweep_duties` runs apart
+    'SWEEP_AUTOSTART': True,
+    # per-process cache of active duties, see duties/cache.py
+    'CACHE_ACTIVE_DUTIES': True,
+    # without SNAPSHOT_PATH, seconds a loaded active set is reused before
+    # reloading it (writes of other workers are not seen meanwhile); None
+    # reuses it until invalidated, for single process deployments only
+    'ACTIVE_DUTIES_CACHE_TTL': 2,
+    # per-process memo of desk rows resolved by requests (seconds, 0 disables)
+    'MANAGER_CACHE_TTL': 5,
+    # per-process cache of duty schedules (seconds, 0 disables)
+    'SCHEDULE_CACHE_TTL': 60,
+    # memory-mapped snapshot shared by worker processes, see duties/snapshot.py
+    'SNAPSHOT_PATH': None,
+    'SNAPSHOT_CAPACITY': 256,
+    # most assignments accepted by one roster request
+    'ROSTER_MAX_SIZE': 500,
+    # server-sent duty events, see duties/events.py (seconds, except sizes)
+    'EVENTS_POLL_INTERVAL': 5,
+    'EVENTS_HEARTBEAT': 15,
+    'EVENTS_QUEUE_SIZE': 100,
+    'EVENTS_BACKLOG': 256,
+    # seconds between duty details revalidations of the duty page when it
+    # is served through WSGI, where it does not open the event stream
+    'DETAILS_POLL_INTERVAL': 15,
+    # ASGI entry point, see duties/asgi.py: threads running sync views and
+    # longest long-poll of the duty details (seconds)
+    'ASGI_THREADS': 8,
+    'LONGPOLL_TIMEOUT': 30,
+}
+
+
+class DutySettings(object):
+    def __getattr__(self, attr):
+        if attr not in DEFAULTS:
+            raise AttributeError("Invalid duties setting: '%s'" % attr)
+        return getattr(settings, 'DUTIES', {}).get(attr, DEFAULTS[attr])
+
+
+duty_settings = DutySettings()
@@ -0,0 +1,346 @@
+"""
+Module events.py
+
+In-process source of duty state change events, streamed to clients as
+Server-Sent Events. One producer thread per process watches the active
+duties of every desk and publishes to a broker, which fans events out to
+one bounded queue per connected client. Connected clients hence cost one
+producer, not one polling loop each.
+
+The producer polls the database (two queries) when woken by a local change,
+when the next task/duty boundary is due, or every EVENTS_POLL_INTERVAL
+seconds to pick up changes made by other processes. It only runs while
+someone is subscribed.
+
+Event ids come from a counter of the process. Replaying events after
+Last-Event-ID is hence only right when the client reconnects to the same
+process: behind several workers, a client should refetch the duty details
+on reconnection rather than rely on the replay.
+
+Events:
+    duty.started       a duty was admitted
+    task.opened        task N of a duty opened
+    task.closed        task N of a duty closed
+    duty.finished      a duty finished, on time or forced
+    manager.capacity   a desk capacity changed
+
+Every subscriber of a desk receives its events, so payloads name the duty
+and desk but never the user on duty: clients refetch their own duty
+details, which only ever show the requesting user's duties.
+
+"""
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import queue
+import threading
+
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from duties.conf import duty_settings
+
+logger = logging.getLogger(__name__)
+
+TASKS = (1, 2, 3)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class DutyEvent(collections.namedtuple('DutyEvent', 'id type desk data')):
+    """One event, `desk` is the slug of the desk it belongs to.
+    """
+    __slots__ = ()
+
+    def encode(self):
+        # wire format of text/event-stream
+        return "id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.type, json.dumps(self.data))
+
+
+class Subscription(object):
+    """Queue of events for one client, optionally restricted to one desk.
+
+    A client too slow to drain its queue is dropped rather than let the
+    queue grow, it reconnects and resumes with Last-Event-ID.
+    """
+    def __init__(self, broker, desk=None, maxsize=None):
+        self.broker = broker
+        self.desk = desk
+        self.queue = queue.Queue(maxsize or duty_settings.EVENTS_QUEUE_SIZE)
+        self.dropped = False
+
+    def put(self, event):
+        if self.desk is not None and event.desk != self.desk:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped = True
+
+    def get(self, timeout):
+        """Next event, None when nothing came within `timeout` seconds.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription consumed by a coroutine on `loop`, events are handed
+    over thread-safely from the producer.
+    """
+    def __init__(self, broker, loop, desk=None, maxsize=None):
+        super(AsyncSubscription, self).__init__(broker, desk=desk, maxsize=maxsize)
+        self.loop = loop
+        # created from a coroutine running on `loop`
+        self.queue = asyncio.Queue(maxsize or duty_settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        if self.desk is not None and event.desk != self.desk:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # loop closed
+            self.dropped = True
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+    async def get(self, timeout, cancel=None):
+        """Next event, None after `timeout` seconds or once `cancel` is done.
+        """
+        getter = asyncio.ensure_future(self.queue.get())
+        waiting = {getter} if cancel is None else {getter, cancel}
+        done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        return None
+
+
+class DutyEventBroker(object):
+    """Fan-out of produced events to subscriptions, with a short backlog
+    for clients resuming after a reconnect.
+
+    With `autostart` off the producer thread is never started and callers
+    drive `producer.poll()` themselves.
+    """
+    def __init__(self, backlog=None, autostart=True):
+        self.autostart = autostart
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._backlog = collections.deque(maxlen=backlog or duty_settings.EVENTS_BACKLOG)
+        self._ids = itertools.count(1)
+        self._producer = None if autostart else DutyEventProducer(self)
+
+    @property
+    def producer(self):
+        return self._producer
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, desk=None, last_event_id=None):
+        """Register a client, replaying backlog events after `last_event_id`.
+        """
+        return self._register(Subscription(self, desk=desk), last_event_id)
+
+    def subscribe_async(self, loop, desk=None, last_event_id=None):
+        """Same as `subscribe`, for a client served by a coroutine on `loop`.
+        """
+        return self._register(AsyncSubscription(self, loop, desk=desk), last_event_id)
+
+    def _register(self, subscription, last_event_id):
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._backlog:
+                    if event.id > last_event_id:
+                        subscription.put(event)
+            self._subscriptions.add(subscription)
+            if self.autostart:
+                self._start_producer()
+        self._producer.wake()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, type, desk, data):
+        with self._lock:
+            event = DutyEvent(next(self._ids), type, desk, data)
+            self._backlog.append(event)
+            for subscription in list(self._subscriptions):
+                subscription.put(event)
+                if subscription.dropped:
+                    self._subscriptions.discard(subscription)
+        return event
+
+    def wake(self):
+        """Ask the producer to look at the database now.
+        """
+        if self._producer is not None:
+            self._producer.wake()
+
+    def _start_producer(self):
+        if self._producer is None or not self._producer.is_alive():
+            self._producer = DutyEventProducer(self)
+            self._producer.start()
+
+
+class DutyEventProducer(threading.Thread):
+    """Daemon thread turning active duty state into events.
+    """
+    def __init__(self, broker, poll_interval=None):
+        super(DutyEventProducer, self).__init__(name='duty-events', daemon=True)
+        self.broker = broker
+        self.poll_interval = (poll_interval if poll_interval is not None
+            else duty_settings.EVENTS_POLL_INTERVAL)
+        self.duties = None
+        self.capacities = None
+        self.last_poll = None
+        self._wakeup = threading.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def run(self):
+        while True:
+            # idle while nobody listens, state is reloaded on resume
+            if not self.broker.subscriber_count:
+                self.duties = self.capacities = None
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception("Duty events poll failed")
+            finally:
+                close_old_connections()
+            self._wakeup.wait(self.next_timeout())
+            self._wakeup.clear()
+
+    def next_timeout(self):
+        # sleep until the next boundary of an active duty, at most poll_interval
+        now = timezone.now()
+        upcoming = [at for duty in (self.duties or {}).values()
+            for at in itertools.chain([duty['duty_end']], (b[0] for b in duty['boundaries']))
+            if at > now]
+        if not upcoming:
+            return self.poll_interval
+        return max(0, min(self.poll_interval, (min(upcoming) - now).total_seconds()))
+
+    def load(self):
+        """Active duties of every desk and desk capacities.
+        """
+        from duties.models import Duty, DutyManager, DutySchedule
+
+        now = timezone.now()
+        desks, capacities = {}, {}
+        for manager_id, slug, capacity in DutyManager.objects.values_list('id', 'slug', 'capacity'):
+            desks[manager_id] = slug
+            capacities[slug] = capacity
+
+        duties = {}
+        active_duties = (Duty.objects
+            .filter(manager__isnull=False, duty_end__gt=now)
+            .values_list('id', 'manager_id', 'schedule_id', 'duty_start', 'duty_end'))
+        for duty_id, manager_id, schedule_id, duty_start, duty_end in active_duties:
+            schedule = DutySchedule.lookup(schedule_id)
+            boundaries = []
+            for task in TASKS:
+                start, end = schedule.task_bounds(duty_start, duty_end, task)
+                boundaries.append((start, 'task.opened', task))
+                boundaries.append((end, 'task.closed', task))
+            duties[duty_id] = {
+                'duty': duty_id, 'desk': desks.get(manager_id),
+                'duty_start': duty_start, 'duty_end': duty_end,
+                'boundaries': boundaries,
+            }
+        return now, duties, capacities
+
+    def poll(self):
+        """Reload state and publish what changed since the previous poll.
+        """
+        now, duties, capacities = self.load()
+        previous, previous_capacities = self.duties, self.capacities
+        last_poll, self.last_poll = self.last_poll, now
+        self.duties, self.capacities = duties, capacities
+        if previous is None:
+            # first poll after (re)starting, nothing to compare with
+            return
+
+        events = []
+        for slug, capacity in capacities.items():
+            if slug in previous_capacities and previous_capacities[slug] != capacity:
+                events.append((now, 'manager.capacity', slug, {'capacity': capacity}))
+        for duty_id, duty in duties.items():
+            if duty_id not in previous:
+                events.append((duty['duty_start'], 'duty.started', duty['desk'], self.describe(duty)))
+        # tasks boundaries crossed since the previous poll, also for duties
+        # which finished in between
+        for duty_id, duty in itertools.chain(previous.items(), duties.items()):
+            if duty_id in duties and duty is not duties[duty_id]:
+                continue
+            for at, type, task in duty['boundaries']:
+                if last_poll < at <= now and at < duty['duty_end']:
+                    events.append((at, type, duty['desk'], dict(self.describe(duty), task=task)))
+        for duty_id, duty in previous.items():
+            if duty_id not in duties:
+                events.append((min(now, duty['duty_end']), 'duty.finished', duty['desk'], self.describe(duty)))
+
+        for at, type, desk, data in sorted(events, key=lambda event: event[0]):
+            self.broker.publish(type, desk, data)
+
+    @staticmethod
+    def describe(duty):
+        return {
+            'duty': duty['duty'], 'desk': duty['desk'],
+            'duty_end': duty['duty_end'].isoformat(),
+        }
+
+
+def get_broker():
+    """The process-wide broker, created on first use.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = DutyEventBroker()
+        return _broker
+
+
+def wake_event_producer():
+    """Let the producer pick up a local change now rather than on next poll.
+    """
+    if _broker is not None:
+        _broker.wake()
+
+
+def stream_events(subscription, heartbeat=None):
+    """Encoded text/event-stream of a subscription, until the client leaves.
+
+    A comment line is sent every `heartbeat` seconds without events, so
+    proxies keep the connection open and dead clients are noticed.
+    """
+    heartbeat = heartbeat or duty_settings.EVENTS_HEARTBEAT
+    try:
+        yield "retry: %d\n\n" % (heartbeat * 1000)
+        while not subscription.dropped:
+            event = subscription.get(timeout=heartbeat)
+            yield event.encode() if event is not None else ": keep-alive\n\n"
+    finally:
+        subscription.close()
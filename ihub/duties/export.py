@@ -0,0 +1,148 @@
+"""
+Module export.py
+
+Streams duty history (hot table and optionally the archive) as CSV or
+NDJSON. Rows are produced from `QuerySet.iterator()` so memory use stays
+flat whatever the size of the date range; gzip is applied on the fly.
+
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from duties.models import ArchivedDuty, Duty
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = (
+    'duty_id', 'user_matric', 'user_name', 'debtee_matric', 'debtee_name',
+    'duty_start', 'duty_end', 'last_active', 'archived',
+)
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+FLUSH_SIZE = 64 * 1024  # bytes buffered before a gzip flush
+
+
+class _Echo:
+    """File-like object that hands written lines back to the caller.
+    """
+    def write(self, value):
+        return value
+
+
+def _timestamp(value):
+    return timezone.localtime(value).isoformat() if value else None
+
+
+def parse_date_range(start, end):
+    """Turn inclusive `YYYY-MM-DD` dates into an aware [start, end) range.
+
+    Raises:
+        ValueError: on malformed dates or when end is before start
+    """
+    start = datetime.strptime(start, '%Y-%m-%d').date()
+    end = datetime.strptime(end, '%Y-%m-%d').date()
+    if end < start:
+        raise ValueError("end date %s is before start date %s" % (end, start))
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def iter_duties(start, end, include_archive=False, chunk_size=CHUNK_SIZE):
+    """Iterate duties started within [start, end), ordered by start.
+
+    Args:
+        start (datetime): inclusive lower bound on duty start
+        end (datetime): exclusive upper bound on duty start
+        include_archive (bool): also yield archived duties, before the hot
+            ones as they started earlier
+        chunk_size (int): rows fetched per database round trip
+
+    Yields:
+        tuple: one value per column in `EXPORT_COLUMNS`
+    """
+    tiers = [(Duty.objects.all(), False)]
+    if include_archive:
+        tiers.insert(0, (ArchivedDuty.objects.all(), True))
+
+    for queryset, archived in tiers:
+        duties = (queryset
+            .filter(duty_start__gte=start, duty_start__lt=end)
+            .select_related('user', 'debtee')
+            .order_by('duty_start'))
+        for duty in duties.iterator(chunk_size=chunk_size):
+            user, debtee = duty.user, duty.debtee
+            yield (
+                duty.duty_id if archived else duty.id,
+                user.matric if user else None,
+                user.name if user else None,
+                debtee.matric if debtee else None,
+                debtee.name if debtee else None,
+                _timestamp(duty.duty_start),
+                _timestamp(duty.duty_end),
+                _timestamp(duty.last_active),
+                archived,
+            )
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def gzip_stream(chunks, flush_size=FLUSH_SIZE):
+    """Gzip an iterable of bytes, flushing every `flush_size` input bytes
+    so clients keep receiving data on long exports.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    pending = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if data:
+            yield data
+        if pending >= flush_size:
+            yield compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+    yield compressor.flush()
+
+
+def export_duties(start, end, fmt='csv', include_archive=False, compress=False,
+                  chunk_size=CHUNK_SIZE):
+    """Stream exported duty history as bytes.
+
+    Args:
+        start (datetime): inclusive lower bound on duty start
+        end (datetime): exclusive upper bound on duty start
+        fmt (str): one of `EXPORT_FORMATS`
+        include_archive (bool): also export archived duties
+        compress (bool): gzip the stream
+        chunk_size (int): rows fetched per database round trip
+
+    Returns:
+        generator: encoded chunks ready to be written or streamed
+    """
+    rows = iter_duties(start, end, include_archive, chunk_size)
+    chunks = (line.encode('utf-8') for line in RENDERERS[fmt](rows))
+    return gzip_stream(chunks) if compress else chunks
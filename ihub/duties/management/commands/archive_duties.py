@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from duties.models import ArchivedDuty, Duty
+
+
+class Command(BaseCommand):
+    help = ("Move duties finished before the retention window from the hot "
+        "Duty table into the archive, in bounded batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=90,
+            help="Keep duties finished within this many days in the hot table")
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help="Duties moved per transaction")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        batch_size = options['batch_size']
+        finished_duties = Duty.objects.filter(duty_end__lt=cutoff).order_by('id')
+
+        # keyset iteration by pk, every batch is its own short transaction
+        last_id, archived = 0, 0
+        while True:
+            with transaction.atomic():
+                batch = list(finished_duties.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                ArchivedDuty.objects.bulk_create(ArchivedDuty.from_duty(duty) for duty in batch)
+                batch_duties = Duty.objects.filter(id__in=[duty.id for duty in batch])
+                # finished duties may not be swept yet, detached ones are
+                # deleted without invalidating caches once per row
+                batch_duties.filter(manager__isnull=False).update(manager=None)
+                batch_duties.delete()
+            last_id = batch[-1].id
+            archived += len(batch)
+            self.stdout.write("Archived %d duties (up to id %d)" % (archived, last_id))
+
+        self.stdout.write("Done, %d duties finished before %s archived" % (archived, cutoff))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from duties.benchmarks import (
+    measure, percentile, seed_finished_duties, seed_users
+)
+from duties.models import DutyManager
+
+
+class Command(BaseCommand):
+    help = ("Measure SQL statements and latency of POST /duties/api/create/ "
+        "while the duty history grows. Runs in a rolled back transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history', default='0,1000,10000,100000',
+            help="Comma separated history sizes (finished duties) to measure at")
+        parser.add_argument('--repeat', type=int, default=20,
+            help="Duty admissions measured per history size")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['history'].split(','))
+        repeat = options['repeat']
+
+        self.stdout.write("%10s %8s %10s %10s %10s" % (
+            'history', 'queries', 'mean(ms)', 'p50(ms)', 'p95(ms)'))
+
+        with transaction.atomic():
+            duty_manager = DutyManager.load()
+            owners = seed_users(50)
+            candidates = seed_users(repeat)
+            client = Client(HTTP_HOST='localhost')
+            seeded = 0
+
+            for size in sizes:
+                seed_finished_duties(size - seeded, owners)
+                seeded = size
+
+                timings, query_counts = [], set()
+                for user in candidates:
+                    client.force_login(user)
+                    response, elapsed, queries = measure(
+                        client.post, reverse('duties:duty-create'))
+                    if response.status_code != 201:
+                        raise RuntimeError("Admission failed with HTTP %d" % response.status_code)
+                    timings.append(elapsed * 1000)
+                    query_counts.add(len(queries))
+                    # keep history size fixed between measurements
+                    duty_manager.active_duties.all().delete()
+
+                self.stdout.write("%10d %8s %10.2f %10.2f %10.2f" % (
+                    size, '/'.join(map(str, sorted(query_counts))),
+                    sum(timings) / len(timings),
+                    percentile(timings, 50), percentile(timings, 95)))
+
+            transaction.set_rollback(True)
@@ -0,0 +1,102 @@
+import io
+import sys
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from duties.benchmarks import percentile, seed_users, session_cookie
+from duties.models import DutyManager
+from users.models import ApiToken
+
+# stock middlewares replaced by the lean ones of users/middleware.py
+STOCK_MIDDLEWARE = {
+    'users.middleware.LeanSessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'users.middleware.LeanAuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.LeanMessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+class Command(BaseCommand):
+    help = ("Measure per-request latency and SQL statements of GET "
+        "/duties/api/details/ authenticated by session or by API token, "
+        "through the stock and the lean middleware stacks. Requests go "
+        "straight to WSGI handlers. Runs in a rolled back transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1000,
+            help="Requests measured per case")
+
+    def handle(self, *args, **options):
+        stock = [STOCK_MIDDLEWARE.get(path, path) for path in settings.MIDDLEWARE]
+
+        with transaction.atomic():
+            user, = seed_users(1)
+            DutyManager.load().start_duty(user)
+            token, key = ApiToken.objects.issue(user, "Benchmark")
+            session_headers = {'HTTP_COOKIE': session_cookie(user)}
+            token_headers = {'HTTP_AUTHORIZATION': 'Token %s' % key}
+
+            cases = []
+            for name, middleware, headers in [
+                    ('session, stock middleware', stock, session_headers),
+                    ('token, stock middleware', stock, token_headers),
+                    ('session, lean middleware', settings.MIDDLEWARE, session_headers),
+                    ('token, lean middleware', settings.MIDDLEWARE, token_headers)]:
+                # handlers load middleware once, when created
+                with override_settings(MIDDLEWARE=middleware):
+                    cases.append((name, WSGIHandler(), headers))
+
+            # as the test client: keep the connection of the transaction open
+            request_started.disconnect(close_old_connections)
+            request_finished.disconnect(close_old_connections)
+            try:
+                self.benchmark(cases, options['repeat'])
+            finally:
+                request_started.connect(close_old_connections)
+                request_finished.connect(close_old_connections)
+            transaction.set_rollback(True)
+
+    def request(self, handler, headers):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': reverse('duties:duty-details'),
+            'QUERY_STRING': '', 'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        }
+        environ.update(headers)
+        status = []
+        response = handler(environ, lambda code, response_headers: status.append(code))
+        body = b''.join(response)
+        response.close()
+        if not status[0].startswith('200'):
+            raise RuntimeError("Request failed with %s: %s" % (status[0], body[:200]))
+
+    def benchmark(self, cases, repeat):
+        timings = {name: [] for name, _, _ in cases}
+        queries = {}
+        for name, handler, headers in cases:
+            # warm up caches (token LRU, active duties), then count statements
+            self.request(handler, headers)
+            with CaptureQueriesContext(connection) as ctx:
+                self.request(handler, headers)
+            queries[name] = len(ctx.captured_queries)
+
+        # cases interleaved, so drift of the host affects all alike
+        for _ in range(repeat):
+            for name, handler, headers in cases:
+                start = time.perf_counter()
+                self.request(handler, headers)
+                timings[name].append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write("%-28s %8s %10s %10s %10s" % ('case', 'queries', 'mean(ms)', 'p50(ms)', 'p95(ms)'))
+        for name, _, _ in cases:
+            values = timings[name]
+            self.stdout.write("%-28s %8d %10.3f %10.3f %10.3f" % (
+                name, queries[name], sum(values) / len(values),
+                percentile(values, 50), percentile(values, 95)))
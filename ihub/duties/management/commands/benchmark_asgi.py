@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from duties.asgi import DutyASGIApplication
+from duties.benchmarks import (
+    PooledWSGIServer, http_request, open_stream, percentile, seed_users, session_cookie
+)
+from duties.conf import duty_settings
+from duties.models import DutyManager
+from utils.asgi import start_server
+
+
+class Command(BaseCommand):
+    help = ("Compare the WSGI and ASGI entry points serving duty API traffic "
+        "while many clients idle on the event stream and on long-polls. "
+        "Servers run in process on the configured database, seeded rows are "
+        "deleted afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle', type=int, default=500,
+            help="Idle clients, half on the event stream, half long-polling")
+        parser.add_argument('--requests', type=int, default=200,
+            help="API requests sent while clients idle")
+        parser.add_argument('--concurrency', type=int, default=10,
+            help="API requests in flight at once")
+        parser.add_argument('--threads', type=int, default=duty_settings.ASGI_THREADS,
+            help="Threads of the WSGI server and of the ASGI thread pool")
+        parser.add_argument('--timeout', type=float, default=10,
+            help="Seconds before a request counts as failed")
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        desk = DutyManager.objects.create(name="Benchmark desk", slug='benchmark-asgi', capacity=1)
+        users = seed_users(1)
+        try:
+            desk.start_duty(users[0])
+            self.cookie = session_cookie(users[0])
+            self.desk = desk
+            self.options = options
+
+            self.stdout.write("%6s %6s %10s %8s %8s %10s %10s %8s" % (
+                'server', 'idle', 'streaming', 'api ok', 'failed', 'p50(ms)', 'p95(ms)', 'req/s'))
+            for name, serve in (('wsgi', self.serve_wsgi), ('asgi', self.serve_asgi)):
+                port = serve()
+                loop = asyncio.new_event_loop()
+                row = loop.run_until_complete(self.run_clients(port))
+                loop.close()
+                self.stdout.write("%6s %6d %10d %8d %8d %10.1f %10.1f %8.1f" % ((name, ) + row))
+                options['port'] += 1
+        finally:
+            desk.active_duties.all().delete()
+            desk.delete()
+            for user in users:
+                user.delete()
+
+    def serve_wsgi(self):
+        port = self.options['port']
+        server = PooledWSGIServer(('127.0.0.1', port), get_wsgi_application(), self.options['threads'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return port
+
+    def serve_asgi(self):
+        port = self.options['port']
+        application = DutyASGIApplication(get_wsgi_application(), self.options['threads'])
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(start_server(application, '127.0.0.1', port))
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return port
+
+    async def run_clients(self, port):
+        options = self.options
+        headers = {'Cookie': self.cookie}
+        query = '?desk=%s' % self.desk.slug
+        events_path = reverse('duties:duty-events') + query
+        details_path = reverse('duties:duty-details') + query
+        stop = asyncio.Event()
+        connected = []
+
+        # idle clients: event streams stay open, long-polls re-poll once
+        # answered (a WSGI server has no long-poll and answers at once)
+        async def stream():
+            try:
+                reader, writer = await open_stream(port, events_path, headers, options['timeout'])
+            except (OSError, asyncio.TimeoutError):
+                return
+            connected.append(writer)
+            await stop.wait()
+            writer.close()
+
+        async def long_poll():
+            while not stop.is_set():
+                try:
+                    await http_request(port, details_path + '&wait=%d' % duty_settings.LONGPOLL_TIMEOUT,
+                        headers, timeout=duty_settings.LONGPOLL_TIMEOUT + options['timeout'])
+                except (OSError, asyncio.TimeoutError):
+                    await asyncio.sleep(0.1)
+
+        idle = options['idle']
+        streams = [asyncio.ensure_future(stream()) for _ in range(idle - idle // 2)]
+        polls = [asyncio.ensure_future(long_poll()) for _ in range(idle // 2)]
+        # let idle clients settle before measuring
+        await asyncio.wait(streams, timeout=options['timeout'])
+
+        timings, failed = [], 0
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def api_call():
+            nonlocal failed
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    status, _ = await http_request(port, details_path, headers, options['timeout'])
+                except (OSError, asyncio.TimeoutError):
+                    status = None
+                if status == 200:
+                    timings.append((time.perf_counter() - start) * 1000)
+                else:
+                    failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[api_call() for _ in range(options['requests'])])
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        streaming = len(connected)
+        for task in streams + polls:
+            task.cancel()
+        await asyncio.gather(*(streams + polls), return_exceptions=True)
+        return (idle, streaming, len(timings), failed,
+            percentile(timings, 50), percentile(timings, 95), len(timings) / elapsed)
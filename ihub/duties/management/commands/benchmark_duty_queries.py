@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from duties.benchmarks import (
+    explain, measure, seed_finished_duties, seed_users, table_bytes
+)
+from duties.models import Duty, DutyManager
+
+
+class Command(BaseCommand):
+    help = ("Seed a large duty history, then print query plans and timings of "
+        "DutyManager methods without and with the Duty indexes. "
+        "Runs in a rolled back transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000,
+            help="Finished duties seeded as history")
+        parser.add_argument('--repeat', type=int, default=20,
+            help="Calls measured per method")
+
+    def handle(self, *args, **options):
+        # measure the database, not the active duty cache
+        duties_settings = dict(getattr(settings, 'DUTIES', {}), CACHE_ACTIVE_DUTIES=False)
+        with override_settings(DUTIES=duties_settings):
+            self.benchmark(options['rows'], options['repeat'])
+
+    def benchmark(self, rows, repeat):
+        with transaction.atomic():
+            self.stdout.write("Seeding %d finished duties..." % rows)
+            duty_manager = DutyManager.load()
+            owners = seed_users(200)
+            seed_finished_duties(rows, owners)
+            # one ongoing duty, like a manager at MAX_DUTY
+            onduty_user, idle_user = seed_users(2)
+            duty_manager.start_duty(onduty_user)
+
+            self.report_storage()
+
+            cases = [
+                ('is_onduty', lambda: duty_manager.is_onduty(idle_user)),
+                ('get_duties_of', lambda: duty_manager.get_duties_of(onduty_user)),
+                ('get_onduty_user_ids', lambda: duty_manager.get_onduty_user_ids()),
+                ('filter_finished_duties', lambda: list(duty_manager.filter_finished_duties())),
+                ('admin changelist', lambda: list(Duty.objects.order_by('duty_start', 'last_active')[:100])),
+            ]
+
+            # before: measure inside a savepoint with indexes dropped
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for index in Duty._meta.indexes:
+                        cursor.execute('DROP INDEX %s' % connection.ops.quote_name(index.name))
+                self.report("without Duty indexes", cases, repeat)
+                transaction.set_rollback(True)
+
+            self.report("with Duty indexes", cases, repeat)
+            transaction.set_rollback(True)
+
+    def report_storage(self):
+        self.stdout.write("\n=== Duty table storage")
+        rows = Duty.objects.count()
+        size = table_bytes(Duty._meta.db_table)
+        if size is not None:
+            self.stdout.write("%-24s %10d bytes (%.1f bytes/row)" % ('table size', size, size / max(rows, 1)))
+
+        # full scan materializing every stored column
+        _, elapsed, _ = measure(lambda: sum(1 for _ in Duty.objects.values_list().iterator()))
+        self.stdout.write("%-24s %10.3f ms (%d rows)" % ('full scan', elapsed * 1000, rows))
+
+    def report(self, title, cases, repeat):
+        self.stdout.write("\n=== %s" % title)
+        for name, case in cases:
+            _, _, queries = measure(case)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                case()
+            elapsed = (time.perf_counter() - start) / repeat
+
+            self.stdout.write("%-24s %10.3f ms" % (name, elapsed * 1000))
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                for line in explain(query['sql']):
+                    self.stdout.write("    %s" % line)
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from duties.benchmarks import measure, seed_users
+from duties.models import Duty
+from duties.serializers import DutySerializer, FastDutySerializer
+
+
+class Command(BaseCommand):
+    help = ("Seed duties with debtees, then compare the throughput of "
+        "DutySerializer and FastDutySerializer on the same payload. "
+        "Runs in a rolled back transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duties', type=int, default=1000,
+            help="Duties serialized per call")
+        parser.add_argument('--repeat', type=int, default=20,
+            help="Calls measured per serializer")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.benchmark(options['duties'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def benchmark(self, count, repeat):
+        self.stdout.write("Seeding %d duties..." % count)
+        users = seed_users(count + 1)
+        now = timezone.now()
+        duties = []
+        for idx, user in enumerate(users[:count]):
+            # every other duty pays a debt, half of them already active
+            duty = Duty(user=user, debtee=users[idx + 1] if idx % 2 else None)
+            duty.initialise_timings(now)
+            if idx % 4 == 1:
+                duty.last_active = now
+            duties.append(duty)
+        Duty.objects.bulk_create(duties)
+        queryset = Duty.objects.filter(user__in=users[:count]).order_by('id')
+
+        renderer = JSONRenderer()
+        cases = [
+            ('DutySerializer', lambda: renderer.render(DutySerializer(queryset.all(), many=True).data)),
+            ('FastDutySerializer', lambda: renderer.render(FastDutySerializer(queryset.all()).data)),
+            ('FastDutySerializer.from_queryset',
+                lambda: renderer.render(FastDutySerializer.from_queryset(queryset.all()))),
+        ]
+
+        expected = None
+        self.stdout.write("\n%-34s %10s %12s %8s" % ('serializer', 'ms/call', 'duties/s', 'queries'))
+        for name, case in cases:
+            content, _, queries = measure(case)
+            if expected is None:
+                expected = content
+            elif content != expected:
+                raise CommandError("%s output differs from DutySerializer" % name)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                case()
+            elapsed = (time.perf_counter() - start) / repeat
+            self.stdout.write("%-34s %10.3f %12.0f %8d" % (
+                name, elapsed * 1000, count / elapsed, len(queries)))
+        self.stdout.write("\nRendered payloads are byte-identical (%d bytes)." % len(expected))
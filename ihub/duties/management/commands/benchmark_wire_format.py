@@ -0,0 +1,74 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from duties.benchmarks import seed_users
+from duties.models import Duty
+from duties.renderers import MessagePackRenderer, msgpack
+from duties.serializers import FastDutySerializer, FastDutyV2Serializer
+from duties.serializers.fields import epoch_milliseconds
+from duties.views.api import format_now
+
+
+class Command(BaseCommand):
+    help = ("Compare payload size and encode time of duty details in the v1 "
+        "format and the v2 formats (JSON, MessagePack). "
+        "Runs in a rolled back transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duties', type=int, nargs='+', default=[1, 2, 100],
+            help="Payload sizes, in duties")
+        parser.add_argument('--repeat', type=int, default=200,
+            help="Encodings measured per format and size")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.benchmark(options['duties'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def benchmark(self, sizes, repeat):
+        count = max(sizes)
+        users = seed_users(count + 1)
+        now = timezone.now()
+        duties = []
+        for idx, user in enumerate(users[:count]):
+            duty = Duty(user=user, debtee=users[idx + 1] if idx % 2 else None)
+            duty.initialise_timings(now)
+            duties.append(duty)
+        Duty.objects.bulk_create(duties)
+        duties = list(Duty.objects.filter(user__in=users[:count]).select_related('debtee').order_by('id'))
+
+        formats = [
+            ('v1 json', FastDutySerializer, JSONRenderer(), format_now),
+            ('v2 json', FastDutyV2Serializer, JSONRenderer(), lambda: epoch_milliseconds(timezone.now())),
+        ]
+        if msgpack is not None:
+            formats.append(('v2 msgpack', FastDutyV2Serializer, MessagePackRenderer(),
+                lambda: epoch_milliseconds(timezone.now())))
+        else:
+            self.stdout.write("msgpack is not installed, MessagePack skipped")
+
+        for size in sizes:
+            self.stdout.write("\n=== %d duties" % size)
+            self.stdout.write("%-12s %10s %10s %12s" % ('format', 'bytes', 'gzip', 'encode us'))
+            for name, serializer_class, renderer, server_now in formats:
+                def encode():
+                    # body and X-Server-Now header, as sent by the details view
+                    return renderer.render({
+                        'success': True,
+                        'message': "Duties sent. MAX_DUTY: %d" % size,
+                        'payload': serializer_class(duties[:size]).data,
+                    }), str(server_now())
+
+                body, header = encode()
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    encode()
+                elapsed = (time.perf_counter() - start) / repeat
+                self.stdout.write("%-12s %10d %10d %12.1f" % (
+                    name, len(body) + len(header), len(gzip.compress(body)) + len(header), elapsed * 1e6))
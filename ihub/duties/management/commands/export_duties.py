@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from duties.export import EXPORT_FORMATS, export_duties, parse_date_range
+
+
+class Command(BaseCommand):
+    help = ("Stream duty history for a date range as CSV or NDJSON, "
+        "to stdout or a file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', help="First day, YYYY-MM-DD")
+        parser.add_argument('end', help="Last day (inclusive), YYYY-MM-DD")
+        parser.add_argument('--output', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Gzip the export")
+        parser.add_argument('--archive', action='store_true',
+            help="Include archived duties")
+        parser.add_argument('--file', help="Write to this path instead of stdout")
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_date_range(options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        chunks = export_duties(start, end, options['output'],
+            include_archive=options['archive'], compress=options['gzip'])
+
+        if options['file']:
+            with open(options['file'], 'wb') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
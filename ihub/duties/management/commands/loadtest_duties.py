@@ -0,0 +1,282 @@
+import http.client
+import io
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import connection
+from django.urls import reverse
+
+from bridge.constants.errors import MaxDutyCountError, UnfinishedDutyError
+from duties.benchmarks import percentile, seed_users
+from duties.models import DutyManager
+from users.models import ApiToken
+
+LOCKED = 'database is locked'
+
+# error names of expected failures, matched against response messages
+KNOWN_ERRORS = [
+    ('MaxDutyCountError', MaxDutyCountError().message),
+    # message embeds the end of the ongoing duty, match its fixed part
+    ('UnfinishedDutyError', UnfinishedDutyError().message.split('|')[0]),
+    # details of a user not admitted this round
+    ('NotOnDuty', "User's duty is not registered in manager"),
+]
+
+
+def classify(status, body, exc=None):
+    """Error name of a response, None for success.
+
+    Args:
+        status (int): HTTP status code
+        body (bytes): response body
+        exc (Exception): exception raised by the view, when known
+    """
+    if exc is not None:
+        if LOCKED in str(exc):
+            return 'SQLiteLocked'
+        return type(exc).__name__
+    if status < 400:
+        return None
+    if LOCKED.encode() in body:
+        return 'SQLiteLocked' # debug page of a live server
+    try:
+        message = json.loads(body.decode())['message']
+    except (ValueError, KeyError, TypeError):
+        message = ''
+    for name, text in KNOWN_ERRORS:
+        if message.startswith(text):
+            return name
+    return 'HTTP %d' % status
+
+
+class InProcessClient(object):
+    """Requests straight to a WSGI handler, SQL statements counted per
+    request on the connection of the calling thread.
+    """
+    sql_counted = True
+
+    def __init__(self, host):
+        self.handler = WSGIHandler()
+        self.host = host
+        self.local = threading.local()
+        got_request_exception.connect(self.record_exception)
+
+    def close(self):
+        got_request_exception.disconnect(self.record_exception)
+
+    def record_exception(self, sender, request=None, **kwargs):
+        self.local.exc = sys.exc_info()[1]
+
+    def count_query(self, execute, sql, params, many, context):
+        self.local.queries += 1
+        return execute(sql, params, many, context)
+
+    def request(self, method, path, query, headers, body=b''):
+        """Returns:
+            tuple: (status code, body, exception raised by the view, SQL statements)
+        """
+        if not hasattr(self.local, 'queries'):
+            # connections are per thread, so is the wrapper
+            connection.execute_wrappers.append(self.count_query)
+        self.local.queries = 0
+        self.local.exc = None
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'HTTP_HOST': self.host,
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr,
+            'CONTENT_LENGTH': str(len(body)),
+        }
+        environ.update(headers)
+        status = []
+        response = self.handler(environ, lambda code, response_headers: status.append(code))
+        content = b''.join(response)
+        response.close()
+        return int(status[0].split(' ', 1)[0]), content, self.local.exc, self.local.queries
+
+
+class HTTPClient(object):
+    """Requests to a live server, one connection per request.
+    """
+    sql_counted = False
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+
+    def close(self):
+        pass
+
+    def request(self, method, path, query, headers, body=b''):
+        conn = http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+        names = {'CONTENT_TYPE': 'Content-Type', 'HTTP_AUTHORIZATION': 'Authorization',
+            'HTTP_ACCEPT': 'Accept'}
+        try:
+            conn.request(method, self.prefix + path + '?' + query, body,
+                {names[key]: value for key, value in headers.items()})
+            response = conn.getresponse()
+            return response.status, response.read(), None, None
+        except (OSError, http.client.HTTPException) as e:
+            return 0, b'', e, None
+        finally:
+            conn.close()
+
+
+class Command(BaseCommand):
+    help = ("Load test the duty API with concurrent simulated users, each "
+        "a thread authenticated by its own API token. Every round all users "
+        "try to start duties on one desk then poll its details, the desk is "
+        "reset between rounds. Prints latency percentiles, throughput, error "
+        "breakdown and (in process) SQL statements per endpoint as JSON. "
+        "Users and desk are seeded on the configured database and deleted "
+        "afterwards: a live server given by --url must use the same database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20,
+            help="Concurrent simulated users")
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument('--capacity', type=int, default=5,
+            help="Capacity of the load tested desk")
+        parser.add_argument('--creates', type=int, default=2,
+            help="Start duty attempts per user per round, retries of admitted "
+            "users hit UnfinishedDutyError while the desk is not full")
+        parser.add_argument('--polls', type=int, default=5,
+            help="Details requests per user per round")
+        parser.add_argument('--api', choices=['v1', 'v2'], default='v1')
+        parser.add_argument('--url',
+            help="Base URL of a live server, e.g. http://127.0.0.1:8000 "
+            "(default: WSGI application in process)")
+        parser.add_argument('--host', default='localhost',
+            help="Host header of in process requests")
+        parser.add_argument('--timeout', type=float, default=10,
+            help="Seconds before a live server request counts as failed")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['rounds'] < 1:
+            raise CommandError("--users and --rounds must be positive.")
+        prefix = 'duties:duty-v2-' if options['api'] == 'v2' else 'duties:duty-'
+        self.paths = {'create': reverse(prefix + 'create'), 'details': reverse(prefix + 'details')}
+        self.options = options
+
+        desk = DutyManager.objects.create(name="Load test desk", slug='loadtest',
+            capacity=options['capacity'])
+        users = seed_users(options['users'])
+        try:
+            keys = [ApiToken.objects.issue(user, "Load test")[1] for user in users]
+            if options['url']:
+                client = HTTPClient(options['url'], options['timeout'])
+            else:
+                client = InProcessClient(options['host'])
+            try:
+                samples, elapsed = self.run(client, desk, keys)
+            finally:
+                client.close()
+        finally:
+            desk.reset()
+            desk.delete()
+            for user in users:
+                user.delete()
+
+        report = self.report(samples, elapsed, client.sql_counted)
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def run(self, client, desk, keys):
+        """Returns:
+            tuple: (list of (endpoint, ms, status, error, SQL statements), seconds under load)
+        """
+        options = self.options
+        query = 'desk=%s' % desk.slug
+        samples = []
+
+        def call(endpoint, method, headers, body=b''):
+            start = time.perf_counter()
+            status, content, exc, queries = client.request(method, self.paths[endpoint], query, headers, body)
+            ms = (time.perf_counter() - start) * 1000
+            samples.append((endpoint, ms, status, classify(status, content, exc), queries))
+
+        def simulate(key):
+            headers = {'HTTP_AUTHORIZATION': 'Token %s' % key, 'HTTP_ACCEPT': 'application/json'}
+            for _ in range(options['creates']):
+                call('create', 'POST', dict(headers, CONTENT_TYPE='application/json'), b'{}')
+            for _ in range(options['polls']):
+                call('details', 'GET', headers)
+
+        # expected 4xx responses would each log a warning
+        logger = logging.getLogger('django.request')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        elapsed = 0.0
+        try:
+            with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+                for _ in range(options['rounds']):
+                    start = time.perf_counter()
+                    for future in [executor.submit(simulate, key) for key in keys]:
+                        future.result()
+                    elapsed += time.perf_counter() - start
+                    desk.reset()
+        finally:
+            logger.setLevel(level)
+        return samples, elapsed
+
+    def report(self, samples, elapsed, sql_counted):
+        options = self.options
+        endpoints = {}
+        for endpoint, path in sorted(self.paths.items()):
+            rows = [sample for sample in samples if sample[0] == endpoint]
+            if not rows:
+                continue
+            timings = [sample[1] for sample in rows]
+            statuses, errors = {}, {}
+            for _, _, status, error, _ in rows:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+            sql = None
+            if sql_counted:
+                queries = [sample[4] for sample in rows]
+                sql = {'total': sum(queries), 'mean': sum(queries) / len(queries), 'max': max(queries)}
+            endpoints[endpoint] = {
+                'path': path,
+                'requests': len(rows),
+                'throughput_rps': len(rows) / elapsed,
+                'latency_ms': {
+                    'mean': sum(timings) / len(timings),
+                    'p50': percentile(timings, 50),
+                    'p95': percentile(timings, 95),
+                    'p99': percentile(timings, 99),
+                    'max': max(timings),
+                },
+                'statuses': statuses,
+                'errors': errors,
+                'sql': sql,
+            }
+        return {
+            'target': options['url'] or 'in-process',
+            'api': options['api'],
+            'users': options['users'],
+            'rounds': options['rounds'],
+            'capacity': options['capacity'],
+            'creates': options['creates'],
+            'polls': options['polls'],
+            'database': connection.vendor,
+            'elapsed_s': elapsed,
+            'requests': len(samples),
+            'throughput_rps': len(samples) / elapsed,
+            'endpoints': endpoints,
+        }
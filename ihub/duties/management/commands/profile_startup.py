@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ("Boot the project in a fresh interpreter and report import time "
+        "per module of the project apps, and SQL statements issued by "
+        "django.setup(), middleware and URLconf loading.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15,
+            help="Slowest modules listed, by self time")
+        parser.add_argument('--all-modules', action='store_true',
+            help="List third party modules too")
+        parser.add_argument('--max-queries', type=int, default=None,
+            help="Fail when startup issues more SQL statements")
+        parser.add_argument('--json', action='store_true',
+            help="Print the raw profile")
+
+    def handle(self, *args, **options):
+        profile = self.run_profile()
+        if options['json']:
+            self.stdout.write(json.dumps(profile, indent=2))
+        else:
+            self.report(profile, options['top'], options['all_modules'])
+
+        count = sum(len(phase['queries']) for phase in profile['phases'])
+        if options['max_queries'] is not None and count > options['max_queries']:
+            raise CommandError("Startup issued %d SQL statements, at most %d allowed"
+                % (count, options['max_queries']))
+
+    def run_profile(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.run([sys.executable, '-m', 'utils.startup'], cwd=settings.BASE_DIR,
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if process.returncode:
+            raise CommandError("Startup failed:\n%s" % process.stderr)
+        return json.loads(process.stdout)
+
+    def report(self, profile, top, all_modules):
+        self.stdout.write("=== Phases")
+        for phase in profile['phases']:
+            self.stdout.write("%-12s %10.1f ms %6d queries" % (
+                phase['name'], phase['seconds'] * 1000, len(phase['queries'])))
+            for sql in phase['queries']:
+                self.stdout.write("    %s" % sql)
+        total = sum(phase['seconds'] for phase in profile['phases'])
+        self.stdout.write("%-12s %10.1f ms" % ('total', total * 1000))
+
+        # project modules: top level packages living in BASE_DIR
+        packages = {name for name in os.listdir(settings.BASE_DIR)
+            if os.path.isfile(os.path.join(settings.BASE_DIR, name, '__init__.py'))}
+        modules = [module for module in profile['modules']
+            if all_modules or module['name'].split('.')[0] in packages]
+
+        self.stdout.write("\n=== Import time per app (self, ms)")
+        apps = OrderedDict((package, 0.0) for package in sorted(packages))
+        for module in profile['modules']:
+            package = module['name'].split('.')[0]
+            if package in apps:
+                apps[package] += module['self']
+        for package, seconds in sorted(apps.items(), key=lambda item: -item[1]):
+            self.stdout.write("%-40s %10.1f" % (package, seconds * 1000))
+
+        self.stdout.write("\n=== Slowest modules")
+        self.stdout.write("%-40s %-8s %10s %10s" % ('module', 'phase', 'self ms', 'cumul ms'))
+        for module in sorted(modules, key=lambda module: -module['self'])[:top]:
+            self.stdout.write("%-40s %-8s %10.1f %10.1f" % (
+                module['name'], module['phase'], module['self'] * 1000, module['cumulative'] * 1000))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.contrib.auth import get_user_model
+
+from duties.models import UserDutyStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Recompute per-user duty statistics from the duty table and the "
+        "archive, in chunks of users. Run once after migrating, and whenever "
+        "duties were edited or deleted by hand.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help="Users recomputed per transaction")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.order_by('id').values_list('id', flat=True)
+
+        # keyset iteration by user id, every chunk is its own transaction
+        last_id, users, written = 0, 0, 0
+        while True:
+            chunk = list(user_ids.filter(id__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                written += UserDutyStats.objects.rebuild(chunk)
+            last_id = chunk[-1]
+            users += len(chunk)
+
+        self.stdout.write("Rebuilt duty stats of %d users, %d with duties" % (users, written))
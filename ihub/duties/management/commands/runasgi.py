@@ -0,0 +1,28 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from utils.asgi import start_server
+
+
+class Command(BaseCommand):
+    help = ("Serve the project ASGI application (ihub.asgi) with a minimal "
+        "asyncio HTTP/1.1 server, for local use.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+
+    def handle(self, *args, **options):
+        from ihub.asgi import application
+
+        loop = asyncio.get_event_loop()
+        server = loop.run_until_complete(start_server(application, options['host'], options['port']))
+        self.stdout.write("Serving ASGI on http://%s:%d/" % (options['host'], options['port']))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from duties.conf import duty_settings
+from duties.sweeper import FinishedDutySweeper
+
+
+class Command(BaseCommand):
+    help = "Detach finished duties from their managers, once or periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+            help="Sweep once and exit instead of running forever")
+        parser.add_argument('--interval', type=float, default=duty_settings.SWEEP_INTERVAL,
+            help="Seconds between sweeps")
+        parser.add_argument('--batch-size', type=int, default=duty_settings.SWEEP_BATCH_SIZE,
+            help="Duties detached per UPDATE")
+
+    def handle(self, *args, **options):
+        sweeper = FinishedDutySweeper(
+            interval=options['interval'], batch_size=options['batch_size'])
+
+        if options['once']:
+            self.stdout.write("Detached %d finished duties" % sweeper.sweep())
+            return
+
+        sweeper.start()
+        try:
+            while sweeper.is_alive():
+                sweeper.join(1)
+        except KeyboardInterrupt:
+            sweeper.stop()
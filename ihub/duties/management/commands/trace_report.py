@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bridge.tracing import DEFAULT_TRACE_PATH, aggregate, read_traces
+
+
+class Command(BaseCommand):
+    help = ("Print traces recorded with TRACE_SAMPLE_RATE as a call tree: "
+        "spans added up by call path with calls, total and self time, and "
+        "SQL statements. --folded prints folded stacks (self time in "
+        "microseconds) for flame graph tools instead.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Traces file (default: TRACE_PATH)")
+        parser.add_argument('--min-percent', type=float, default=0.5,
+            help="Hide call paths below this share of the total time")
+        parser.add_argument('--folded', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'TRACE_PATH', DEFAULT_TRACE_PATH)
+        if path is None:
+            raise CommandError("TRACE_PATH is not set, give --path.")
+        try:
+            paths = aggregate(read_traces(path))
+        except FileNotFoundError:
+            raise CommandError("No traces recorded at %s." % path)
+
+        if options['folded']:
+            for call_path, row in sorted(paths.items()):
+                self.stdout.write("%s %d" % (';'.join(call_path), round(row[2] * 1000)))
+            return
+
+        roots = [row for call_path, row in paths.items() if len(call_path) == 1]
+        total = sum(row[1] for row in roots) or 1.0
+        self.stdout.write("%d traces, %.1f ms" % (sum(row[0] for row in roots), total))
+        self.stdout.write("%8s %11s %11s %10s %7s %8s %6s  %s" % (
+            'calls', 'total(ms)', 'self(ms)', 'mean(ms)', 'sql', 'self sql', '%', 'span'))
+
+        children = {}
+        for call_path in paths:
+            children.setdefault(call_path[:-1], []).append(call_path)
+
+        def write(call_path):
+            calls, ms, self_ms, sql, self_sql, errors = paths[call_path]
+            share = 100.0 * ms / total
+            if share < options['min_percent']:
+                return
+            name = '  ' * (len(call_path) - 1) + call_path[-1]
+            if errors:
+                name += " (%d errors)" % errors
+            self.stdout.write("%8d %11.1f %11.1f %10.3f %7d %8d %6.1f  %s" % (
+                calls, ms, self_ms, ms / calls, sql, self_sql, share, name))
+            for child in sorted(children.get(call_path, ()), key=lambda p: -paths[p][1]):
+                write(child)
+
+        for root in sorted(children.get((), ()), key=lambda p: -paths[p][1]):
+            write(root)
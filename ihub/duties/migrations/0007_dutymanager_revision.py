@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('duties', '0006_auto_20190608_0004'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dutymanager',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.1 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('duties', '0007_dutymanager_revision'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='duty',
+            index=models.Index(condition=models.Q(manager__isnull=False), fields=['manager', 'duty_end'], name='duties_duty_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='duty',
+            index=models.Index(fields=['user', 'duty_end'], name='duties_duty_user_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='duty',
+            index=models.Index(fields=['duty_start', 'last_active'], name='duties_duty_start_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_default_schedule(apps, schema_editor):
+    DutySchedule = apps.get_model('duties', 'DutySchedule')
+    Duty = apps.get_model('duties', 'Duty')
+    # stored timelines were all computed from the former Duty constants
+    schedule, created = DutySchedule.objects.get_or_create(name='default', defaults={
+        'duty_duration': 180, 'task_window': 30,
+        'task1_mark': 30, 'task2_mark': 90, 'task3_mark': 150,
+    })
+    Duty.objects.filter(schedule__isnull=True).update(schedule=schedule)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('duties', '0008_duty_indexes'),
+    ]
+
+    operations = [
+        # sqlite table remakes cannot carry the partial index condition (it is
+        # table qualified), drop it while columns change
+        migrations.RemoveIndex(
+            model_name='duty',
+            name='duties_duty_active_idx',
+        ),
+        migrations.CreateModel(
+            name='DutySchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('duty_duration', models.PositiveIntegerField(default=180)),
+                ('task_window', models.PositiveIntegerField(default=30)),
+                ('task1_mark', models.PositiveIntegerField(default=30)),
+                ('task2_mark', models.PositiveIntegerField(default=90)),
+                ('task3_mark', models.PositiveIntegerField(default=150)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='duty',
+            name='schedule',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='duties', to='duties.DutySchedule'),
+        ),
+        migrations.RunPython(create_default_schedule, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='duty',
+            name='schedule',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='duties', to='duties.DutySchedule'),
+        ),
+        migrations.RemoveField(
+            model_name='duty',
+            name='task1_end',
+        ),
+        migrations.RemoveField(
+            model_name='duty',
+            name='task1_start',
+        ),
+        migrations.RemoveField(
+            model_name='duty',
+            name='task2_end',
+        ),
+        migrations.RemoveField(
+            model_name='duty',
+            name='task2_start',
+        ),
+        migrations.RemoveField(
+            model_name='duty',
+            name='task3_end',
+        ),
+        migrations.RemoveField(
+            model_name='duty',
+            name='task3_start',
+        ),
+        migrations.AddIndex(
+            model_name='duty',
+            index=models.Index(condition=models.Q(manager__isnull=False), fields=['manager', 'duty_end'], name='duties_duty_active_idx'),
+        ),
+    ]
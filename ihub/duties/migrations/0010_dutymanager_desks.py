@@ -0,0 +1,44 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+def assign_desk_slugs(apps, schema_editor):
+    DutyManager = apps.get_model('duties', 'DutyManager')
+    # the former singleton row (pk=1) becomes the default desk
+    for manager in DutyManager.objects.filter(slug__isnull=True):
+        manager.slug = 'default' if manager.pk == 1 else 'desk-%d' % manager.pk
+        manager.save(update_fields=['slug'])
+    if not DutyManager.objects.filter(slug='default').exists():
+        DutyManager.objects.create(slug='default')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('duties', '0009_duty_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dutymanager',
+            name='capacity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='dutymanager',
+            name='name',
+            field=models.CharField(default='Default desk', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='dutymanager',
+            name='slug',
+            field=models.SlugField(max_length=64, null=True),
+        ),
+        migrations.RunPython(assign_desk_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dutymanager',
+            name='slug',
+            field=models.SlugField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.1 on 2026-10-18 11:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import duties.models.duty_schedule
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('duties', '0010_dutymanager_desks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDuty',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('duty_id', models.PositiveIntegerField(unique=True)),
+                ('duty_start', models.DateTimeField()),
+                ('duty_end', models.DateTimeField()),
+                ('last_active', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('debtee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_duty_debt_set', to=settings.AUTH_USER_MODEL)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_duties', to='duties.DutySchedule')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_duty_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            bases=(duties.models.duty_schedule.DutyTimelineMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name='archivedduty',
+            index=models.Index(fields=['user', 'duty_start'], name='duties_archive_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedduty',
+            index=models.Index(fields=['duty_start'], name='duties_archive_start_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20190607_1237'),
+        ('duties', '0011_duty_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDutyStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='duty_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('duty_count', models.PositiveIntegerField(default=0)),
+                ('seconds_served', models.PositiveIntegerField(default=0)),
+                ('debts_owed', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'user duty stats',
+            },
+        ),
+    ]
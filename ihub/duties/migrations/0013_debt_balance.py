@@ -0,0 +1,49 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def book_existing_debts(apps, schema_editor):
+    DebtBalance = apps.get_model('duties', 'DebtBalance')
+    balances = {}
+    for model_name in ('Duty', 'ArchivedDuty'):
+        duties = (apps.get_model('duties', model_name).objects
+            .filter(user__isnull=False, debtee__isnull=False)
+            .values_list('debtee_id', 'user_id').annotate(amount=models.Count('id')).order_by())
+        for debtor, creditor, amount in duties:
+            balances[(debtor, creditor)] = balances.get((debtor, creditor), 0) + amount
+    DebtBalance.objects.bulk_create(
+        DebtBalance(debtor_id=debtor, creditor_id=creditor, amount=amount)
+        for (debtor, creditor), amount in balances.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('duties', '0012_user_duty_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DebtBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(default=0)),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_balances', to=settings.AUTH_USER_MODEL)),
+                ('debtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='debt_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='debtbalance',
+            index=models.Index(fields=['creditor'], name='duties_debt_creditor_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='debtbalance',
+            unique_together={('debtor', 'creditor')},
+        ),
+        migrations.RunPython(book_existing_debts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def backfill_duty_stats(apps, schema_editor):
+    # same figures as `manage.py rebuild_duty_stats`, for duties started
+    # before the stats table existed
+    UserDutyStats = apps.get_model('duties', 'UserDutyStats')
+    stats = {}
+    for model_name in ('Duty', 'ArchivedDuty'):
+        model = apps.get_model('duties', model_name)
+        served = (model.objects.filter(user__isnull=False)
+            .values_list('user_id', 'duty_start', 'duty_end').order_by())
+        for user_id, duty_start, duty_end in served.iterator():
+            stat = stats.setdefault(user_id, [0, 0, 0])
+            stat[0] += 1
+            stat[1] += int((duty_end - duty_start).total_seconds())
+        owed = (model.objects.filter(debtee__isnull=False)
+            .values_list('debtee_id').annotate(count=models.Count('id')).order_by())
+        for debtee_id, count in owed:
+            stats.setdefault(debtee_id, [0, 0, 0])[2] += count
+    UserDutyStats.objects.all().delete()
+    UserDutyStats.objects.bulk_create((
+        UserDutyStats(user_id=user_id, duty_count=count, seconds_served=served, debts_owed=owed)
+        for user_id, (count, served, owed) in stats.items()
+    ), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('duties', '0013_debt_balance'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_duty_stats, migrations.RunPython.noop),
+    ]
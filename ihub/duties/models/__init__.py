@@ -1,3 +1,7 @@
 # import all models here!
+from .duty_schedule import DutySchedule
 from .duty import Duty
-from .duty_manager import DutyManager
\ No newline at end of file
+from .duty_manager import DutyManager
+from .duty_archive import ArchivedDuty
+from .duty_stats import UserDutyStats
+from .debt_balance import DebtBalance
\ No newline at end of file
@@ -0,0 +1,82 @@
+from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.contrib.auth import get_user_model
+
+from utils.netting import net_positions, settle
+
+User = get_user_model()
+
+# pairs per UPDATE of `record_started`, each costs 5 parameters and SQLite
+# builds before 3.32 allow 999 per statement
+UPDATE_CHUNK_SIZE = 150
+
+
+class DebtBalanceManager(models.Manager):
+    """Ledger operations over per-pair debt balances.
+    """
+    def record_started(self, duties):
+        """Book one owed duty per duty served on someone else's behalf,
+        with one INSERT and one UPDATE per UPDATE_CHUNK_SIZE pairs.
+
+        Args:
+            duties (list): saved `Duty` instances
+        """
+        debts = {}
+        for duty in duties:
+            if duty.user_id and duty.debtee_id:
+                pair = (duty.debtee_id, duty.user_id)
+                debts[pair] = debts.get(pair, 0) + 1
+        if not debts:
+            return
+
+        self.bulk_create(
+            [self.model(debtor_id=debtor, creditor_id=creditor) for debtor, creditor in debts],
+            ignore_conflicts=True,
+        )
+        pairs = sorted(debts)
+        for i in range(0, len(pairs), UPDATE_CHUNK_SIZE):
+            chunk = pairs[i:i + UPDATE_CHUNK_SIZE]
+            matches = Q()
+            for debtor, creditor in chunk:
+                matches |= Q(debtor_id=debtor, creditor_id=creditor)
+            self.filter(matches).update(amount=F('amount') + Case(
+                *[When(debtor_id=debtor, creditor_id=creditor, then=Value(debts[debtor, creditor]))
+                    for debtor, creditor in chunk],
+                default=Value(0), output_field=models.IntegerField()
+            ))
+
+    def net_positions(self):
+        """Net position of every user in the ledger, one query.
+
+        Returns:
+            dict: user id -> duties owed to the user minus duties the user owes
+        """
+        return net_positions(self.values_list('debtor_id', 'creditor_id', 'amount').iterator())
+
+    def settlement(self):
+        """Net transfers clearing every balance of the ledger.
+
+        Returns:
+            list: (debtor id, creditor id, duties) transfers
+        """
+        return settle(self.net_positions())
+
+
+class DebtBalance(models.Model):
+    """Duties `debtor` owes `creditor`, i.e. duties the creditor served on
+    the debtor's behalf. One row per ordered pair, updated as duties start.
+    """
+    debtor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='debt_balances')
+    creditor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='credit_balances')
+    amount = models.PositiveIntegerField(default=0)
+
+    objects = DebtBalanceManager()
+
+    class Meta:
+        unique_together = ('debtor', 'creditor')
+        indexes = [
+            models.Index(fields=['creditor'], name='duties_debt_creditor_idx'),
+        ]
+
+    def __str__(self):
+        return "User {} owes user {} {} duties".format(self.debtor_id, self.creditor_id, self.amount)
@@ -4,13 +4,18 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from bridge.tracing import traced
 from duties.models.duty_manager import DutyManager
+from duties.models.duty_schedule import DutySchedule, DutyTimelineMixin
+from duties.models.debt_balance import DebtBalance
+from duties.models.duty_stats import UserDutyStats
 
 User = get_user_model()
 
 
-class Duty(models.Model):
-    # Task duration constant (minutes)
+class Duty(DutyTimelineMixin, models.Model):
+    # Default schedule constants (minutes), see DutySchedule
+    # Task duration constant
     TASK_WINDOW = 30
 
     # Task start mark from duty_start
@@ -30,41 +35,54 @@ class Duty(models.Model):
     manager = models.ForeignKey(DutyManager, on_delete=models.SET_NULL,
         blank=True, null=True, related_name='active_duties')
 
-    duty_start = models.DateTimeField(editable=False)
-    task1_start = models.DateTimeField(editable=False)
-    task2_start = models.DateTimeField(editable=False)
-    task3_start = models.DateTimeField(editable=False)
+    schedule = models.ForeignKey(DutySchedule, on_delete=models.PROTECT,
+        editable=False, related_name='duties')
 
+    # task boundaries are computed from schedule, duty_end is stored as it
+    # may be warped by update_duty_end and drives every active duty lookup
+    duty_start = models.DateTimeField(editable=False)
     duty_end =  models.DateTimeField(editable=False)
-    task1_end = models.DateTimeField(editable=False)
-    task2_end = models.DateTimeField(editable=False)
-    task3_end = models.DateTimeField(editable=False)
 
     last_active = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # active duties of a manager (detached history is left out)
+            models.Index(fields=['manager', 'duty_end'], name='duties_duty_active_idx',
+                condition=models.Q(manager__isnull=False)),
+            # duties of a user by end time (ongoing duty lookup)
+            models.Index(fields=['user', 'duty_end'], name='duties_duty_user_end_idx'),
+            # admin changelist ordering
+            models.Index(fields=['duty_start', 'last_active'], name='duties_duty_start_idx'),
+        ]
+
     ########################################
     # models.Model methods override
     ########################################
 
+    @traced()
     def save(self, *args, **kwargs):
-        now = timezone.localtime()
         # Creation
         if not self.id:
-            # starting marker
-            self.duty_start = now
-            self.task1_start = now + timedelta(minutes=Duty.TASK1_MARK)
-            self.task2_start = now + timedelta(minutes=Duty.TASK2_MARK)
-            self.task3_start = now + timedelta(minutes=Duty.TASK3_MARK)
-            # ending marker
-            self.duty_end = now + timedelta(minutes=Duty.DUTY_DURATION)
-            self.task1_end = self.task1_start + timedelta(minutes=Duty.TASK_WINDOW)
-            self.task2_end = self.task2_start + timedelta(minutes=Duty.TASK_WINDOW)
-            self.task3_end = self.task3_start + timedelta(minutes=Duty.TASK_WINDOW)
-            # last active
-            self.last_active = now
+            self.initialise_timings(timezone.localtime())
+            super(Duty, self).save(*args, **kwargs)
+            UserDutyStats.objects.record_started([self])
+            DebtBalance.objects.record_started([self])
+            return
         # Update save
         return super(Duty, self).save(*args, **kwargs)
 
+    def initialise_timings(self, now):
+        """Stamp duty and tasks timeline starting from `now`.
+        """
+        if self.schedule_id is None:
+            self.schedule = DutySchedule.get_default()
+        # starting & ending marker
+        self.duty_start = now
+        self.duty_end = now + timedelta(minutes=self.timetable.duty_duration)
+        # last active
+        self.last_active = now
+
     ########################################
     # Display Purposes
     ########################################
@@ -101,19 +119,20 @@ class Duty(models.Model):
     def is_finished(self):
         return self.duty_end <= timezone.now()
 
+    @property
+    def version(self):
+        # token of the duty state shown to clients, see duty details ETag
+        last_active = self.last_active.timestamp() if self.last_active else ''
+        return "%d:%r:%r" % (self.id, self.duty_end.timestamp(), last_active)
+
     # Caution: warp duty_end time back to now
     def force_finish_duty(self):
-        if self.is_finished != True:
+        if not self.is_finished():
             self.update_duty_end(timezone.now())
 
+    @traced()
     def update_duty_end(self, duty_end):
-        # update the task end if task_end > new duty_end
-        if self.task1_end < duty_end:
-            self.task1_end = duty_end
-        if self.task2_end < duty_end:
-            self.task2_end = duty_end
-        if self.task3_end < duty_end:
-            self.task3_end = duty_end
-        # finally update the duty_end
-        self.duty_end = duty_end
+        # task ends past the new duty_end are clamped by the timetable
+        old_duty_end, self.duty_end = self.duty_end, duty_end
         self.save()
+        UserDutyStats.objects.record_duty_end_change(self, old_duty_end)
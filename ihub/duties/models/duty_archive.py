@@ -0,0 +1,69 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+
+from duties.models.duty_schedule import DutySchedule, DutyTimelineMixin
+
+User = get_user_model()
+
+
+class ArchivedDutyQuerySet(models.QuerySet):
+    """Read API of the archive tier.
+    """
+    def of_user(self, user):
+        return self.filter(user=user)
+
+    def debts_of(self, debtee):
+        return self.filter(debtee=debtee)
+
+    def between(self, start, end):
+        # duties started within [start, end)
+        return self.filter(duty_start__gte=start, duty_start__lt=end)
+
+
+class ArchivedDuty(DutyTimelineMixin, models.Model):
+    """Finished duty moved out of the hot `Duty` table by `archive_duties`.
+    """
+    duty_id = models.PositiveIntegerField(unique=True) # pk in the hot table
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+        blank=True, null=True, related_name='archived_duty_set')
+
+    debtee = models.ForeignKey(User, on_delete=models.SET_NULL,
+        blank=True, null=True, related_name='archived_duty_debt_set')
+
+    schedule = models.ForeignKey(DutySchedule, on_delete=models.PROTECT,
+        related_name='archived_duties')
+
+    duty_start = models.DateTimeField()
+    duty_end = models.DateTimeField()
+    last_active = models.DateTimeField(null=True, blank=True)
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ArchivedDutyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'duty_start'], name='duties_archive_user_idx'),
+            models.Index(fields=['duty_start'], name='duties_archive_start_idx'),
+        ]
+
+    ########################################
+    # Display Purposes
+    ########################################
+
+    def __str__(self):
+        return "Archived duty {} | {: %d %b %Y, %H:%M:%S} | to | {: %d %b %Y, %H:%M:%S} |".format(
+            self.duty_id, self.duty_start, self.duty_end)
+
+    ########################################
+    # Archive methods
+    ########################################
+
+    @classmethod
+    def from_duty(cls, duty):
+        return cls(
+            duty_id=duty.id, user_id=duty.user_id, debtee_id=duty.debtee_id,
+            schedule_id=duty.schedule_id, duty_start=duty.duty_start,
+            duty_end=duty.duty_end, last_active=duty.last_active,
+        )
@@ -1,13 +1,24 @@
+import threading
+import time
 from datetime import datetime, timedelta
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from utils.singletons import SingletonModel
 from bridge.decorators import manager_refresh
+from bridge.tracing import traced
+from duties.cache import get_cache
+from duties.conf import duty_settings
+from duties.events import wake_event_producer
+from duties.models.debt_balance import DebtBalance
+from duties.models.duty_stats import UserDutyStats
+from duties.snapshot import get_snapshot, publish_snapshot, snapshot_generation
+from duties.sweeper import request_sweep
 from bridge.constants.errors import (
-	MaxDutyCountError, UnfinishedDutyError
+	DuplicateAssignmentError, MaxDutyCountError, SelfDebtError,
+	UnfinishedDutyError, UserNotFoundError
 )
 
 User = get_user_model()
@@ -18,36 +29,203 @@ class ManagerMixin(object):
 	def refresh(self):
 		raise NotImplementedError
 
-class DutyManager(SingletonModel, ManagerMixin):
+class DutyManager(models.Model, ManagerMixin):
+	"""Manager of the duties of one desk. Each desk admits duties up to its
+	own capacity, admissions of different desks lock different rows.
+	"""
+	# default capacity of a desk
 	MAX_DUTY = 1
+	DEFAULT_SLUG = 'default'
+
+	name = models.CharField(max_length=64, default="Default desk")
+	slug = models.SlugField(max_length=64, unique=True)
+	capacity = models.PositiveIntegerField(default=MAX_DUTY)
+
+	# bumped on every admission, serves as the row lock
+	revision = models.PositiveIntegerField(default=0, editable=False)
+
+	# memoized rows of `load`, {slug: (expiry, db alias, field values)}
+	_cache = {}
+	_cache_lock = threading.Lock()
+
+	########################################
+	# Loading
+	########################################
+
+	@classmethod
+	def load(cls, slug=None):
+		"""Manager of the desk with given slug, the default desk if None.
+
+		Rows are memoized per process for MANAGER_CACHE_TTL seconds and
+		dropped on local saves and deletes, every call gets its own
+		instance. Admissions re-read capacity under the row lock, so a
+		memoized row never lets a desk overshoot.
+		"""
+		slug = slug or cls.DEFAULT_SLUG
+		with cls._cache_lock:
+			cached = cls._cache.get(slug)
+		if cached is not None and cached[0] > time.monotonic():
+			return cls.from_db(cached[1], [field.attname for field in cls._meta.concrete_fields], cached[2])
+
+		if slug == cls.DEFAULT_SLUG:
+			obj, created = cls.objects.get_or_create(slug=slug)
+		else:
+			obj = cls.objects.get(slug=slug)
+		# a row read inside a transaction may still be rolled back
+		ttl = duty_settings.MANAGER_CACHE_TTL
+		if ttl and not transaction.get_connection(obj._state.db).in_atomic_block:
+			values = [getattr(obj, field.attname) for field in cls._meta.concrete_fields]
+			with cls._cache_lock:
+				cls._cache[slug] = (time.monotonic() + ttl, obj._state.db, values)
+		return obj
+
+	@classmethod
+	def clear_cache(cls):
+		with cls._cache_lock:
+			cls._cache.clear()
 
 	########################################
 	# Active Duties
 	########################################
 
-	@manager_refresh
+	@traced()
 	def start_duty(self, user, debtee=None):
-		# check MAX_DUTY threshold condition
-		if self.active_duties.count() >= DutyManager.MAX_DUTY:
-			raise MaxDutyCountError
-		# check user has no active duty before
-		if self.is_onduty(user):
-			duty_end = self.get_duties_of(user)[0].duty_end # take the first active
-			raise UnfinishedDutyError(duty_end=duty_end)
-
-		duty = self.active_duties.create()
-		user.duty_set.add(duty)
-		if debtee:
-			debtee.duty_debt_set.add(duty)
-			debtee.save()
-		user.save(); duty.save()
+		"""Admit a new duty for user in one transaction.
+
+		The manager row is locked first (bumping `revision`) so concurrent
+		admissions of this desk are serialized and capacity cannot be
+		overshot, then the user row, so admissions of the same user at other
+		desks are too. Capacity and duplicate checks are answered by one aggregate,
+		then the duty is inserted with all relations set. Statement count
+		does not depend on the size of the duty table.
+		"""
+		with transaction.atomic():
+			self.begin_admission()
+			# desk rows are always locked before user rows, no deadlock
+			list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+
+			# count this desk, but a user cannot be on duty at two desks
+			Duty = self.active_duties.model
+			admission = Duty.objects.filter(
+				Q(manager=self) | Q(user=user),
+				manager__isnull=False, duty_end__gt=timezone.now(),
+			).aggregate(
+				active_count=Count('id', filter=Q(manager=self)),
+				user_duty_end=Max('duty_end', filter=Q(user=user)),
+			)
+			# check capacity threshold condition
+			if admission['active_count'] >= self.capacity:
+				raise MaxDutyCountError
+			# check user has no active duty before
+			if admission['user_duty_end'] is not None:
+				raise UnfinishedDutyError(duty_end=admission['user_duty_end'])
+
+			duty = self.active_duties.create(user=user, debtee=debtee)
 		return duty
 
+	@traced()
+	def start_duties(self, assignments):
+		"""Admit a roster of duties in one transaction.
+
+		Users and debtees are resolved by matric no. and the whole batch is
+		validated against capacity and ongoing duties with set-based queries,
+		then inserted with one bulk INSERT. Items are admitted in order until
+		capacity runs out.
+
+		Args:
+			assignments (list): dicts with `matric` of the user on duty and
+				optional `debtee` matric
+
+		Returns:
+			list: per-item dicts with `success`, `message` and `duty` (None on failure)
+		"""
+		Duty = self.active_duties.model
+		matrics = set()
+		for assignment in assignments:
+			matrics.add(assignment.get('matric'))
+			if assignment.get('debtee'):
+				matrics.add(assignment['debtee'])
+
+		with transaction.atomic():
+			self.begin_admission()
+			now = timezone.now()
+			# lock users (in pk order) against admissions at other desks
+			users = {user.matric: user for user in User.objects.select_for_update().filter(
+				matric__in=matrics).order_by('pk')}
+			ongoing = Duty.objects.filter(
+				Q(manager=self) | Q(user__in=users.values()),
+				manager__isnull=False, duty_end__gt=now,
+			).values_list('manager_id', 'user_id', 'duty_end')
+
+			active_count = 0
+			onduty_ends = {}
+			for manager_id, user_id, duty_end in ongoing:
+				active_count += (manager_id == self.pk)
+				onduty_ends[user_id] = duty_end
+
+			results, duties, assigned = [], [], set()
+			for assignment in assignments:
+				matric, debtee_matric = assignment.get('matric'), assignment.get('debtee')
+				user, debtee = users.get(matric), users.get(debtee_matric)
+				try:
+					if user is None:
+						raise UserNotFoundError(matric)
+					if debtee_matric and debtee is None:
+						raise UserNotFoundError(debtee_matric)
+					if debtee == user:
+						raise SelfDebtError
+					if matric in assigned:
+						raise DuplicateAssignmentError(matric)
+					if user.id in onduty_ends:
+						raise UnfinishedDutyError(duty_end=onduty_ends[user.id])
+					if active_count + len(duties) >= self.capacity:
+						raise MaxDutyCountError
+				except (UserNotFoundError, SelfDebtError, DuplicateAssignmentError,
+						UnfinishedDutyError, MaxDutyCountError) as e:
+					results.append({'success': False, 'message': e.message, 'duty': None})
+					continue
+
+				duty = Duty(user=user, debtee=debtee, manager=self)
+				duty.initialise_timings(now)
+				assigned.add(matric)
+				duties.append(duty)
+				results.append({'success': True, 'message': "Duty started", 'duty': duty})
+
+			if duties:
+				# bulk INSERT sends no post_save, invalidate explicitly
+				Duty.objects.bulk_create(duties)
+				UserDutyStats.objects.record_started(duties)
+				DebtBalance.objects.record_started(duties)
+				self.cache.invalidate()
+				transaction.on_commit(self.cache.invalidate)
+				transaction.on_commit(publish_snapshot)
+				transaction.on_commit(wake_event_producer)
+		return results
+
+	@traced()
+	def begin_admission(self):
+		"""Lock the manager and refresh state admission decisions rely on.
+		"""
+		self.lock()
+		# capacity may have been changed since this instance was loaded
+		self.refresh_from_db(fields=['capacity'])
+		if not duty_settings.LAZY_EXPIRY:
+			# detach finished duties with a single UPDATE
+			self.filter_finished_duties().update(manager=None)
+		else:
+			# detached off the request path, debounced by the sweeper
+			transaction.on_commit(request_sweep)
+
+	def filter_current_duties(self):
+		# duties which end is still ahead, finished ones may not be detached yet
+		return self.active_duties.filter(duty_end__gt=timezone.now())
+
 	def filter_finished_duties(self):
 		# filter duties which end has passed
 		finished_duties = self.active_duties.filter(duty_end__lte=timezone.now())
 		return finished_duties
 
+	@traced()
 	def remove_finished_duties(self):
 		# filter duties which end has passed
 		finished_duties = self.filter_finished_duties()
@@ -56,13 +234,17 @@ class DutyManager(SingletonModel, ManagerMixin):
 			self.active_duties.remove(*finished_duties, bulk=True)
 		return finished_duties # tuple
 
+	@traced()
 	@manager_refresh
 	def get_duties_of(self, user):
+		if duty_settings.CACHE_ACTIVE_DUTIES:
+			return self.cache.get_duties(user.id, self.load_current_duties, snapshot_generation)
 		user_active_duties = tuple(
-			duty for duty in self.active_duties.filter(user__email=user.email)
+			duty for duty in self.filter_current_duties().filter(user=user).select_related('debtee')
 		)
 		return user_active_duties # tuple
 
+	@traced()
 	def remove_duties_of(self, user):
 		# check defensively if user ever has duty
 		if user.duty_set.count() == 0:
@@ -71,27 +253,72 @@ class DutyManager(SingletonModel, ManagerMixin):
 		# remove if any duty of user in manager 
 		if user_active_duties:
 			self.active_duties.remove(*user_active_duties, bulk=True)
+			self.cache.invalidate()
+			transaction.on_commit(publish_snapshot)
+			transaction.on_commit(wake_event_producer)
 		return user_active_duties # tuple
 
 	########################################
 	# Onduty User
 	########################################
 
+	@traced()
 	@manager_refresh
 	def get_onduty_user_ids(self):
-		onduty_user_ids = self.active_duties.values_list('user') # QuerySet<[(pk,), (pk,), ...]>
-		return map(lambda tup: tup[0], onduty_user_ids)
+		if duty_settings.CACHE_ACTIVE_DUTIES:
+			return self.cache.get_user_ids(self.load_current_duties, snapshot_generation)
+		onduty_user_ids = self.filter_current_duties().values_list('user', flat=True)
+		return list(onduty_user_ids)
 
+	@traced()
+	@manager_refresh
 	def is_onduty(self, user):
-		onduty_user_ids = self.get_onduty_user_ids() # map object
-		return (user.id in onduty_user_ids)
+		if duty_settings.CACHE_ACTIVE_DUTIES:
+			return self.cache.has_duties(user.id, self.load_current_duties, snapshot_generation)
+		return self.filter_current_duties().filter(user=user).exists()
+
+	########################################
+	# Active Duties Cache
+	########################################
+
+	@property
+	def cache(self):
+		# shared by every instance of this manager row in the process
+		return get_cache(self.pk)
+
+	@traced()
+	def load_current_duties(self):
+		# shared snapshot first, it is current across worker processes
+		snapshot = get_snapshot()
+		if snapshot is not None:
+			duties = snapshot.get_duties(self.pk)
+			if duties is not None:
+				return duties
+		return list(self.filter_current_duties().select_related('debtee'))
+
+	def cache_stats(self):
+		return self.cache.stats()
 
 	########################################
 	# General Methods
 	########################################
 
 	def refresh(self):
-		self.remove_finished_duties()
+		# with lazy expiry finished duties are detached by the sweeper only
+		if not duty_settings.LAZY_EXPIRY:
+			self.remove_finished_duties()
+
+	def lock(self):
+		"""Take the write lock on manager row for the ongoing transaction.
+		"""
+		DutyManager.objects.filter(pk=self.pk).update(revision=F('revision') + 1)
+
+	def __str__(self):
+		return "%s (%d max)" % (self.name, self.capacity)
 
+	@traced()
 	def reset(self):
 		self.active_duties.clear()
+		self.cache.invalidate()
+		transaction.on_commit(publish_snapshot)
+		transaction.on_commit(wake_event_producer)
@@ -0,0 +1,136 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.db import models
+
+from duties.conf import duty_settings
+
+
+class DutySchedule(models.Model):
+    """Timeline template of duties: duration, and start mark and window of
+    each task, in minutes from duty start. Task boundaries of a duty are
+    computed from its schedule, so create a new schedule rather than editing
+    one which duties already use (the admin shows those read-only).
+
+    Schedules are cached per process for SCHEDULE_CACHE_TTL seconds, and
+    dropped on local saves and deletes.
+    """
+    DEFAULT_NAME = 'default'
+    TIMELINE_FIELDS = ('duty_duration', 'task_window', 'task1_mark', 'task2_mark', 'task3_mark')
+
+    # process-wide cache {pk or name: (expiry, schedule)}, schedules are read
+    # for every duty
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    name = models.CharField(max_length=64, unique=True)
+
+    duty_duration = models.PositiveIntegerField(default=180)
+    task_window = models.PositiveIntegerField(default=30)
+    task1_mark = models.PositiveIntegerField(default=30)
+    task2_mark = models.PositiveIntegerField(default=90)
+    task3_mark = models.PositiveIntegerField(default=150)
+
+    ########################################
+    # Display Purposes
+    ########################################
+
+    def __str__(self):
+        return "%s schedule (%d min)" % (self.name, self.duty_duration)
+
+    ########################################
+    # Schedule methods
+    ########################################
+
+    def is_used(self):
+        """Whether duties, hot or archived, follow this schedule.
+        """
+        return self.duties.exists() or self.archived_duties.exists()
+
+    def get_task_marks(self):
+        return (self.task1_mark, self.task2_mark, self.task3_mark)
+
+    def task_bounds(self, duty_start, duty_end, task):
+        """Start and end of task (1-indexed) of a duty started at duty_start.
+        A task never ends after its duty.
+        """
+        task_start = duty_start + timedelta(minutes=self.get_task_marks()[task - 1])
+        task_end = task_start + timedelta(minutes=self.task_window)
+        return task_start, min(task_end, duty_end)
+
+    @classmethod
+    def lookup(cls, pk):
+        """Cached schedule by primary key.
+        """
+        schedule = cls._cached(pk)
+        if schedule is None:
+            schedule = cls.objects.get(pk=pk)
+            cls._store(schedule, pk)
+        return schedule
+
+    @classmethod
+    def get_default(cls):
+        """Cached schedule used by new duties.
+        """
+        schedule = cls._cached(cls.DEFAULT_NAME)
+        if schedule is None:
+            schedule, created = cls.objects.get_or_create(name=cls.DEFAULT_NAME)
+            cls._store(schedule, cls.DEFAULT_NAME, schedule.pk)
+        return schedule
+
+    @classmethod
+    def _cached(cls, key):
+        with cls._cache_lock:
+            cached = cls._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return None
+
+    @classmethod
+    def _store(cls, schedule, *keys):
+        # edits by other processes are seen once the entry expires
+        ttl = duty_settings.SCHEDULE_CACHE_TTL
+        if ttl:
+            expiry = time.monotonic() + ttl
+            with cls._cache_lock:
+                for key in keys:
+                    cls._cache[key] = (expiry, schedule)
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._cache.clear()
+
+
+class DutyTimelineMixin(object):
+    """Task boundaries of a model with `schedule`, `duty_start` and `duty_end`.
+    """
+    @property
+    def timetable(self):
+        # cached schedule, avoids a query per duty
+        return DutySchedule.lookup(self.schedule_id)
+
+    @property
+    def task1_start(self):
+        return self.timetable.task_bounds(self.duty_start, self.duty_end, 1)[0]
+
+    @property
+    def task1_end(self):
+        return self.timetable.task_bounds(self.duty_start, self.duty_end, 1)[1]
+
+    @property
+    def task2_start(self):
+        return self.timetable.task_bounds(self.duty_start, self.duty_end, 2)[0]
+
+    @property
+    def task2_end(self):
+        return self.timetable.task_bounds(self.duty_start, self.duty_end, 2)[1]
+
+    @property
+    def task3_start(self):
+        return self.timetable.task_bounds(self.duty_start, self.duty_end, 3)[0]
+
+    @property
+    def task3_end(self):
+        return self.timetable.task_bounds(self.duty_start, self.duty_end, 3)[1]
@@ -0,0 +1,133 @@
+from django.db import models
+from django.db.models import Case, Count, F, Value, When
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+# users per UPDATE of `record_started`, each costs 7 parameters and SQLite
+# builds before 3.32 allow 999 per statement
+UPDATE_CHUNK_SIZE = 100
+
+
+def seconds_served(duty_start, duty_end):
+    # whole seconds of one duty, summed per duty so that incremental
+    # updates and rebuilds agree to the second
+    return int((duty_end - duty_start).total_seconds())
+
+
+class UserDutyStatsManager(models.Manager):
+    """Incremental maintenance of per-user duty statistics.
+    """
+    def for_user(self, user):
+        """Stats of `user`, unsaved zero stats if the user never had a duty.
+        """
+        try:
+            return self.get(user_id=user.id)
+        except self.model.DoesNotExist:
+            return self.model(user_id=user.id)
+
+    def record_started(self, duties):
+        """Credit newly started duties, with one INSERT and one UPDATE per
+        UPDATE_CHUNK_SIZE users.
+
+        Users are credited the scheduled duration of their duty and debtees
+        one debt per duty served on their behalf.
+
+        Args:
+            duties (list): saved `Duty` instances
+        """
+        stats = {}
+        for duty in duties:
+            if duty.user_id:
+                count, served, owed = stats.get(duty.user_id, (0, 0, 0))
+                served += seconds_served(duty.duty_start, duty.duty_end)
+                stats[duty.user_id] = (count + 1, served, owed)
+            if duty.debtee_id:
+                count, served, owed = stats.get(duty.debtee_id, (0, 0, 0))
+                stats[duty.debtee_id] = (count, served, owed + 1)
+        if not stats:
+            return
+
+        self.bulk_create([self.model(user_id=user_id) for user_id in stats], ignore_conflicts=True)
+        user_ids = sorted(stats)
+        for i in range(0, len(user_ids), UPDATE_CHUNK_SIZE):
+            chunk = {user_id: stats[user_id] for user_id in user_ids[i:i + UPDATE_CHUNK_SIZE]}
+            self.filter(user_id__in=chunk).update(
+                duty_count=F('duty_count') + self._delta(chunk, 0),
+                seconds_served=F('seconds_served') + self._delta(chunk, 1),
+                debts_owed=F('debts_owed') + self._delta(chunk, 2),
+            )
+
+    def record_duty_end_change(self, duty, old_duty_end):
+        """Adjust served time of `duty`'s user after its end moved.
+        """
+        if duty.user_id is None:
+            return
+        delta = (seconds_served(duty.duty_start, duty.duty_end)
+            - seconds_served(duty.duty_start, old_duty_end))
+        if delta:
+            self.filter(user_id=duty.user_id).update(seconds_served=F('seconds_served') + delta)
+
+    def rebuild(self, user_ids):
+        """Recompute stats of `user_ids` from the hot table and the archive.
+
+        Args:
+            user_ids (list): ids of the users to recompute
+
+        Returns:
+            int: number of stats rows written
+        """
+        from duties.models import ArchivedDuty, Duty
+
+        stats = {user_id: self.model(user_id=user_id) for user_id in user_ids}
+        for model in (Duty, ArchivedDuty):
+            served = (model.objects.filter(user_id__in=user_ids)
+                .values_list('user_id', 'duty_start', 'duty_end').order_by())
+            for user_id, duty_start, duty_end in served.iterator():
+                stat = stats[user_id]
+                stat.duty_count += 1
+                stat.seconds_served += seconds_served(duty_start, duty_end)
+            owed = (model.objects.filter(debtee_id__in=user_ids)
+                .values('debtee_id').annotate(count=Count('id'))
+                .order_by())
+            for row in owed:
+                stats[row['debtee_id']].debts_owed += row['count']
+
+        rows = [stat for stat in stats.values() if stat.duty_count or stat.debts_owed]
+        self.filter(user_id__in=user_ids).delete()
+        self.bulk_create(rows)
+        return len(rows)
+
+    @staticmethod
+    def _delta(stats, column):
+        # per-user increment of one column inside a single UPDATE
+        return Case(
+            *[When(user_id=user_id, then=Value(values[column])) for user_id, values in stats.items()],
+            default=Value(0), output_field=models.IntegerField()
+        )
+
+
+class UserDutyStats(models.Model):
+    """Denormalized duty statistics of a user, maintained as duties start
+    and finish early so profile pages read a single row.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+        primary_key=True, related_name='duty_stats')
+
+    duty_count = models.PositiveIntegerField(default=0)
+    # scheduled time of every duty, an ongoing duty counts in full
+    seconds_served = models.PositiveIntegerField(default=0)
+    # duties others served on this user's behalf
+    debts_owed = models.PositiveIntegerField(default=0)
+
+    objects = UserDutyStatsManager()
+
+    class Meta:
+        verbose_name_plural = 'user duty stats'
+
+    def __str__(self):
+        return "Duty stats of user {}".format(self.user_id)
+
+    @property
+    def hours_served(self):
+        return round(self.seconds_served / 3600, 1)
@@ -0,0 +1,44 @@
+"""
+Module renderers.py
+
+Renderers for duty endpoints answering in something else than JSON.
+
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError: # optional, the v2 API then only speaks JSON
+    msgpack = None
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets `text/event-stream` requests through content negotiation, the
+    view streams the body itself.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # only error responses are rendered, as a single comment line
+        return (": %s\n\n" % data).encode(self.charset)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack bodies, for clients sending `Accept: application/msgpack`.
+    Needs the optional `msgpack` package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True)
+
+
+# renderers of the v2 API, JSON first as the default
+API_V2_RENDERERS = (JSONRenderer, ) + ((MessagePackRenderer, ) if msgpack is not None else ())
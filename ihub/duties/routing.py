@@ -0,0 +1,41 @@
+"""
+Module routing.py
+
+Resolve the desk (DutyManager) a request is addressed to. Clients name the
+desk by slug in the `desk` query parameter, the `desk` field of the body or
+the `X-Duty-Desk` header. Requests naming no desk go to the default desk.
+
+"""
+from collections.abc import Mapping
+
+from django.http import Http404
+
+from duties.models import DutyManager
+
+DESK_PARAM = 'desk'
+DESK_HEADER = 'HTTP_X_DUTY_DESK'
+
+
+def get_desk_slug(request):
+    data = getattr(request, 'data', None)
+    if not isinstance(data, Mapping):
+        # no body, or a JSON array
+        data = {}
+    slug = request.GET.get(DESK_PARAM) or data.get(DESK_PARAM)
+    if slug is None or slug == '':
+        # empty lists or objects are kept, get_manager refuses them
+        slug = request.META.get(DESK_HEADER) or None
+    return slug
+
+
+def get_manager(request):
+    """DutyManager of the desk addressed by request, 404 if unknown.
+    """
+    slug = get_desk_slug(request)
+    if slug is not None and not isinstance(slug, str):
+        # e.g. a list or an object in a JSON body
+        raise Http404("Desks are named by slug")
+    try:
+        return DutyManager.load(slug)
+    except DutyManager.DoesNotExist:
+        raise Http404("No desk matches '%s'" % slug)
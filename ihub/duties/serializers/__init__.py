@@ -1,2 +1,3 @@
 # import serializers here!
-from .duty import DutySerializer
\ No newline at end of file
+from .duty import DutySerializer, DutyV2Serializer
+from .fast import FastDutySerializer, FastDutyV2Serializer
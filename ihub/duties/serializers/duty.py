@@ -1,6 +1,9 @@
+from django.db import models
+
 from rest_framework import serializers
 
 from duties.models import Duty
+from duties.serializers.fields import EpochMillisecondsField
 from users.serializers import UserSerializer
 
 class DutySerializer(serializers.ModelSerializer):
@@ -8,6 +11,14 @@ class DutySerializer(serializers.ModelSerializer):
     """
     debtee = UserSerializer()
 
+    # computed from the duty schedule
+    task1_start = serializers.DateTimeField(read_only=True)
+    task1_end = serializers.DateTimeField(read_only=True)
+    task2_start = serializers.DateTimeField(read_only=True)
+    task2_end = serializers.DateTimeField(read_only=True)
+    task3_start = serializers.DateTimeField(read_only=True)
+    task3_end = serializers.DateTimeField(read_only=True)
+
     class Meta:
         model = Duty
         fields = (
@@ -17,3 +28,17 @@ class DutySerializer(serializers.ModelSerializer):
             'task3_start', 'task3_end',
             'last_active', 'debtee',
         )
+
+
+class DutyV2Serializer(DutySerializer):
+    """Duty object serializer of the v2 API, datetimes as epoch milliseconds
+    """
+    serializer_field_mapping = dict(DutySerializer.serializer_field_mapping)
+    serializer_field_mapping[models.DateTimeField] = EpochMillisecondsField
+
+    task1_start = EpochMillisecondsField()
+    task1_end = EpochMillisecondsField()
+    task2_start = EpochMillisecondsField()
+    task2_end = EpochMillisecondsField()
+    task3_start = EpochMillisecondsField()
+    task3_end = EpochMillisecondsField()
@@ -0,0 +1,186 @@
+import re
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from duties.models import Duty, DutySchedule
+from duties.serializers.fields import epoch_milliseconds
+
+User = get_user_model()
+
+TASKS = (1, 2, 3)
+DEBTEE_FIELDS = ('name', 'email', 'matric')
+QUARTER = timedelta(minutes=15)
+
+
+class DateTimeFormat(object):
+    """A strftime format compiled once into a %-template over datetime
+    attributes, applied to many datetimes at a time.
+
+    Formats with directives other than the numeric ones below (names,
+    ISO 8601, ...) go through the DRF field, one value at a time.
+    """
+    DIRECTIVES = {
+        'Y': ('year', '%04d'), 'm': ('month', '%02d'), 'd': ('day', '%02d'),
+        'H': ('hour', '%02d'), 'M': ('minute', '%02d'), 'S': ('second', '%02d'),
+        'f': ('microsecond', '%06d'),
+    }
+    _compiled = {}
+
+    def __init__(self, output_format):
+        self.output_format = output_format
+        self.template, self.attributes = self.compile(output_format)
+
+    @classmethod
+    def get(cls, output_format):
+        if output_format not in cls._compiled:
+            cls._compiled[output_format] = cls(output_format)
+        return cls._compiled[output_format]
+
+    @classmethod
+    def compile(cls, output_format):
+        if not output_format or output_format.lower() == 'iso-8601':
+            return None, None
+        template, attributes = [], []
+        for literal, directive in re.findall(r'([^%]*)(%.?)?', output_format):
+            template.append(literal.replace('%', '%%'))
+            if not directive:
+                continue
+            if directive == '%%':
+                template.append('%%')
+            elif directive[1:] in cls.DIRECTIVES:
+                attribute, conversion = cls.DIRECTIVES[directive[1:]]
+                template.append(conversion)
+                attributes.append(attribute)
+            else:
+                return None, None
+        return ''.join(template), attributes
+
+    def format_many(self, values):
+        """Format datetimes as DRF's DateTimeField would, None stays None.
+        """
+        if self.template is None:
+            field = serializers.DateTimeField(format=self.output_format)
+            return [field.to_representation(value) for value in values]
+
+        # as DRF: current timezone, or naive UTC without timezone support
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else timezone.utc
+        template, attributes = self.template, self.attributes
+        offsets = {}
+        formatted = []
+        for value in values:
+            if value is None:
+                formatted.append(None)
+                continue
+            if timezone.is_aware(value):
+                utc = value.replace(tzinfo=None) - value.utcoffset()
+                value = utc + self.utc_offset(utc, current_timezone, offsets)
+            formatted.append(template % tuple(getattr(value, name) for name in attributes))
+        return formatted
+
+    @staticmethod
+    def utc_offset(utc, tzinfo, offsets):
+        """Offset of `tzinfo` at naive UTC datetime `utc`.
+
+        Zone transitions fall on quarter hours of UTC, offsets are memoized
+        per quarter hour when it has no transition (same offset at both ends).
+        """
+        quarter = utc.replace(minute=utc.minute - utc.minute % 15, second=0, microsecond=0)
+        offset = offsets.get(quarter)
+        if offset is None:
+            start = timezone.make_aware(quarter, timezone.utc).astimezone(tzinfo).utcoffset()
+            end = timezone.make_aware(quarter + QUARTER, timezone.utc).astimezone(tzinfo).utcoffset()
+            if start != end:
+                return timezone.make_aware(utc, timezone.utc).astimezone(tzinfo).utcoffset()
+            offset = offsets[quarter] = start
+        return offset
+
+
+class FastDutySerializer(object):
+    """Read-only serializer of Duty lists, giving the same data (hence the
+    same rendered JSON) as `DutySerializer(duties, many=True)`.
+
+    Debtees missing from the instances are read in one query of the three
+    columns needed, task bounds come from the cached schedules and all
+    datetimes of the list are formatted in one pass.
+    """
+    def __init__(self, duties):
+        self.duties = list(duties)
+
+    @property
+    def data(self):
+        rows, missing = [], set()
+        for duty in self.duties:
+            debtee = None
+            if duty.debtee_id is not None:
+                if Duty.debtee.is_cached(duty):
+                    debtee = tuple(getattr(duty.debtee, field) for field in DEBTEE_FIELDS)
+                else:
+                    missing.add(duty.debtee_id)
+            rows.append((duty.schedule_id, duty.duty_start, duty.duty_end,
+                duty.last_active, duty.debtee_id, debtee))
+
+        debtees = {}
+        if missing:
+            for row in User.objects.filter(id__in=missing).values_list('id', *DEBTEE_FIELDS):
+                debtees[row[0]] = row[1:]
+        return self.serialize_rows(rows, debtees)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Serialize a Duty queryset reading only the needed columns, the
+        debtee ones through a join.
+        """
+        rows = []
+        columns = queryset.values_list('schedule_id', 'duty_start', 'duty_end', 'last_active',
+            'debtee_id', *('debtee__%s' % field for field in DEBTEE_FIELDS))
+        for row in columns:
+            rows.append(row[:5] + ((row[5:] if row[4] is not None else None), ))
+        return cls.serialize_rows(rows, {})
+
+    @staticmethod
+    def format_datetimes(values):
+        return DateTimeFormat.get(api_settings.DATETIME_FORMAT).format_many(values)
+
+    @classmethod
+    def serialize_rows(cls, rows, debtees):
+        """Build the payload of (schedule id, duty start, duty end,
+        last active, debtee id, debtee values or None) rows.
+        """
+        # flatten every datetime of the list, in payload order, formatted at once
+        datetimes = []
+        for schedule_id, duty_start, duty_end, last_active, debtee_id, debtee in rows:
+            schedule = DutySchedule.lookup(schedule_id)
+            datetimes.append(duty_start)
+            datetimes.append(duty_end)
+            for task in TASKS:
+                datetimes.extend(schedule.task_bounds(duty_start, duty_end, task))
+            datetimes.append(last_active)
+        formatted = iter(cls.format_datetimes(datetimes))
+
+        data = []
+        for schedule_id, duty_start, duty_end, last_active, debtee_id, debtee in rows:
+            item = OrderedDict()
+            for field in ('duty_start', 'duty_end', 'task1_start', 'task1_end', 'task2_start',
+                    'task2_end', 'task3_start', 'task3_end', 'last_active'):
+                item[field] = next(formatted)
+            if debtee is None and debtee_id is not None:
+                debtee = debtees.get(debtee_id)
+            item['debtee'] = OrderedDict(zip(DEBTEE_FIELDS, debtee)) if debtee is not None else None
+            data.append(item)
+        return data
+
+
+class FastDutyV2Serializer(FastDutySerializer):
+    """Fast path of `DutyV2Serializer(duties, many=True)`, datetimes as
+    epoch milliseconds.
+    """
+    @staticmethod
+    def format_datetimes(values):
+        return [epoch_milliseconds(value) for value in values]
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from rest_framework import serializers
+
+EPOCH = timezone.make_aware(datetime(1970, 1, 1), timezone.utc)
+MILLISECOND = timedelta(milliseconds=1)
+
+
+def epoch_milliseconds(value):
+    """Integer milliseconds since the Unix epoch of a datetime, naive ones
+    being in the current timezone. None stays None.
+    """
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    # timedelta floor division, exact where float timestamps are not
+    return (value - EPOCH) // MILLISECOND
+
+
+class EpochMillisecondsField(serializers.DateTimeField):
+    """Read-only datetime field represented as epoch milliseconds.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super(EpochMillisecondsField, self).__init__(**kwargs)
+
+    def to_representation(self, value):
+        return epoch_milliseconds(value)
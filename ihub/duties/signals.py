@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from duties.cache import invalidate_caches
+from duties.events import wake_event_producer
+from duties.models import Duty, DutyManager, DutySchedule
+from duties.snapshot import publish_snapshot
+
+
+@receiver(post_save, sender=Duty)
+@receiver(post_delete, sender=Duty)
+def invalidate_active_duty_caches(sender, instance, **kwargs):
+    # deleting a detached duty (e.g. archiving) leaves every active set as is
+    if kwargs['signal'] is post_delete and instance.manager_id is None:
+        return
+    # a duty may leave a manager, so every manager cache is dropped. Invalidate
+    # again on commit, other threads may have reloaded uncommitted state.
+    invalidate_caches()
+    transaction.on_commit(invalidate_caches)
+    # let other worker processes see the change
+    transaction.on_commit(publish_snapshot)
+    transaction.on_commit(wake_event_producer)
+
+
+@receiver(post_save, sender=DutyManager)
+def announce_manager_change(sender, instance, **kwargs):
+    # desk edits, e.g. capacity; admissions lock with UPDATE and send nothing
+    transaction.on_commit(wake_event_producer)
+
+
+@receiver(post_save, sender=DutyManager)
+@receiver(post_delete, sender=DutyManager)
+def clear_manager_cache(sender, instance, **kwargs):
+    # again on commit, other threads may have memoized the old row meanwhile
+    DutyManager.clear_cache()
+    transaction.on_commit(DutyManager.clear_cache)
+
+
+@receiver(post_save, sender=DutySchedule)
+@receiver(post_delete, sender=DutySchedule)
+def clear_schedule_cache(sender, instance, **kwargs):
+    DutySchedule.clear_cache()
@@ -0,0 +1,252 @@
+"""
+Module snapshot.py
+
+Snapshot of the active duties of every manager, published into a
+memory-mapped file shared by all worker processes of a host.
+
+Layout (little endian, fixed size):
+
+    header   magic (4s) | layout version (I) | generation (Q) | count (I) | capacity (I) | pad (8x)
+    records  capacity x 14 int64: duty id, manager id, user id, debtee id,
+             schedule id, duty_start, duty_end, task1..3 start/end, last_active
+
+Datetimes are int64 epoch microseconds (exact round trip, a snapshot duty
+can be saved back without losing precision); ids of absent relations are 0.
+
+Writers serialize on an exclusive flock and read the active duties only
+once they hold it, so the last generation always holds the latest active
+set. They follow a seqlock protocol: the generation is made odd before
+records are touched and even once they are complete. Readers parse records only when the generation changed, and retry
+when it is odd or moved while reading. Readers never take the lock.
+
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime, timedelta
+
+from django.db import router
+from django.utils import timezone
+
+from duties.conf import duty_settings
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover, non POSIX hosts only serialize within process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'IHDS'
+LAYOUT_VERSION = 2
+HEADER = struct.Struct('<4sIQII8x')
+RECORD = struct.Struct('<14q')
+OVERFLOW = 0xFFFFFFFF
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+RECORD_FIELDS = (
+    'id', 'manager_id', 'user_id', 'debtee_id', 'schedule_id',
+    'duty_start', 'duty_end',
+    'task1_start', 'task1_end', 'task2_start', 'task2_end', 'task3_start', 'task3_end',
+    'last_active',
+)
+DATETIME_FIELDS = RECORD_FIELDS[5:]
+# task marks are published for other readers, duties recompute them from schedule
+TASK_FIELDS = RECORD_FIELDS[7:13]
+DUTY_END = RECORD_FIELDS.index('duty_end')
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def to_epoch_us(value):
+    if value is None:
+        return 0
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_epoch_us(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+class ActiveDutySnapshot(object):
+    """Memory-mapped snapshot of active duties.
+    """
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.size = HEADER.size + capacity * RECORD.size
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._parsed_generation = None
+        self._parsed = None # {manager_id: [record, ...]}
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            self._mmap = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        self._view = memoryview(self._mmap)
+
+    ########################################
+    # Readers
+    ########################################
+
+    @property
+    def generation(self):
+        """Current generation, None while uninitialised.
+        """
+        magic, layout, generation, count, capacity = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            return None
+        return generation
+
+    def read(self, retries=16):
+        """Records grouped by manager id as of the current generation.
+
+        Returns:
+            tuple: (generation, {manager_id: [record, ...]}), (None, None) when
+                the snapshot is uninitialised, overflowed or kept changing
+        """
+        for _ in range(retries):
+            magic, layout, generation, count, capacity = HEADER.unpack_from(self._view, 0)
+            if magic != MAGIC or layout != LAYOUT_VERSION or count == OVERFLOW:
+                return None, None
+            if generation % 2:
+                continue # writer in progress
+            with self._read_lock:
+                if generation == self._parsed_generation:
+                    return generation, self._parsed
+            parsed = {}
+            records = self._view[HEADER.size:HEADER.size + count * RECORD.size]
+            for record in RECORD.iter_unpack(records):
+                parsed.setdefault(record[1], []).append(record)
+            if HEADER.unpack_from(self._view, 0)[2] != generation:
+                continue # overwritten while reading
+            with self._read_lock:
+                self._parsed_generation, self._parsed = generation, parsed
+            return generation, parsed
+        return None, None
+
+    def get_duties(self, manager_id):
+        """Active duties of the manager as Duty instances built without
+        database access, None if snapshot is unusable.
+        """
+        generation, parsed = self.read()
+        if parsed is None:
+            return None
+        now = to_epoch_us(timezone.now())
+        return [
+            self.build_duty(record)
+            for record in parsed.get(manager_id, [])
+            if record[DUTY_END] > now
+        ]
+
+    @staticmethod
+    def build_duty(record):
+        from duties.models import Duty
+
+        values = dict(zip(RECORD_FIELDS, record))
+        for field in TASK_FIELDS:
+            del values[field]
+        for field in DATETIME_FIELDS:
+            if field in values:
+                values[field] = from_epoch_us(values[field])
+        values['debtee_id'] = values['debtee_id'] or None
+        duty = Duty(**values)
+        duty._state.adding = False
+        duty._state.db = router.db_for_read(Duty, instance=duty)
+        return duty
+
+    ########################################
+    # Writers
+    ########################################
+
+    def publish(self, duties):
+        """Write duties as the next generation.
+
+        Args:
+            duties (iterable): active Duty instances of every manager, a
+                queryset is evaluated once the lock is held
+        """
+        with self._write_lock, _FileLock(self.path):
+            records = [
+                RECORD.pack(*(
+                    to_epoch_us(getattr(duty, field)) if field in DATETIME_FIELDS
+                    else (getattr(duty, field) or 0)
+                    for field in RECORD_FIELDS
+                ))
+                for duty in duties
+            ]
+            generation = self.generation or 0
+            generation += generation % 2 # recover from a writer that died mid-write
+            count = len(records) if len(records) <= self.capacity else OVERFLOW
+
+            HEADER.pack_into(self._mmap, 0, MAGIC, LAYOUT_VERSION, generation + 1, count, self.capacity)
+            if count != OVERFLOW:
+                self._mmap[HEADER.size:HEADER.size + count * RECORD.size] = b''.join(records)
+            HEADER.pack_into(self._mmap, 0, MAGIC, LAYOUT_VERSION, generation + 2, count, self.capacity)
+        return generation + 2
+
+
+class _FileLock(object):
+    """Exclusive advisory lock on a sibling `.lock` file.
+    """
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+def get_snapshot():
+    """Process-wide snapshot, None when DUTIES['SNAPSHOT_PATH'] is unset.
+    """
+    path = duty_settings.SNAPSHOT_PATH
+    if not path:
+        return None
+    with _snapshots_lock:
+        if path not in _snapshots:
+            _snapshots[path] = ActiveDutySnapshot(path, duty_settings.SNAPSHOT_CAPACITY)
+        return _snapshots[path]
+
+
+def snapshot_generation():
+    """Generation of the process-wide snapshot, None when disabled.
+    """
+    snapshot = get_snapshot()
+    return snapshot.generation if snapshot is not None else None
+
+
+def publish_snapshot():
+    """Publish the active duties of every manager, if snapshot is enabled.
+    """
+    from duties.models import Duty
+
+    try:
+        snapshot = get_snapshot()
+        if snapshot is None:
+            return None
+        # lazy, read under the write lock
+        duties = Duty.objects.filter(manager__isnull=False, duty_end__gt=timezone.now())
+        return snapshot.publish(duties)
+    except OSError:
+        # readers keep the previous generation until the next publish
+        logger.exception("Publishing active duties snapshot failed")
+        return None
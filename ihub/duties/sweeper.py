@@ -0,0 +1,120 @@
+"""
+Module sweeper.py
+
+Background sweep detaching finished duties from their managers. With lazy
+expiry, request paths only ever read duties through the `duty_end > now`
+predicate; the FK to the manager is cleaned up here, in batches, off the
+request path.
+
+Sweeps run every SWEEP_INTERVAL seconds and are requested earlier by every
+admission (`request_sweep()` once committed). Requests are debounced: two
+sweeps are never closer than SWEEP_DEBOUNCE seconds apart, however many
+requests come in.
+
+Serving processes start their sweeper when loading ihub.wsgi (which
+ihub.asgi loads too), see `autostart()`. Deployments running
+`manage.py sweep_duties` on its own instead set SWEEP_AUTOSTART to False.
+
+"""
+import logging
+import threading
+import time
+
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from duties.conf import duty_settings
+
+logger = logging.getLogger(__name__)
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+class FinishedDutySweeper(threading.Thread):
+    """Daemon thread detaching finished duties in batches.
+    """
+    def __init__(self, interval=None, debounce=None, batch_size=None):
+        super(FinishedDutySweeper, self).__init__(name='duty-sweeper', daemon=True)
+        self.interval = interval if interval is not None else duty_settings.SWEEP_INTERVAL
+        self.debounce = debounce if debounce is not None else duty_settings.SWEEP_DEBOUNCE
+        self.batch_size = batch_size if batch_size is not None else duty_settings.SWEEP_BATCH_SIZE
+        self.last_sweep = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def request(self):
+        """Ask for a sweep sooner than the next interval.
+        """
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            # debounce requests arriving right after the last sweep
+            if self.last_sweep is not None:
+                self._stopped.wait(self.last_sweep + self.debounce - time.monotonic())
+            if self._stopped.is_set():
+                break
+            try:
+                self.sweep()
+            except DatabaseError:
+                logger.exception("Finished duties sweep failed")
+            finally:
+                close_old_connections()
+
+    def sweep(self):
+        """Detach every finished duty, one bounded UPDATE per batch.
+
+        Returns:
+            int: number of duties detached
+        """
+        # imported by the models module (admissions request sweeps)
+        from duties.models import Duty
+
+        detached = 0
+        now = timezone.now()
+        finished_duties = Duty.objects.filter(manager__isnull=False, duty_end__lte=now)
+        while True:
+            batch = list(finished_duties.values_list('id', flat=True)[:self.batch_size])
+            if not batch:
+                break
+            detached += Duty.objects.filter(pk__in=batch).update(manager=None)
+        self.last_sweep = time.monotonic()
+        return detached
+
+
+def start_sweeper(**kwargs):
+    """Start the process-wide sweeper once, returns it.
+    """
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = FinishedDutySweeper(**kwargs)
+            _sweeper.start()
+        return _sweeper
+
+
+def autostart():
+    """Start the sweeper of a serving process when lazy expiry needs one,
+    returns it.
+    """
+    if not duty_settings.LAZY_EXPIRY:
+        return None
+    if not duty_settings.SWEEP_AUTOSTART:
+        logger.warning("LAZY_EXPIRY is on without SWEEP_AUTOSTART: finished duties stay "
+            "attached to their desks unless `manage.py sweep_duties` runs")
+        return None
+    return start_sweeper()
+
+
+def request_sweep():
+    """Request an early sweep from the running sweeper, if any.
+    """
+    if _sweeper is not None:
+        _sweeper.request()
@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 
 from rest_framework.test import APITestCase, APIClient
 
+from duties.cache import invalidate_caches
 from duties.models import Duty, DutyManager
 from utils.random_supports import RandomSupport
 
@@ -72,12 +73,18 @@ class BaseTestCaseMixin(RandomSupport):
 class BaseDutyTestCase(TestCase, BaseTestCaseMixin):
 	"""Super class of any DutyTests
 	"""
-	pass
+	def setUp(self):
+		# process caches outlive the rolled back test transaction
+		invalidate_caches()
 
 
 class BaseDutyAPITestCase(APITestCase, BaseTestCaseMixin):
 	"""Super class of APITests for Duty
 	"""
+	def setUp(self):
+		# process caches outlive the rolled back test transaction
+		invalidate_caches()
+
 	def prepare_manager(self):
 		self.duty_manager = DutyManager.load()
 
@@ -1,4 +1,9 @@
+import gzip
+import json
+from datetime import timedelta
+
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 
@@ -12,6 +17,7 @@ class DutiesAPITests(BaseDutyAPITestCase):
 	"""
 
 	def setUp(self):
+		super(DutiesAPITests, self).setUp()
 		self.prepare_manager()
 		self.addCleanup(self.duty_manager.active_duties.clear)
 
@@ -183,6 +189,128 @@ class DutiesAPITests(BaseDutyAPITestCase):
 		)
 		self.assertIsNotNone(response4.data['payload'][0])
 
+	def test_api_get_active_duty_conditional(self):
+		"""Test API answers duty details with an ETag, 304 while the duty is unchanged
+		and the full payload again once the duty changed
+		"""
+		self.prepare_login_user(1)
+		duty1 = self.duty_manager.start_duty(self.user1)
+
+		# Step 1: first GET carries ETag, server time moved to header
+		response1 = self.client.get(reverse('duties:duty-details'))
+		self.assertEqual(response1.status_code, status.HTTP_200_OK)
+		self.assertNotIn('now', response1.data)
+		self.assertIn('X-Server-Now', response1)
+		etag = response1['ETag']
+
+		# Step 2: revalidation is answered without body
+		response2 = self.client.get(reverse('duties:duty-details'), HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response2.status_code, status.HTTP_304_NOT_MODIFIED)
+		self.assertEqual(response2.content, b'')
+		self.assertEqual(response2['ETag'], etag)
+
+		# Step 3: duty end moves, payload is sent again
+		duty1.update_duty_end(duty1.duty_end - timedelta(minutes=10))
+		response3 = self.client.get(reverse('duties:duty-details'), HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response3.status_code, status.HTTP_200_OK)
+		self.assertNotEqual(response3['ETag'], etag)
+
+	def test_api_routes_to_desk(self):
+		"""Test API starts and gets duties at the desk named by `desk` parameter,
+		and answers HTTP404 for an unknown desk
+		"""
+		desk_manager = DutyManager.objects.create(name="Desk 2", slug='desk-2')
+		self.prepare_login_user(1)
+
+		# Step 1: POST start duty at desk 2
+		response1 = self.client.post(reverse('duties:duty-create') + '?desk=desk-2')
+		self.assertEqual(response1.status_code, status.HTTP_201_CREATED)
+		self.assertTrue(desk_manager.is_onduty(self.user1))
+		self.assertFalse(self.duty_manager.is_onduty(self.user1))
+
+		# Step 2: GET duty details at desk 2 through header
+		response2 = self.client.get(reverse('duties:duty-details'), HTTP_X_DUTY_DESK='desk-2')
+		self.assertEqual(response2.status_code, status.HTTP_200_OK)
+
+		# Step 3: unknown desk
+		response3 = self.client.get(reverse('duties:duty-details') + '?desk=nowhere')
+		self.assertEqual(response3.status_code, status.HTTP_404_NOT_FOUND)
+
+		# Step 4: a JSON array body names no desk
+		response4 = self.client.generic('GET', reverse('duties:duty-details'), '[1]',
+			content_type='application/json', HTTP_X_DUTY_DESK='desk-2')
+		self.assertEqual(response4.status_code, status.HTTP_200_OK)
+
+		# Step 5: a desk that is not a slug
+		for desk in (['desk-2'], {}):
+			response5 = self.client.post(reverse('duties:duty-create'), {'desk': desk}, format='json')
+			self.assertEqual(response5.status_code, status.HTTP_404_NOT_FOUND)
+
+		# Step 6: the duty page finds the desk of the running duty
+		response6 = self.client.get(reverse('duties:duty-page'))
+		self.assertTemplateUsed(response6, 'onduty.html')
+		self.assertEqual(response6.context['desk'], 'desk-2')
+
+	def test_api_roster_staff_only(self):
+		"""Test roster API refuses non-staff users and starts duties per item for staff
+		"""
+		self.prepare_login_user(1)
+		assignee = self.generate_ihub_user()
+		roster = {'assignments': [{'matric': assignee.matric}, {'matric': 'U0000000X'}]}
+
+		# Step 1: regular user is forbidden
+		response1 = self.client.post(reverse('duties:duty-roster'), roster, format='json')
+		self.assertEqual(response1.status_code, status.HTTP_403_FORBIDDEN)
+
+		# Step 2: staff starts roster, second item refused
+		self.user1.is_staff = True
+		self.user1.save()
+		response2 = self.client.post(reverse('duties:duty-roster'), roster, format='json')
+		self.assertEqual(response2.status_code, status.HTTP_201_CREATED)
+		self.assertFalse(response2.data['success'])
+		self.assertTrue(response2.data['payload'][0]['success'])
+		self.assertFalse(response2.data['payload'][1]['success'])
+		self.assertTrue(self.duty_manager.is_onduty(assignee))
+
+		# Step 3: malformed roster
+		response3 = self.client.post(reverse('duties:duty-roster'), {'assignments': 'x'}, format='json')
+		self.assertEqual(response3.status_code, status.HTTP_400_BAD_REQUEST)
+		for assignments in ([{'matric': 1}], [{'matric': assignee.matric, 'debtee': ['x']}], [{}]):
+			response4 = self.client.post(reverse('duties:duty-roster'), {'assignments': assignments}, format='json')
+			self.assertEqual(response4.status_code, status.HTTP_400_BAD_REQUEST)
+		response5 = self.client.post(reverse('duties:duty-roster'), [roster], format='json')
+		self.assertEqual(response5.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_api_export_streams_history(self):
+		"""Test export API streams duties of the date range as csv or gzipped ndjson, for staff only
+		"""
+		self.prepare_login_user(1)
+		duty = Duty.objects.create(user=self.user1)
+		today = "{:%Y-%m-%d}".format(timezone.localtime())
+		url = reverse('duties:duty-export') + '?start=%s&end=%s' % (today, today)
+
+		# Step 1: regular user is forbidden
+		response1 = self.client.get(url)
+		self.assertEqual(response1.status_code, status.HTTP_403_FORBIDDEN)
+
+		# Step 2: staff gets csv, header and one row
+		self.user1.is_staff = True
+		self.user1.save()
+		response2 = self.client.get(url)
+		self.assertEqual(response2.status_code, status.HTTP_200_OK)
+		lines = b''.join(response2.streaming_content).decode().splitlines()
+		self.assertEqual(len(lines), 2)
+		self.assertTrue(lines[1].startswith('%d,%s,' % (duty.id, self.user1.matric)))
+
+		# Step 3: gzipped ndjson
+		response3 = self.client.get(url + '&output=ndjson&gzip=1')
+		rows = gzip.decompress(b''.join(response3.streaming_content)).decode().splitlines()
+		self.assertEqual(json.loads(rows[0])['duty_id'], duty.id)
+
+		# Step 4: malformed range
+		response4 = self.client.get(reverse('duties:duty-export') + '?start=2019-13-01&end=x')
+		self.assertEqual(response4.status_code, status.HTTP_400_BAD_REQUEST)
+
 	####################################################################################################
 
 	def tearDown(self):
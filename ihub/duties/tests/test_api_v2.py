@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+
+from duties.renderers import msgpack
+from duties.serializers import DutyV2Serializer
+from duties.serializers.fields import epoch_milliseconds
+
+from duties.tests.base_class import BaseDutyAPITestCase
+
+class DutiesAPIv2Tests(BaseDutyAPITestCase):
+	"""Tests endpoints and api views in `duties/api/v2/`.
+	"""
+
+	def setUp(self):
+		super(DutiesAPIv2Tests, self).setUp()
+		self.prepare_manager()
+		self.addCleanup(self.duty_manager.active_duties.clear)
+
+	def test_api_v2_create_get_epoch_milliseconds(self):
+		"""Test API v2 sends datetimes and server time as epoch milliseconds
+		"""
+		self.prepare_login_user(1)
+		debtee = self.generate_ihub_user()
+
+		# Step 1: POST start duty, payload matches the v2 serializer
+		response1 = self.client.post(reverse('duties:duty-v2-create'),
+			{'debtee': {'matric': debtee.matric}}, format='json')
+		self.assertEqual(response1.status_code, status.HTTP_201_CREATED)
+		duty1 = self.duty_manager.get_duties_of(self.user1)[0]
+		self.assertEqual(response1.data['payload'], DutyV2Serializer(duty1).data)
+		self.assertIsInstance(response1.data['now'], int)
+
+		# Step 2: GET details, same payload through the fast serializer
+		before = epoch_milliseconds(timezone.now())
+		response2 = self.client.get(reverse('duties:duty-v2-details'))
+		self.assertEqual(response2.status_code, status.HTTP_200_OK)
+		payload = json.loads(response2.content.decode())['payload']
+		self.assertEqual(payload, [json.loads(json.dumps(DutyV2Serializer(duty1).data))])
+		self.assertEqual(payload[0]['duty_end'], epoch_milliseconds(duty1.duty_end))
+		self.assertEqual(payload[0]['debtee']['matric'], debtee.matric)
+		self.assertLessEqual(before, int(response2['X-Server-Now']))
+
+	@unittest.skipIf(msgpack is None, "msgpack is not installed")
+	def test_api_v2_msgpack_negotiation(self):
+		"""Test API v2 answers MessagePack on request, with its own ETag
+		"""
+		self.prepare_login_user(1)
+		self.duty_manager.start_duty(self.user1)
+
+		# Step 1: JSON by default, MessagePack when accepted
+		response1 = self.client.get(reverse('duties:duty-v2-details'))
+		response2 = self.client.get(reverse('duties:duty-v2-details'), HTTP_ACCEPT='application/msgpack')
+		self.assertEqual(response2.status_code, status.HTTP_200_OK)
+		self.assertEqual(response2['Content-Type'], 'application/msgpack')
+		self.assertEqual(msgpack.unpackb(response2.content, raw=False), json.loads(response1.content.decode()))
+		self.assertLess(len(response2.content), len(response1.content))
+
+		# Step 2: representations revalidate separately
+		self.assertNotEqual(response1['ETag'], response2['ETag'])
+		self.assertIn('Accept', response2['Vary'])
+		response3 = self.client.get(reverse('duties:duty-v2-details'),
+			HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=response2['ETag'])
+		self.assertEqual(response3.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,82 @@
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from duties.export import iter_duties
+from duties.tests.base_class import BaseDutyTestCase
+from duties.models import ArchivedDuty, Duty, DutyManager
+
+
+class ArchiveDutiesTests(BaseDutyTestCase):
+    """Tests moving finished duties into the archive tier.
+    """
+
+    def create_finished_duty(self, user, days_ago):
+        duty = Duty.objects.create(user=user)
+        duty.duty_start -= timedelta(days=days_ago)
+        duty.duty_end -= timedelta(days=days_ago)
+        duty.save()
+        return duty
+
+    def test_archive_moves_duties_past_retention(self):
+        """Test archive_duties moves only duties finished before the
+        retention window, across several batches, and keeps their timeline.
+        """
+        user = self.generate_ihub_user()
+
+        # Step 1: create 5 old duties and 1 recent duty
+        old_duties = [self.create_finished_duty(user, 100) for _ in range(5)]
+        recent = self.create_finished_duty(user, 10)
+
+        # Step 2: archive with batch smaller than old duties
+        call_command('archive_duties', retention_days=90, batch_size=2, stdout=StringIO())
+
+        # Step 3: verify only recent duty is left in the hot table
+        self.assertEqual(list(Duty.objects.all()), [recent])
+
+        # Step 4: verify archive kept the old duties and their timeline
+        archived = ArchivedDuty.objects.of_user(user).order_by('duty_id')
+        self.assertEqual([a.duty_id for a in archived], [d.id for d in old_duties])
+        self.assertEqual(archived[0].duty_end, old_duties[0].duty_end)
+        self.assertEqual(archived[0].task3_end, old_duties[0].task3_end)
+
+    def test_archive_between(self):
+        """Test archive queryset filters by duty start range.
+        """
+        user = self.generate_ihub_user()
+        old = self.create_finished_duty(user, 200)
+        self.create_finished_duty(user, 100)
+        call_command('archive_duties', stdout=StringIO())
+
+        now = timezone.now()
+        archived = ArchivedDuty.objects.between(now - timedelta(days=250), now - timedelta(days=150))
+        self.assertEqual([a.duty_id for a in archived], [old.id])
+
+    def test_export_yields_archive_first(self):
+        """Test exported history includes archived duties before the hot ones.
+        """
+        user = self.generate_ihub_user()
+        old = self.create_finished_duty(user, 100)
+        recent = self.create_finished_duty(user, 10)
+        call_command('archive_duties', retention_days=90, stdout=StringIO())
+
+        now = timezone.now()
+        rows = list(iter_duties(now - timedelta(days=200), now, include_archive=True))
+        self.assertEqual([(row[0], row[-1]) for row in rows], [(old.id, True), (recent.id, False)])
+
+    def test_archive_attached_duties_without_invalidation(self):
+        """Test finished duties not swept yet are archived without
+        invalidating caches (and publishing snapshots) once per duty.
+        """
+        user = self.generate_ihub_user()
+        old_duties = [self.create_finished_duty(user, 100) for _ in range(3)]
+        DutyManager.load().active_duties.add(*old_duties, bulk=True)
+
+        with mock.patch('duties.signals.invalidate_caches') as invalidate:
+            call_command('archive_duties', retention_days=90, stdout=StringIO())
+        self.assertEqual(invalidate.call_count, 0)
+        self.assertEqual(ArchivedDuty.objects.count(), 3)
+        self.assertFalse(Duty.objects.exists())
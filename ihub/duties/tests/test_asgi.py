@@ -0,0 +1,139 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.core.wsgi import get_wsgi_application
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from duties.asgi import DutyASGIApplication
+from duties.benchmarks import session_cookie
+from duties.cache import invalidate_caches
+from duties.events import DutyEventBroker
+from duties.models import DutyManager, DutySchedule
+from duties.tests.base_class import BaseTestCaseMixin
+from utils.asgi import build_environ
+
+
+class DutyASGITests(TransactionTestCase, BaseTestCaseMixin):
+    """Tests ASGI entry point, committed data is needed by the pool threads.
+    """
+
+    def setUp(self):
+        # tables are flushed between tests, without signals
+        invalidate_caches()
+        DutySchedule.clear_cache()
+        DutyManager.clear_cache()
+        self.addCleanup(DutySchedule.clear_cache)
+        self.addCleanup(DutyManager.clear_cache)
+        self.application = DutyASGIApplication(get_wsgi_application(), max_workers=2)
+        self.addCleanup(self.application.pool.shutdown)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def scope(self, path, query=b'', cookie=None):
+        headers = [(b'host', b'testserver')]
+        if cookie:
+            headers.append((b'cookie', cookie.encode()))
+        return {
+            'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+            'headers': headers, 'server': ('localhost', 80), 'client': ('127.0.0.1', 1),
+        }
+
+    def call(self, scope, until=None):
+        """Run the application until it returns or `until(messages)` holds,
+        then disconnect the client.
+        """
+        messages, disconnect = [], asyncio.Event()
+        requests = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if until is not None and until(messages):
+                disconnect.set()
+
+        self.loop.run_until_complete(asyncio.wait_for(
+            self.application(scope, receive, send), timeout=10))
+        return messages
+
+    def test_environ_from_scope(self):
+        """Test ASGI scope translates to a WSGI environ, headers folded.
+        """
+        scope = self.scope('/duties/api/details/', b'desk=a')
+        scope['headers'] += [(b'x-duty-desk', b'a'), (b'accept', b'a'), (b'accept', b'b')]
+        environ = build_environ(scope, b'')
+        self.assertEqual(environ['QUERY_STRING'], 'desk=a')
+        self.assertEqual(environ['HTTP_X_DUTY_DESK'], 'a')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'a,b')
+
+    def test_api_runs_on_pool(self):
+        """Test regular API requests are answered by the WSGI application.
+        """
+        messages = self.call(self.scope(reverse('duties:duty-details')))
+        self.assertEqual(messages[0]['status'], 403)
+        self.assertIn(b'credentials', b''.join(m.get('body', b'') for m in messages[1:]))
+
+    def test_event_stream_served_on_loop(self):
+        """Test event stream refuses anonymous clients, and streams desk
+        events to logged in clients until they disconnect.
+        """
+        user = self.generate_ihub_user()
+        desk = DutyManager.load()
+        broker = DutyEventBroker(autostart=False)
+
+        with mock.patch('duties.asgi.get_broker', return_value=broker):
+            # Step 1: anonymous
+            messages = self.call(self.scope(reverse('duties:duty-events')))
+            self.assertEqual(messages[0]['status'], 403)
+
+            # Step 2: logged in, an event is published once the stream is open
+            def publish_then_leave(messages):
+                if len(messages) == 2:
+                    broker.publish('duty.started', desk.slug, {'duty': 1})
+                return len(messages) == 3
+
+            messages = self.call(self.scope(reverse('duties:duty-events'), cookie=session_cookie(user)),
+                until=publish_then_leave)
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertTrue(messages[1]['body'].startswith(b'retry:'))
+        self.assertEqual(messages[2]['body'], b'id: 1\nevent: duty.started\ndata: {"duty": 1}\n\n')
+        self.assertEqual(broker.subscriber_count, 0)
+
+    def test_long_poll_answers_with_details(self):
+        """Test long-poll of duty details answers with the details view once it times out.
+        """
+        user = self.generate_ihub_user()
+        desk = DutyManager.load()
+        desk.start_duty(user)
+
+        messages = self.call(self.scope(reverse('duties:duty-details'), b'wait=0.1',
+            cookie=session_cookie(user)))
+        self.assertEqual(messages[0]['status'], 200)
+        body = json.loads(b''.join(m.get('body', b'') for m in messages[1:]))
+        self.assertEqual(len(body['payload']), 1)
+        self.assertTrue(body['payload'][0]['duty_end'])
+
+    def test_duty_page_streams_only_on_asgi(self):
+        """Test the duty page opens the event stream when served through
+        ASGI, and polls the duty details when served through WSGI.
+        """
+        user = self.generate_ihub_user()
+        DutyManager.load().start_duty(user)
+        cookie = session_cookie(user)
+
+        messages = self.call(self.scope(reverse('duties:duty-page'), cookie=cookie))
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn(b'new EventSource', b''.join(m.get('body', b'') for m in messages[1:]))
+
+        self.client.force_login(user)
+        response = self.client.get(reverse('duties:duty-page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'new EventSource', response.content)
+        self.assertIn(b'setInterval(getDuty, 15 * 1000)', response.content)
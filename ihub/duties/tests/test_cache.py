@@ -0,0 +1,102 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from duties.tests.base_class import BaseDutyTestCase
+from duties.models import DutyManager
+
+
+class ActiveDutyCacheTests(BaseDutyTestCase):
+    """Tests per-process active duty cache of DutyManager.
+    """
+
+    def test_cache_hits_after_first_load(self):
+        """Test first lookup loads the active set, later lookups (positive
+        and negative) are answered without query and counted as hits.
+        """
+        user1 = self.generate_ihub_user()
+        user2 = self.generate_ihub_user()
+        duty_manager = DutyManager.load()
+        duty_manager.start_duty(user1)
+        # counters are process-wide, compare against a baseline
+        baseline = duty_manager.cache_stats()
+
+        # Step 1: first lookup is a miss
+        self.assertTrue(duty_manager.is_onduty(user1))
+        self.assertEqual(duty_manager.cache_stats()['misses'], baseline['misses'] + 1)
+
+        # Step 2: following lookups hit without any query
+        with self.assertNumQueries(0):
+            self.assertTrue(duty_manager.is_onduty(user1))
+            self.assertFalse(duty_manager.is_onduty(user2))
+            self.assertEqual(duty_manager.get_onduty_user_ids(), [user1.id])
+        self.assertEqual(duty_manager.cache_stats()['hits'], baseline['hits'] + 3)
+
+    def test_cache_invalidated_on_duty_save(self):
+        """Test saving a duty drops the cached active set.
+        """
+        user = self.generate_ihub_user()
+        duty_manager = DutyManager.load()
+
+        # Step 1: cache user as not on duty
+        self.assertFalse(duty_manager.is_onduty(user))
+
+        # Step 2: start duty, verify cache sees it
+        duty = duty_manager.start_duty(user)
+        self.assertTrue(duty_manager.is_onduty(user))
+
+        # Step 3: force finish duty, verify cache drops it
+        duty.force_finish_duty()
+        self.assertFalse(duty_manager.is_onduty(user))
+
+    def test_cache_evicts_at_duty_end(self):
+        """Test cached duty is evicted once its duty_end passes, without query.
+        """
+        user = self.generate_ihub_user()
+        duty_manager = DutyManager.load()
+        duty = duty_manager.start_duty(user)
+        self.assertTrue(duty_manager.is_onduty(user))
+
+        # Step 1: travel past duty end
+        after_end = duty.duty_end + timedelta(seconds=1)
+        with mock.patch.object(timezone, 'now', return_value=after_end):
+            with self.assertNumQueries(0):
+                self.assertFalse(duty_manager.is_onduty(user))
+                self.assertEqual(duty_manager.get_duties_of(user), tuple())
+
+    def test_cache_expires_without_snapshot(self):
+        """Test without a shared snapshot the active set is reloaded once
+        ACTIVE_DUTIES_CACHE_TTL passed, to see duties of other workers.
+        """
+        user = self.generate_ihub_user()
+        duty_manager = DutyManager.load()
+        duty_manager.start_duty(user)
+        self.assertTrue(duty_manager.is_onduty(user))
+        loaded_at = duty_manager.cache._loaded_at
+
+        # Step 1: within the TTL, answered from cache
+        with mock.patch('duties.cache.time.monotonic', return_value=loaded_at + 1):
+            with self.assertNumQueries(0):
+                self.assertTrue(duty_manager.is_onduty(user))
+
+        # Step 2: past the TTL, reloaded
+        with mock.patch('duties.cache.time.monotonic', return_value=loaded_at + 3):
+            with self.assertNumQueries(1):
+                self.assertTrue(duty_manager.is_onduty(user))
+
+    def test_cached_duties_copied(self):
+        """Test callers get copies, changing them leaves the cache as is.
+        """
+        user = self.generate_ihub_user()
+        duty_manager = DutyManager.load()
+        duty = duty_manager.start_duty(user)
+
+        first, = duty_manager.get_duties_of(user)
+        first.duty_end = duty.duty_start
+        first.user.name = 'changed'
+
+        second, = duty_manager.get_duties_of(user)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.duty_end, duty.duty_end)
+        self.assertNotEqual(second.user.name, 'changed')
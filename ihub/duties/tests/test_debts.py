@@ -0,0 +1,92 @@
+import random
+from unittest import mock
+
+from django.urls import reverse
+
+from duties.tests.base_class import BaseDutyTestCase
+from duties.models import DebtBalance, DutyManager
+from utils.netting import net_positions, settle
+
+
+class DebtLedgerTests(BaseDutyTestCase):
+    """Tests debt ledger bookkeeping and settlement.
+    """
+
+    def setUp(self):
+        super(DebtLedgerTests, self).setUp()
+        self.duty_manager = DutyManager.objects.create(name="Debt desk", slug='debts', capacity=10)
+
+    def verify_settlement(self, balances, transfers):
+        # transfers clear every net position, with at most n - 1 of them
+        positions = net_positions(balances)
+        for debtor, creditor, amount in transfers:
+            self.assertGreater(amount, 0)
+            positions[debtor] += amount
+            positions[creditor] -= amount
+        self.assertFalse(any(positions.values()))
+        parties = sum(1 for amount in net_positions(balances).values() if amount)
+        self.assertLessEqual(len(transfers), max(parties - 1, 0))
+
+    def test_ledger_books_duties_served_for_debtee(self):
+        """Test starting duties with debtee updates the pair balance,
+        by single duty and by roster.
+        """
+        user1, user2, user3 = [self.generate_ihub_user() for _ in range(3)]
+
+        # Step 1: user1 covers user2, then roster has user3 cover user2
+        self.duty_manager.start_duty(user1, debtee=user2)
+        self.duty_manager.start_duties([{'matric': user3.matric, 'debtee': user2.matric}])
+        duty = self.duty_manager.get_duties_of(user1)[0]
+        duty.force_finish_duty()
+        self.duty_manager.start_duty(user1, debtee=user2)
+
+        # Step 2: verify balances and net positions
+        self.assertEqual(DebtBalance.objects.get(debtor=user2, creditor=user1).amount, 2)
+        self.assertEqual(DebtBalance.objects.get(debtor=user2, creditor=user3).amount, 1)
+        self.assertEqual(DebtBalance.objects.net_positions(),
+            {user1.id: 2, user2.id: -3, user3.id: 1})
+
+        # Step 3: a roster of many pairs is booked in chunks
+        users = [self.generate_ihub_user() for _ in range(4)]
+        roster = [{'matric': users[i].matric, 'debtee': users[i + 1].matric} for i in (0, 2)]
+        with mock.patch('duties.models.debt_balance.UPDATE_CHUNK_SIZE', 1):
+            self.duty_manager.start_duties(roster)
+        self.assertEqual(DebtBalance.objects.get(debtor=users[1], creditor=users[0]).amount, 1)
+        self.assertEqual(DebtBalance.objects.get(debtor=users[3], creditor=users[2]).amount, 1)
+
+    def test_settle_cycles_cancel_out(self):
+        """Test debts around a cycle need no transfer, and a chain collapses to one.
+        """
+        self.assertEqual(settle(net_positions([(1, 2, 1), (2, 3, 1), (3, 1, 1)])), [])
+        self.assertEqual(settle(net_positions([(1, 2, 2), (2, 3, 2)])), [(1, 3, 2)])
+
+    def test_settle_thousands_of_users(self):
+        """Test settlement over a random debt graph of thousands of users.
+        """
+        rng = random.Random(12)
+        users = range(5000)
+        balances = [(debtor, creditor, rng.randint(1, 5))
+            for debtor, creditor in (rng.sample(users, 2) for _ in range(50000))]
+
+        transfers = settle(net_positions(balances))
+        self.verify_settlement(balances, transfers)
+
+    def test_settlement_api_staff_only(self):
+        """Test settlement API refuses non-staff users and lists transfers by matric for staff
+        """
+        user1, user2, user3 = [self.generate_ihub_user() for _ in range(3)]
+        self.duty_manager.start_duty(user1, debtee=user2)
+        self.duty_manager.start_duty(user2, debtee=user3)
+
+        # Step 1: regular user is forbidden
+        self.client.force_login(user1)
+        response1 = self.client.get(reverse('duties:duty-settlement'))
+        self.assertEqual(response1.status_code, 403)
+
+        # Step 2: staff gets the chain collapsed into one transfer
+        user1.is_staff = True
+        user1.save()
+        response2 = self.client.get(reverse('duties:duty-settlement'))
+        self.assertEqual(response2.status_code, 200)
+        self.assertEqual(response2.json()['payload'],
+            [{'debtor': user3.matric, 'creditor': user1.matric, 'duties': 1}])
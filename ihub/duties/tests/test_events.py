@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.urls import reverse
+from django.utils import timezone
+
+from duties.tests.base_class import BaseDutyTestCase
+from duties.events import DutyEventBroker
+from duties.models import DutyManager
+
+
+class DutyEventsTests(BaseDutyTestCase):
+    """Tests duty events produced from active duty state.
+    """
+
+    def setUp(self):
+        super(DutyEventsTests, self).setUp()
+        self.duty_manager = DutyManager.load()
+        self.broker = DutyEventBroker(autostart=False)
+        self.subscription = self.broker.subscribe(desk=self.duty_manager.slug)
+        self.producer = self.broker.producer
+
+    def drain(self):
+        events = []
+        while True:
+            event = self.subscription.get(timeout=0)
+            if event is None:
+                return events
+            events.append(event)
+
+    def test_events_follow_duty_lifecycle(self):
+        """Test one poll publishes every change to every subscription:
+        duty started, task boundaries crossed, capacity change, duty finished.
+        """
+        user = self.generate_ihub_user()
+        other = self.broker.subscribe()
+
+        # Step 1: first poll only loads state
+        self.producer.poll()
+        self.assertEqual(self.drain(), [])
+
+        # Step 2: duty started
+        duty = self.duty_manager.start_duty(user)
+        self.producer.poll()
+        events = self.drain()
+        self.assertEqual([event.type for event in events], ['duty.started'])
+        self.assertEqual(events[0].data['duty'], duty.id)
+        # sent to every subscriber of the desk, no user is named
+        self.assertNotIn(user.matric, events[0].encode())
+        self.assertEqual(other.get(timeout=0), events[0])
+
+        # Step 3: duty moved 35 minutes back, task1 opened 5 minutes ago
+        duty.duty_start -= timedelta(minutes=35)
+        duty.duty_end -= timedelta(minutes=35)
+        duty.save()
+        self.producer.last_poll = timezone.now() - timedelta(minutes=10)
+        self.producer.poll()
+        self.assertEqual([(e.type, e.data['task']) for e in self.drain()], [('task.opened', 1)])
+
+        # Step 4: capacity change and forced finish
+        self.duty_manager.capacity = 3
+        self.duty_manager.save()
+        duty.force_finish_duty()
+        self.producer.poll()
+        events = self.drain()
+        self.assertEqual([event.type for event in events], ['manager.capacity', 'duty.finished'])
+        self.assertEqual(events[0].data, {'capacity': 3})
+
+    def test_subscription_desk_filter_and_resume(self):
+        """Test subscriptions only get events of their desk, and resume from backlog.
+        """
+        self.broker.publish('duty.started', 'elsewhere', {})
+        event = self.broker.publish('duty.started', self.duty_manager.slug, {})
+        self.assertEqual(self.drain(), [event])
+
+        resumed = self.broker.subscribe(last_event_id=0)
+        self.assertEqual(resumed.get(timeout=0).desk, 'elsewhere')
+
+    def test_events_api_streams(self):
+        """Test events API streams retry hint then published events as text/event-stream
+        """
+        user = self.generate_ihub_user()
+        self.client.force_login(user)
+
+        with mock.patch('duties.views.events.get_broker', return_value=self.broker):
+            response = self.client.get(reverse('duties:duty-events'), HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'retry:'))
+
+        self.broker.publish('duty.started', self.duty_manager.slug, {'duty': 1})
+        self.assertEqual(next(stream), b'id: 1\nevent: duty.started\ndata: {"duty": 1}\n\n')
+
+        # client leaves, subscription is released
+        response.close()
+        self.assertEqual(self.broker.subscriber_count, 1)
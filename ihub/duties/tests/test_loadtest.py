@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from duties.cache import invalidate_caches
+from duties.management.commands.loadtest_duties import classify
+from duties.models import DutyManager, DutySchedule
+from users.authentication import token_cache
+
+User = get_user_model()
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    """Tests the load test command, committed data is needed by its threads.
+    """
+
+    def setUp(self):
+        # tables are flushed between tests, without signals
+        invalidate_caches()
+        DutySchedule.clear_cache()
+        DutyManager.clear_cache()
+        token_cache.clear()
+        self.addCleanup(DutySchedule.clear_cache)
+        self.addCleanup(DutyManager.clear_cache)
+        self.addCleanup(token_cache.clear)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.output = os.path.join(directory, 'report.json')
+
+    def test_loadtest_report(self):
+        """Test the JSON report counts outcomes and statements per endpoint,
+        and seeded rows are deleted afterwards.
+        """
+        call_command('loadtest_duties', users=1, rounds=2, capacity=2, creates=2, polls=3,
+            host='testserver', output=self.output, stdout=StringIO())
+        with open(self.output) as f:
+            report = json.load(f)
+
+        # Step 1: admitted once per round, the retry (desk not full) hits the ongoing duty
+        create = report['endpoints']['create']
+        self.assertEqual(create['requests'], 4)
+        self.assertEqual(create['statuses'], {'201': 2, '400': 2})
+        self.assertEqual(create['errors'], {'UnfinishedDutyError': 2})
+        self.assertGreater(create['sql']['mean'], 0)
+
+        # Step 2: details of the admitted user
+        details = report['endpoints']['details']
+        self.assertEqual(details['statuses'], {'200': 6})
+        self.assertEqual(details['errors'], {})
+        self.assertLessEqual(details['latency_ms']['p50'], details['latency_ms']['p99'])
+
+        # Step 3: nothing left behind
+        self.assertFalse(DutyManager.objects.filter(slug='loadtest').exists())
+        self.assertEqual(User.objects.count(), 0)
+
+    def test_classify_errors(self):
+        """Test responses of live servers are classified from their body.
+        """
+        self.assertIsNone(classify(200, b''))
+        self.assertEqual(classify(400, json.dumps({'message':
+            "Maximum duty count handled by manager is reached. Cannot add more duty."}).encode()),
+            'MaxDutyCountError')
+        self.assertEqual(classify(500, b'OperationalError: database is locked'), 'SQLiteLocked')
+        self.assertEqual(classify(502, b'<html>'), 'HTTP 502')
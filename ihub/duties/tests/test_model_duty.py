@@ -1,11 +1,15 @@
+import time
 from datetime import datetime, timedelta
+from unittest import mock
 
+from django.contrib import admin
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from duties.admin import DutyScheduleAdmin
 from duties.tests.base_class import BaseDutyTestCase
 from duties.models import (
-    Duty,
+    Duty, DutySchedule
 )
 
 User = get_user_model()
@@ -17,7 +21,7 @@ class DutyTests(BaseDutyTestCase):
     def setUp(self):
         """Setup mock for each test
         """
-        pass
+        super(DutyTests, self).setUp()
 
     def test_create_zombie_duty(self):
         """Test create zombie duty (w/o user and debtee)
@@ -135,6 +139,60 @@ class DutyTests(BaseDutyTestCase):
         self.assertEqual(duty.duty_end.replace(second=0, microsecond=0), now)
         self.assertTrue(duty.is_finished())
 
+        # finishing again keeps duty_end, without query
+        duty_end = duty.duty_end
+        with self.assertNumQueries(0):
+            duty.force_finish_duty()
+        self.assertEqual(duty.duty_end, duty_end)
+
+    def test_duty_timeline_follows_schedule(self):
+        """Test task boundaries are computed from the duty schedule.
+        """
+        schedule = DutySchedule.objects.create(name='short', duty_duration=60,
+            task_window=10, task1_mark=5, task2_mark=20, task3_mark=40)
+        duty = Duty.objects.create(schedule=schedule)
+        start = duty.duty_start
+
+        # verify duty end and task boundaries use schedule offsets
+        self.assertEqual(duty.duty_end, start + timedelta(minutes=60))
+        self.assertEqual(duty.task1_start, start + timedelta(minutes=5))
+        self.assertEqual(duty.task2_end, start + timedelta(minutes=30))
+        self.assertEqual(duty.task3_end, start + timedelta(minutes=50))
+
+        # verify default schedule is used when not specified
+        self.assertEqual(Duty.objects.create().schedule, DutySchedule.get_default())
+
+    def test_used_schedule_read_only(self):
+        """Test the admin shows the timeline of a schedule read-only once
+        duties use it, and other processes see edits once cached ones expire.
+        """
+        schedule = DutySchedule.objects.create(name='short', duty_duration=60)
+        schedule_admin = DutyScheduleAdmin(DutySchedule, admin.site)
+
+        # Step 1: editable until a duty follows it
+        self.assertEqual(tuple(schedule_admin.get_readonly_fields(None, schedule)), ())
+        Duty.objects.create(schedule=schedule)
+        self.assertEqual(schedule_admin.get_readonly_fields(None, schedule), DutySchedule.TIMELINE_FIELDS)
+
+        # Step 2: edit by another process, no signal here
+        DutySchedule.lookup(schedule.pk)
+        DutySchedule.objects.filter(pk=schedule.pk).update(duty_duration=90)
+        self.assertEqual(DutySchedule.lookup(schedule.pk).duty_duration, 60)
+        with mock.patch('duties.models.duty_schedule.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(DutySchedule.lookup(schedule.pk).duty_duration, 90)
+
+    def test_force_end_duty_clamps_tasks(self):
+        """Test tasks never end after a warped back duty_end.
+        """
+        duty = Duty.objects.create()
+        duty_end = duty.task2_start + timedelta(minutes=10)
+        duty.update_duty_end(duty_end)
+
+        # verify task1 is untouched, task2 and task3 end with the duty
+        self.assertEqual(duty.task1_end, duty.task1_start + timedelta(minutes=Duty.TASK_WINDOW))
+        self.assertEqual(duty.task2_end, duty_end)
+        self.assertEqual(duty.task3_end, duty_end)
+
     def test_delete_zombie_duty(self):
         """Test deleting zombie duty works. Accessing deleted duty by id will
         raise Duty.DoesNotExist exceptions.
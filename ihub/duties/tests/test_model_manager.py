@@ -1,3 +1,10 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from duties.tests.base_class import BaseDutyTestCase
 from bridge.constants.errors import (
     MaxDutyCountError, UnfinishedDutyError
@@ -12,7 +19,7 @@ class DutyManagerTests(BaseDutyTestCase):
     """
 
     def setUp(self):
-        pass
+        super(DutyManagerTests, self).setUp()
 
     def test_manager_singularity_creation(self):
         """Test manager model is a singular db model, and load() will give same reference to
@@ -112,6 +119,117 @@ class DutyManagerTests(BaseDutyTestCase):
         self.assertIn(duty, debtee.duty_debt_set.all())
         self.assertTrue(debtee.duty_debt_set.filter(pk=duty.id).exists())
 
+    def test_manager_start_duty_rejects_unfinished_duty(self):
+        """Test manager refuses a second duty of the same user even when
+        capacity is still available.
+        """
+        user = self.generate_ihub_user()
+        duty_manager = DutyManager.objects.create(name="Desk", slug='desk', capacity=2)
+
+        duty_manager.start_duty(user)
+        with self.assertRaises(UnfinishedDutyError):
+            duty_manager.start_duty(user)
+
+        self.assertEqual(user.duty_set.count(), 1)
+
+    def test_manager_start_duty_constant_queries(self):
+        """Test admission issues the same number of statements regardless of
+        how many finished duties are in history.
+        """
+        duty_manager = DutyManager.load()
+
+        # Step 1: admit with empty history
+        user1 = self.generate_ihub_user()
+        with CaptureQueriesContext(connection) as empty_history:
+            duty_manager.start_duty(user1)
+        duty_manager.get_duties_of(user1)[0].force_finish_duty()
+
+        # Step 2: grow history with finished duties of other users
+        owner = self.generate_ihub_user()
+        for _ in range(50):
+            owner.duty_set.create().force_finish_duty()
+
+        # Step 3: admit again and verify statement count did not change
+        user2 = self.generate_ihub_user()
+        with CaptureQueriesContext(connection) as long_history:
+            duty_manager.start_duty(user2)
+        self.assertEqual(len(empty_history), len(long_history))
+
+    def test_managers_partition_capacity(self):
+        """Test each desk admits up to its own capacity, and a user on duty at
+        one desk cannot start a duty at another.
+        """
+        user1 = self.generate_ihub_user()
+        user2 = self.generate_ihub_user()
+        user3 = self.generate_ihub_user()
+        default_manager = DutyManager.load()
+        desk_manager = DutyManager.objects.create(name="Desk 2", slug='desk-2', capacity=2)
+
+        # Step 1: fill the default desk, desk 2 still admits
+        default_manager.start_duty(user1)
+        with self.assertRaises(MaxDutyCountError):
+            default_manager.start_duty(user2)
+        desk_manager.start_duty(user2)
+
+        # Step 2: user1 is refused at desk 2 although it has room
+        with self.assertRaises(UnfinishedDutyError):
+            desk_manager.start_duty(user1)
+
+        # Step 3: verify duties are partitioned by desk
+        desk_manager.start_duty(user3)
+        self.assertEqual(default_manager.get_onduty_user_ids(), [user1.id])
+        self.assertEqual(sorted(desk_manager.get_onduty_user_ids()), sorted([user2.id, user3.id]))
+        self.assertEqual(DutyManager.load('desk-2'), desk_manager)
+
+    def test_manager_start_duties_roster(self):
+        """Test manager admits a roster in order, reporting per item why an
+        assignment is refused.
+        """
+        users = [self.generate_ihub_user() for _ in range(4)]
+        debtee = self.generate_ihub_user()
+        onduty_user = self.generate_ihub_user()
+        DutyManager.load().start_duty(onduty_user)
+        duty_manager = DutyManager.objects.create(name="Desk", slug='desk', capacity=2)
+
+        results = duty_manager.start_duties([
+            {'matric': users[0].matric, 'debtee': debtee.matric},
+            {'matric': 'U0000000X'},
+            {'matric': users[1].matric, 'debtee': users[1].matric},
+            {'matric': onduty_user.matric},
+            {'matric': users[0].matric},
+            {'matric': users[2].matric},
+            {'matric': users[3].matric},
+        ])
+
+        # verify per item outcome: admitted, unknown, self debt, on duty,
+        # duplicate, admitted, over capacity
+        self.assertEqual([result['success'] for result in results],
+            [True, False, False, False, False, True, False])
+        self.assertEqual(results[6]['message'], MaxDutyCountError().message)
+
+        # verify duties are stored with timings and relations
+        self.assertEqual(sorted(duty_manager.get_onduty_user_ids()), sorted([users[0].id, users[2].id]))
+        duty = duty_manager.get_duties_of(users[0])[0]
+        self.assertEqual(duty.debtee, debtee)
+        self.verify_default_duty_timings(duty)
+
+    def test_manager_start_duties_constant_queries(self):
+        """Test roster admission statement count does not grow with roster size.
+        """
+        duty_manager = DutyManager.objects.create(name="Desk", slug='desk', capacity=100)
+        small = [{'matric': self.generate_ihub_user().matric},
+            {'matric': self.generate_ihub_user().matric, 'debtee': self.generate_ihub_user().matric}]
+        large = [{'matric': self.generate_ihub_user().matric,
+            'debtee': self.generate_ihub_user().matric} for _ in range(20)]
+
+        with CaptureQueriesContext(connection) as small_roster:
+            duty_manager.start_duties(small)
+        with CaptureQueriesContext(connection) as large_roster:
+            results = duty_manager.start_duties(large)
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(len(small_roster), len(large_roster))
+
     def test_manager_filter_finished_duties(self):
         """Test given several duties which some has been finished, manager is able to
         filter finished duties.
@@ -204,5 +322,66 @@ class DutyManagerTests(BaseDutyTestCase):
         self.assertTrue(duty_manager.is_onduty(user2))
         self.assertFalse(duty_manager.is_onduty(user3))
 
+    def test_manager_lazy_expiry_reads_do_not_write(self):
+        """Test finished duties still attached to manager are not on duty, and
+        reading on-duty state issues no write statement.
+        """
+        user1 = self.generate_ihub_user()
+        user2 = self.generate_ihub_user()
+        duty_manager = DutyManager.load()
+
+        # Step 1: attach an ongoing and a finished duty
+        duty1 = user1.duty_set.create()
+        duty2 = user2.duty_set.create()
+        duty_manager.active_duties.add(duty1, duty2, bulk=True)
+        duty2.force_finish_duty()
+
+        # Step 2: read on-duty state
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(duty_manager.is_onduty(user1))
+            self.assertFalse(duty_manager.is_onduty(user2))
+            self.assertEqual(duty_manager.get_onduty_user_ids(), [user1.id])
+            self.assertEqual(duty_manager.get_duties_of(user2), tuple())
+
+        # Step 2b: verify only reads were issued and finished duty is still attached
+        for query in ctx.captured_queries:
+            self.assertTrue(query['sql'].startswith('SELECT'), query['sql'])
+        self.assertEqual(duty_manager.active_duties.count(), 2)
+
+    def test_manager_load_memoized(self):
+        """Test load() memoizes desk rows read outside transactions, gives a
+        new instance per call, and forgets rows once a desk is saved.
+        """
+        desk = DutyManager.objects.create(name="Memo desk", slug='memo', capacity=3)
+        self.addCleanup(DutyManager.clear_cache)
+
+        # Step 1: rows read in a transaction are not memoized (may roll back)
+        DutyManager.load('memo')
+        with self.assertNumQueries(1):
+            DutyManager.load('memo')
+
+        # Step 2: outside transactions, the second load hits the memo
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            DutyManager.load('memo')
+        with self.assertNumQueries(0):
+            desk1 = DutyManager.load('memo')
+            desk2 = DutyManager.load('memo')
+        self.assertEqual((desk1.pk, desk1.capacity), (desk.pk, 3))
+        self.assertIsNot(desk1, desk2)
+        self.assertFalse(desk1._state.adding)
+
+        # Step 3: saving the desk drops the memo
+        desk.capacity = 5
+        desk.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(DutyManager.load('memo').capacity, 5)
+
+    def test_startup_issues_no_queries(self):
+        """Test booting the project (setup, middleware, URLconf) hits no database.
+        """
+        stdout = StringIO()
+        call_command('profile_startup', max_queries=0, stdout=stdout)
+        self.assertIn('=== Import time per app', stdout.getvalue())
+
     def tearDown(self):
         pass
\ No newline at end of file
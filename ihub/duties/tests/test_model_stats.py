@@ -0,0 +1,83 @@
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from duties.tests.base_class import BaseDutyTestCase
+from duties.models import DutyManager, DutySchedule, UserDutyStats
+
+
+class UserDutyStatsTests(BaseDutyTestCase):
+    """Tests incremental maintenance of per-user duty statistics.
+    """
+
+    def setUp(self):
+        super(UserDutyStatsTests, self).setUp()
+        self.duty_manager = DutyManager.objects.create(name="Stats desk", slug='stats', capacity=10)
+        self.duration = DutySchedule.get_default().duty_duration * 60
+
+    def test_stats_follow_duty_lifecycle(self):
+        """Test stats are credited on start, adjusted on force finish,
+        and agree with a rebuild from the duty table.
+        """
+        user1, user2, user3 = [self.generate_ihub_user() for _ in range(3)]
+
+        # Step 1: user1 covers user2, roster starts user3 covering user2
+        duty1 = self.duty_manager.start_duty(user1, debtee=user2)
+        self.duty_manager.start_duties([{'matric': user3.matric, 'debtee': user2.matric}])
+
+        stats1 = UserDutyStats.objects.for_user(user1)
+        self.assertEqual((stats1.duty_count, stats1.seconds_served), (1, self.duration))
+        self.assertEqual(UserDutyStats.objects.for_user(user3).duty_count, 1)
+        self.assertEqual(UserDutyStats.objects.for_user(user2).debts_owed, 2)
+
+        # Step 2: force finish takes back the unserved time
+        duty1.force_finish_duty()
+        duty1.refresh_from_db()
+        served = int((duty1.duty_end - duty1.duty_start).total_seconds())
+        self.assertEqual(UserDutyStats.objects.for_user(user1).seconds_served, served)
+
+        # Step 3: rebuild from scratch gives the same numbers
+        before = list(UserDutyStats.objects.order_by('user_id').values_list())
+        UserDutyStats.objects.all().delete()
+        call_command('rebuild_duty_stats', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(UserDutyStats.objects.order_by('user_id').values_list()), before)
+
+    def test_home_view_reads_stats_row(self):
+        """Test home page shows stats, zero for a user without duties.
+        """
+        user = self.generate_ihub_user(password='password123')
+        self.client.force_login(user)
+
+        response1 = self.client.get(reverse('users:home'))
+        self.assertEqual(response1.context['duty_stats'].duty_count, 0)
+
+        self.duty_manager.start_duty(user)
+        response2 = self.client.get(reverse('users:home'))
+        self.assertEqual(response2.context['duty_stats'].duty_count, 1)
+        self.assertContains(response2, 'Hours served: <strong>%s</strong>' % round(self.duration / 3600, 1))
+
+    def test_stats_updated_in_chunks(self):
+        """Test a roster credits its users in chunks of UPDATE_CHUNK_SIZE,
+        and the migration backfill gives the same numbers.
+        """
+        users = [self.generate_ihub_user() for _ in range(5)]
+        roster = [{'matric': user.matric} for user in users]
+
+        with mock.patch('duties.models.duty_stats.UPDATE_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connection) as ctx:
+            self.duty_manager.start_duties(roster)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "duties_userdutystats"')]
+        self.assertEqual(len(updates), 3)
+        for user in users:
+            self.assertEqual(UserDutyStats.objects.for_user(user).seconds_served, self.duration)
+
+        before = list(UserDutyStats.objects.order_by('user_id').values_list())
+        migration = import_module('duties.migrations.0014_backfill_user_duty_stats')
+        migration.backfill_duty_stats(apps, None)
+        self.assertEqual(list(UserDutyStats.objects.order_by('user_id').values_list()), before)
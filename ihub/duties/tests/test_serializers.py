@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from duties.tests.base_class import BaseDutyTestCase
+from duties.models import Duty, DutyManager
+from duties.serializers import DutySerializer, FastDutySerializer
+from duties.serializers.fast import DateTimeFormat
+
+
+class FastDutySerializerTests(BaseDutyTestCase):
+    """Tests the fast path renders exactly what DutySerializer renders.
+    """
+
+    def setUp(self):
+        super(FastDutySerializerTests, self).setUp()
+        self.duty_manager = DutyManager.objects.create(name="Serializer desk", slug='serializer', capacity=10)
+        user1, user2, user3 = [self.generate_ihub_user() for _ in range(3)]
+        # no debtee, debtee, and an active duty with last_active set
+        self.duty_manager.start_duty(user1)
+        self.duty_manager.start_duty(user2, debtee=user1)
+        duty3 = self.duty_manager.start_duty(user3, debtee=user2)
+        duty3.last_active = timezone.now()
+        duty3.save()
+
+    @property
+    def queryset(self):
+        return Duty.objects.order_by('id')
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_fast_serializer_byte_identical(self):
+        """Test instances and querysets give the bytes of DutySerializer,
+        in the configured and in the ISO 8601 datetime format.
+        """
+        for output_format in (api_settings.DATETIME_FORMAT, '%Y-%m-%dT%H:%M:%S.%f%%', 'iso-8601'):
+            with self.subTest(format=output_format), self.settings(REST_FRAMEWORK={'DATETIME_FORMAT': output_format}):
+                expected = self.render(DutySerializer(self.queryset, many=True).data)
+                self.assertEqual(self.render(FastDutySerializer(self.queryset).data), expected)
+                self.assertEqual(self.render(FastDutySerializer.from_queryset(self.queryset)), expected)
+
+        # debtees already loaded are not read again
+        duties, joined_duties = list(self.queryset), list(self.queryset.select_related('debtee'))
+        with self.assertNumQueries(0):
+            FastDutySerializer(joined_duties).data
+        with self.assertNumQueries(1):
+            FastDutySerializer(duties).data
+        with self.assertNumQueries(1):
+            FastDutySerializer.from_queryset(self.queryset)
+
+    @override_settings(TIME_ZONE='UTC')
+    def test_fast_serializer_follows_timezone(self):
+        """Test datetimes are localized in the current timezone, as DRF does.
+        """
+        with timezone.override('America/New_York'):
+            expected = self.render(DutySerializer(self.queryset, many=True).data)
+            self.assertEqual(self.render(FastDutySerializer.from_queryset(self.queryset)), expected)
+
+            # minutes around the end of daylight saving time
+            transition = timezone.make_aware(datetime(2019, 11, 3, 6, 0), timezone.utc)
+            values = [transition + timedelta(minutes=minutes) for minutes in range(-70, 70, 7)]
+            field = serializers.DateTimeField(format=api_settings.DATETIME_FORMAT)
+            self.assertEqual(DateTimeFormat.get(api_settings.DATETIME_FORMAT).format_many(values),
+                [field.to_representation(value) for value in values])
@@ -0,0 +1,104 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+
+from duties.tests.base_class import BaseDutyTestCase
+from duties.models import (
+    Duty, DutyManager
+)
+from duties.sweeper import FinishedDutySweeper, autostart, request_sweep
+
+
+class FinishedDutySweeperTests(BaseDutyTestCase):
+    """Tests background sweep of finished duties.
+    """
+
+    def test_sweep_detaches_finished_duties_in_batches(self):
+        """Test sweep detaches every finished duty, across several batches,
+        and keeps ongoing duties attached.
+        """
+        duty_manager = DutyManager.load()
+
+        # Step 1: attach 5 finished duties and 1 ongoing duty
+        finished = [Duty.objects.create() for _ in range(5)]
+        ongoing = Duty.objects.create()
+        duty_manager.active_duties.add(*finished, ongoing, bulk=True)
+        for duty in finished:
+            duty.force_finish_duty()
+
+        # Step 2: sweep with batch smaller than finished duties
+        sweeper = FinishedDutySweeper(batch_size=2)
+        self.assertEqual(sweeper.sweep(), 5)
+
+        # Step 3: verify only ongoing duty is left attached
+        self.assertEqual(list(duty_manager.active_duties.all()), [ongoing])
+        self.assertIsNotNone(sweeper.last_sweep)
+
+        # Step 4: verify sweeping again has nothing left to do
+        self.assertEqual(sweeper.sweep(), 0)
+
+    def test_requested_sweeps_debounced(self):
+        """Test requests wake the sweeper before its interval, and requests
+        right after a sweep are coalesced into one, SWEEP_DEBOUNCE later.
+        """
+        sweeper = FinishedDutySweeper(interval=60, debounce=0.3)
+        sweeps = []
+
+        def sweep():
+            sweeps.append(time.monotonic())
+            sweeper.last_sweep = sweeps[-1]
+            return 0
+
+        def wait_sweeps(count):
+            deadline = time.monotonic() + 5
+            while len(sweeps) < count and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(sweeps), count)
+
+        sweeper.sweep = sweep
+        with mock.patch('duties.sweeper._sweeper', sweeper):
+            sweeper.start()
+            self.addCleanup(sweeper.join, 5)
+            self.addCleanup(sweeper.stop)
+
+            # Step 1: a request wakes the sweeper well before the interval
+            request_sweep()
+            wait_sweeps(1)
+
+            # Step 2: requests right after a sweep wait for the debounce, once
+            request_sweep()
+            request_sweep()
+            wait_sweeps(2)
+            self.assertGreaterEqual(sweeps[1] - sweeps[0], 0.3)
+            time.sleep(0.4)
+            self.assertEqual(len(sweeps), 2)
+
+            # Step 3: stopping ends the loop
+            sweeper.stop()
+            sweeper.join(5)
+            self.assertFalse(sweeper.is_alive())
+
+    def test_admission_requests_sweep(self):
+        """Test admitting a duty requests a sweep once committed.
+        """
+        user = self.generate_ihub_user()
+        with mock.patch('duties.models.duty_manager.transaction.on_commit') as on_commit:
+            DutyManager.load().start_duty(user)
+        self.assertIn(mock.call(request_sweep), on_commit.call_args_list)
+
+    def test_autostart_with_lazy_expiry(self):
+        """Test serving processes start a sweeper with lazy expiry, and warn
+        when autostart is turned off.
+        """
+        with mock.patch('duties.sweeper.start_sweeper') as start:
+            autostart()
+            self.assertEqual(start.call_count, 1)
+
+            with override_settings(DUTIES=dict(settings.DUTIES, SWEEP_AUTOSTART=False)):
+                with self.assertLogs('duties.sweeper', 'WARNING'):
+                    self.assertIsNone(autostart())
+            with override_settings(DUTIES=dict(settings.DUTIES, LAZY_EXPIRY=False)):
+                self.assertIsNone(autostart())
+            self.assertEqual(start.call_count, 1)
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from bridge.tracing import get_trace_writer, read_traces, span
+from duties.tests.base_class import BaseDutyAPITestCase
+
+
+class TracingTests(BaseDutyAPITestCase):
+    """Tests sampled spans of requests and duty methods, and their report.
+    """
+
+    def setUp(self):
+        super(TracingTests, self).setUp()
+        self.prepare_manager()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'traces.jsonl')
+        override = override_settings(TRACE_PATH=self.path, TRACE_SAMPLE_RATE=1)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def read_traces(self):
+        get_trace_writer().flush()
+        return list(read_traces(self.path))
+
+    def test_request_traced_with_nested_spans(self):
+        """Test a request is the root of a trace nesting the duty methods it
+        calls, each with its own SQL statements.
+        """
+        user = self.generate_ihub_user()
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('duties:duty-create'))
+        queries = len(ctx.captured_queries)
+        self.assertEqual(response.status_code, 201)
+
+        # Step 1: one trace, named after the view, counting every statement
+        trace, = self.read_traces()
+        self.assertEqual(trace['name'], 'duties:duty-create')
+        self.assertEqual(trace['sql'], queries)
+
+        # Step 2: spans nested as called
+        start_duty, = [node for node in trace['children'] if node['name'] == 'DutyManager.start_duty']
+        names = [node['name'] for node in start_duty['children']]
+        self.assertEqual(names, ['DutyManager.begin_admission', 'Duty.save'])
+        self.assertLessEqual(sum(node['sql'] for node in start_duty['children']), start_duty['sql'])
+        self.assertLessEqual(start_duty['children'][1]['ms'], start_duty['ms'])
+
+        # Step 3: report of the trace
+        stdout = StringIO()
+        call_command('trace_report', path=self.path, folded=True, stdout=stdout)
+        self.assertIn('duties:duty-create;DutyManager.start_duty;Duty.save ', stdout.getvalue())
+        stdout = StringIO()
+        call_command('trace_report', path=self.path, min_percent=0, stdout=stdout)
+        self.assertIn('      DutyManager.begin_admission\n', stdout.getvalue())
+
+    def test_sampling_decided_at_root(self):
+        """Test a trace is recorded whole or not at all, drawn once.
+        """
+        with override_settings(TRACE_SAMPLE_RATE=0.5), \
+                mock.patch('bridge.tracing.random.random', return_value=0.9) as draw:
+            with span('root'):
+                self.duty_manager.get_onduty_user_ids()
+            self.assertEqual(draw.call_count, 1)
+
+            draw.return_value = 0.1
+            with span('root'):
+                self.duty_manager.get_onduty_user_ids()
+            self.assertEqual(draw.call_count, 2)
+
+        trace, = self.read_traces()
+        self.assertEqual(trace['children'][0]['name'], 'DutyManager.get_onduty_user_ids')
+        self.assertEqual(trace['children'][0]['children'][0]['name'], 'manager_refresh')
+
+    def test_failed_span_recorded(self):
+        """Test a span left by an exception is closed and marked.
+        """
+        with self.assertRaises(KeyError):
+            with span('root'):
+                with span('lookup'):
+                    {}['missing']
+        trace, = self.read_traces()
+        self.assertEqual(trace['children'][0]['error'], 'KeyError')
+        self.assertEqual(trace['error'], 'KeyError')
+
+    def test_full_trace_file_rotated(self):
+        """Test a trace file past TRACE_MAX_BYTES is moved aside before writing.
+        """
+        with override_settings(TRACE_MAX_BYTES=1):
+            writer = get_trace_writer()
+            writer.put({'name': 'first', 'ms': 1.0, 'sql': 0})
+            writer.flush()
+            writer.put({'name': 'second', 'ms': 1.0, 'sql': 0})
+            writer.flush()
+        self.assertEqual([trace['name'] for trace in read_traces(self.path + '.1')], ['first'])
+        self.assertEqual([trace['name'] for trace in read_traces(self.path)], ['second'])
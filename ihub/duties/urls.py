@@ -2,7 +2,9 @@ from django.contrib import admin
 from django.urls import path, include
 from .views import (
     duty_api_start_view, duty_api_detail_view,
-    duty_template_view
+    duty_api_roster_view, duty_api_settlement_view,
+    duty_api_v2_start_view, duty_api_v2_detail_view,
+    duty_events_view, duty_export_view, duty_template_view
 )
 
 app_name = 'duties'
@@ -14,9 +16,20 @@ page_urlpath = [
 api_urlpath = [
     path('create/', duty_api_start_view, name='duty-create'),
     path('details/', duty_api_detail_view, name='duty-details'),
+    path('events/', duty_events_view, name='duty-events'),
+    path('roster/', duty_api_roster_view, name='duty-roster'),
+    path('export/', duty_export_view, name='duty-export'),
+    path('debts/settlement/', duty_api_settlement_view, name='duty-settlement'),
+]
+
+# compact wire format, see duties/views/api_v2.py
+api_v2_urlpath = [
+    path('create/', duty_api_v2_start_view, name='duty-v2-create'),
+    path('details/', duty_api_v2_detail_view, name='duty-v2-details'),
 ]
 
 urlpatterns = [
     path('', include(page_urlpath)),
     path('api/', include(api_urlpath)),
+    path('api/v2/', include(api_v2_urlpath)),
 ]
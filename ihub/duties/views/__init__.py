@@ -1,6 +1,10 @@
 # import all views here!
 from .api import (
-    duty_api_start_view, duty_api_detail_view
+    duty_api_start_view, duty_api_detail_view,
+    duty_api_roster_view, duty_api_settlement_view,
 )
+from .api_v2 import duty_api_v2_start_view, duty_api_v2_detail_view
 
+from .events import duty_events_view
+from .export import duty_export_view
 from .pages import duty_template_view
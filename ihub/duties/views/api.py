@@ -1,33 +1,45 @@
+import hashlib
 from datetime import datetime, timedelta
 
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
 from django.shortcuts import get_object_or_404
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 
+from duties.conf import duty_settings
 from duties.models import (
-    Duty, DutyManager
+    DebtBalance, Duty
 )
-from duties.serializers import DutySerializer
+from duties.routing import get_manager
+from duties.serializers import DutySerializer, FastDutySerializer
 from users.serializers import UserSerializer
 from bridge.constants.errors import (
-	MaxDutyCountError, UnfinishedDutyError
+	MaxDutyCountError, SelfDebtError, UnfinishedDutyError
 )
 
 User = get_user_model()
-duty_manager = DutyManager.load()
 
 
-@api_view(['POST'])
-@permission_classes((IsAuthenticated, ))
-def duty_api_start_view(request):
-    # preprocessing
-    duty_manager.remove_finished_duties()
+def format_now():
+    """Server time as sent by the v1 API.
+    """
+    return "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime())
+
 
+def start_duty_response(request, serializer_class, server_now):
+    """Start a duty of the request user, shared by the API versions.
+
+    Args:
+        serializer_class (Serializer): serializer of the started duty
+        server_now (callable): server time, as the version represents it
+    """
+    duty_manager = get_manager(request)
     user = request.user
     debtee = None
 
@@ -39,8 +51,8 @@ def duty_api_start_view(request):
         if debtee == user:
             return Response({
                 'success': False,
-                'message': "Cannot specify yourself as in-debt friend. Do you mistype friend matric no. with yours?",
-                'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
+                'message': SelfDebtError().message,
+                'now': server_now(),
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
@@ -55,50 +67,164 @@ def duty_api_start_view(request):
             {
                 'success': False,
                 'message': e.message,
-                'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
+                'now': server_now(),
             },
             status=status.HTTP_400_BAD_REQUEST 
         )
 
     # success
-    serializer = DutySerializer(duty)
+    serializer = serializer_class(duty)
     return Response(
         {
             'success': True,
             'message': "Object %s created successfully" % duty,
             'payload': serializer.data,
-            'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
+            'now': server_now(),
         },
         status=status.HTTP_201_CREATED
     )
 
 
+def get_details_etag(duties, capacity, variant=''):
+    """ETag of the duty details payload, from the version of each duty and
+    the desk capacity (part of the message). `variant` tells apart the
+    representations (wire formats) of the same payload.
+    """
+    versions = "%s|%d|%s" % (','.join(duty.version for duty in duties), capacity, variant)
+    return quote_etag(hashlib.sha1(versions.encode()).hexdigest()[:20])
+
+
+def duty_details_response(request, serializer_class, server_now):
+    """Duties of the request user at the desk, shared by the API versions.
+
+    The payload only changes with the duties, so it carries an ETag and a
+    matching If-None-Match is answered with 304 before serializing anything.
+    Server time is sent in the X-Server-Now header, to keep the body stable.
+
+    Args:
+        serializer_class (FastDutySerializer): serializer of the duty list
+        server_now (callable): server time, as the version represents it
+    """
+    duty_manager = get_manager(request)
+    user = request.user
+    duties = duty_manager.get_duties_of(user)
+
+    if not duties:
+        return Response(
+            {
+                'success': False, 
+                'message': "User's duty is not registered in manager",
+                'now': server_now(),
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    etag = get_details_etag(duties, duty_manager.capacity, request.accepted_renderer.format)
+    response = get_conditional_response(request, etag=etag)
+
+    # success
+    if response is None:
+        serializer = serializer_class(duties)
+        response = Response(
+            {
+                'success': True,
+                'message': "Duties sent. MAX_DUTY: %d" % duty_manager.capacity,
+                'payload': serializer.data,
+            },
+            status=status.HTTP_200_OK
+        )
+    response['ETag'] = etag
+    response['X-Server-Now'] = server_now()
+    # clients may keep the payload, but revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Accept', ))
+    return response
+
+
+@api_view(['POST'])
+@permission_classes((IsAuthenticated, ))
+def duty_api_start_view(request):
+    return start_duty_response(request, DutySerializer, format_now)
+
+
 @api_view(['GET'])
 @permission_classes((IsAuthenticated, ))
 def duty_api_detail_view(request):
-    user = request.user
+    """Duties of the user at the desk, see `duty_details_response`.
+    """
+    return duty_details_response(request, FastDutySerializer, format_now)
+
 
-    # preprocessing
-    duty_manager.remove_finished_duties()
+def is_assignment(item):
+    """Whether a roster item has a matric and, if any, a debtee as strings.
+    """
+    return (isinstance(item, dict) and isinstance(item.get('matric'), str)
+        and isinstance(item.get('debtee') or '', str))
 
-    if (user.duty_set.count() == 0) or (duty_manager.is_onduty(user) == False):
+
+@api_view(['POST'])
+@permission_classes((IsAdminUser, ))
+def duty_api_roster_view(request):
+    """Start a roster of duties at once, for coordinators.
+
+    Body: {"assignments": [{"matric": "U1234567A", "debtee": "U7654321B"}, ...]},
+    debtee is optional. Each item is admitted or refused on its own.
+    """
+    duty_manager = get_manager(request)
+    assignments = request.data.get('assignments') if isinstance(request.data, dict) else None
+
+    if (not isinstance(assignments, list) or not assignments
+            or not all(is_assignment(item) for item in assignments)
+            or len(assignments) > duty_settings.ROSTER_MAX_SIZE):
         return Response(
             {
-                'success': False, 
-                'message': "User's duty is not registered in manager",
+                'success': False,
+                'message': "Roster needs a list of 1 to %d assignments with matric no." % duty_settings.ROSTER_MAX_SIZE,
                 'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
             },
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # success
-    duties = duty_manager.get_duties_of(user)
-    serializer = DutySerializer(duties, many=True)
+    results = duty_manager.start_duties(assignments)
+    payload = [
+        {
+            'success': result['success'],
+            'message': result['message'],
+            'payload': DutySerializer(result['duty']).data if result['duty'] else None,
+        }
+        for result in results
+    ]
+    admitted = sum(1 for result in results if result['success'])
+    return Response(
+        {
+            'success': admitted == len(results),
+            'message': "%d of %d duties started" % (admitted, len(results)),
+            'payload': payload,
+            'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
+        },
+        status=status.HTTP_201_CREATED if admitted else status.HTTP_400_BAD_REQUEST
+    )
+
+
+@api_view(['GET'])
+@permission_classes((IsAdminUser, ))
+def duty_api_settlement_view(request):
+    """Net transfers of duties that settle every debt in the ledger, for staff.
+    """
+    transfers = DebtBalance.objects.settlement()
+    user_ids = set()
+    for debtor, creditor, amount in transfers:
+        user_ids.update((debtor, creditor))
+    matrics = dict(User.objects.filter(id__in=user_ids).values_list('id', 'matric'))
+
     return Response(
         {
             'success': True,
-            'message': "Duties sent. MAX_DUTY: %d" % DutyManager.MAX_DUTY,
-            'payload': serializer.data,
+            'message': "%d transfers settle all debts" % len(transfers),
+            'payload': [
+                {'debtor': matrics[debtor], 'creditor': matrics[creditor], 'duties': amount}
+                for debtor, creditor, amount in transfers
+            ],
             'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
         },
         status=status.HTTP_200_OK
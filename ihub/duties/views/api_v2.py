@@ -0,0 +1,40 @@
+"""
+Module api_v2.py
+
+Duty API v2: same endpoints and messages as v1, with a compact wire format.
+Datetimes, server time included, are integer milliseconds since the Unix
+epoch (unambiguous across timezones, no parsing on clients) and bodies are
+JSON or, with `Accept: application/msgpack`, MessagePack.
+
+"""
+from django.utils import timezone
+
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated
+
+from duties.renderers import API_V2_RENDERERS
+from duties.serializers import DutyV2Serializer, FastDutyV2Serializer
+from duties.serializers.fields import epoch_milliseconds
+from duties.views.api import duty_details_response, start_duty_response
+
+
+def epoch_now():
+    """Server time as sent by the v2 API.
+    """
+    return epoch_milliseconds(timezone.now())
+
+
+@api_view(['POST'])
+@permission_classes((IsAuthenticated, ))
+@renderer_classes(API_V2_RENDERERS)
+def duty_api_v2_start_view(request):
+    return start_duty_response(request, DutyV2Serializer, epoch_now)
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated, ))
+@renderer_classes(API_V2_RENDERERS)
+def duty_api_v2_detail_view(request):
+    """Duties of the user at the desk, see `duty_details_response`.
+    """
+    return duty_details_response(request, FastDutyV2Serializer, epoch_now)
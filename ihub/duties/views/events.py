@@ -0,0 +1,37 @@
+from django.http import StreamingHttpResponse
+
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+
+from duties.events import get_broker, stream_events
+from duties.renderers import EventStreamRenderer
+from duties.routing import get_manager
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated, ))
+@renderer_classes((EventStreamRenderer, JSONRenderer))
+def duty_events_view(request):
+    """Stream duty state changes of the desk as Server-Sent Events.
+
+    Clients resume after a reconnect with the Last-Event-ID header (sent by
+    EventSource) or `last_event_id` query parameter. Ids are per process,
+    see duties/events.py.
+
+    The stream holds a thread of a WSGI server for as long as the client is
+    connected, serve it through ASGI (duties/asgi.py) in production.
+    """
+    duty_manager = get_manager(request)
+    last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription = get_broker().subscribe(desk=duty_manager.slug, last_event_id=last_event_id)
+    response = StreamingHttpResponse(stream_events(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # ask nginx-like proxies not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,50 @@
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.views import status
+from rest_framework.permissions import IsAdminUser
+
+from duties.export import (
+    CONTENT_TYPES, EXPORT_FORMATS, export_duties, parse_date_range
+)
+
+
+@api_view(['GET'])
+@permission_classes((IsAdminUser, ))
+def duty_export_view(request):
+    """Stream duty history for payroll, for staff.
+
+    Query: ?start=YYYY-MM-DD&end=YYYY-MM-DD (both inclusive),
+    optional output=csv|ndjson (default csv), gzip=1 and archive=1.
+    """
+    params = request.query_params
+    output = params.get('output', 'csv')
+    try:
+        if output not in EXPORT_FORMATS:
+            raise ValueError("output must be one of %s" % ', '.join(EXPORT_FORMATS))
+        start, end = parse_date_range(params.get('start', ''), params.get('end', ''))
+    except ValueError as e:
+        return Response(
+            {
+                'success': False,
+                'message': "Invalid export request: %s" % e,
+                'now': "{:%m/%d/%Y %H:%M:%S}".format(timezone.localtime()),
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    compress = params.get('gzip') == '1'
+    filename = "duties_%s_%s.%s" % (params['start'], params['end'], output)
+    content_type = CONTENT_TYPES[output]
+    if compress:
+        filename, content_type = filename + '.gz', 'application/gzip'
+
+    response = StreamingHttpResponse(
+        export_duties(start, end, output,
+            include_archive=params.get('archive') == '1', compress=compress),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
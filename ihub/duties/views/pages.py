@@ -4,15 +4,17 @@ from django.views.generic.detail import DetailView
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
+from duties.conf import duty_settings
+from duties.routing import get_desk_slug, get_manager
 from duties.serializers import DutySerializer
 from users.serializers import UserSerializer
 from duties.models import (
-    Duty, DutyManager
+    Duty
 )
 
 User = get_user_model()
-duty_manager = DutyManager.load()
 
 @login_required
 def duty_template_view(request):
@@ -20,8 +22,21 @@ def duty_template_view(request):
     """
     if request.method == 'GET':
         user = request.user
+        if get_desk_slug(request) is None:
+            # no desk named, go to the desk of the running duty if any
+            duty = (Duty.objects
+                .filter(user=user, manager__isnull=False, duty_end__gt=timezone.now())
+                .select_related('manager').first())
+            duty_manager = duty.manager if duty is not None else get_manager(request)
+        else:
+            duty_manager = get_manager(request)
         if duty_manager.is_onduty(user):
-            return render(request, 'onduty.html')
+            return render(request, 'onduty.html', {
+                'desk': duty_manager.slug,
+                # a stream pins a thread of a WSGI server, only opened on ASGI
+                'event_stream': 'asgi.version' in request.META,
+                'poll_interval': duty_settings.DETAILS_POLL_INTERVAL,
+            })
         return render(request, 'getstarted.html')
     else:
         return HttpResponseNotAllowed("Wrong Method")
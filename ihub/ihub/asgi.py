@@ -0,0 +1,17 @@
+"""
+ASGI config for ihub project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no ASGI handler of its own, see duties/asgi.py for what is
+served on the event loop and what runs the WSGI application on a thread pool.
+
+Serve with any ASGI 3.0 server, e.g. ``uvicorn ihub.asgi:application``, or
+locally with ``python manage.py runasgi``.
+"""
+
+# also publishes the snapshot and starts the sweeper of the process
+from ihub.wsgi import application as wsgi_application
+
+from duties.asgi import DutyASGIApplication
+
+application = DutyASGIApplication(wsgi_application)
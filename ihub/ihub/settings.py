@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SITE_ROOT = os.path.dirname(os.path.realpath(__file__))
@@ -44,18 +46,23 @@ INSTALLED_APPS = [
     # applications
     'users',
     'duties',
+    'utils',
     # third-party libraries
     'rest_framework',
     'widget_tweaks',
 ]
 
+# session, auth and messages middlewares are skipped by token API requests,
+# see users/middleware.py; metrics go first to time the whole stack
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'users.middleware.LeanSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'users.middleware.LeanAuthenticationMiddleware',
+    'utils.profiling.ProfilingMiddleware',
+    'users.middleware.LeanMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -65,6 +72,57 @@ ROOT_URLCONF = 'ihub.urls'
 
 REST_FRAMEWORK = {
     'DATETIME_FORMAT': "%m/%d/%Y %H:%M:%S",
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'rest_framework.authentication.SessionAuthentication',
+        'users.authentication.ApiTokenAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ),
+}
+
+# `Authorization: Token <key>` API clients, see users/authentication.py
+API_TOKEN_PATH_PREFIX = '/duties/api/'
+API_TOKEN_CACHE_SIZE = 1024
+API_TOKEN_CACHE_TTL = 60
+
+# per-view request metrics, see utils/metrics.py
+SERVER_TIMING = True
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+# scrapers send it as `Authorization: Bearer <token>`; once set, addresses
+# of METRICS_ALLOWED_IPS no longer suffice (a local proxy shares them)
+METRICS_TOKEN = os.environ.get('IHUB_METRICS_TOKEN') or None
+
+# share of requests traced (0 to 1) and size of their JSON lines file before
+# rotation, see bridge/tracing.py and `manage.py trace_report`. Set
+# TRACE_PATH to choose the file (a file of the user in the temp directory by
+# default, out of the source tree), None keeps no traces.
+TRACE_SAMPLE_RATE = 0
+TRACE_MAX_BYTES = 50 * 1024 * 1024
+
+# staff requests profiled on demand, see utils/profiling.py
+PROFILE_MAX_STORED = 50
+PROFILE_TOP_FUNCTIONS = 40
+
+DUTIES = {
+    'LAZY_EXPIRY': True,
+    'SWEEP_INTERVAL': 60,
+    'SWEEP_DEBOUNCE': 5,
+    'SWEEP_BATCH_SIZE': 500,
+    'SWEEP_AUTOSTART': True,
+    'CACHE_ACTIVE_DUTIES': True,
+    'ACTIVE_DUTIES_CACHE_TTL': 2,
+    'MANAGER_CACHE_TTL': 5,
+    'SCHEDULE_CACHE_TTL': 60,
+    # e.g. os.path.join(BASE_DIR, 'duties.snapshot') when running several workers
+    'SNAPSHOT_PATH': None,
+    'SNAPSHOT_CAPACITY': 256,
+    'ROSTER_MAX_SIZE': 500,
+    'EVENTS_POLL_INTERVAL': 5,
+    'EVENTS_HEARTBEAT': 15,
+    'EVENTS_QUEUE_SIZE': 100,
+    'EVENTS_BACKLOG': 256,
+    'DETAILS_POLL_INTERVAL': 15,
+    'ASGI_THREADS': 8,
+    'LONGPOLL_TIMEOUT': 30,
 }
 
 TEMPLATES = [
@@ -89,12 +147,55 @@ WSGI_APPLICATION = 'ihub.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Profile picked with the IHUB_DB_PROFILE environment variable:
+#   sqlite      rollback journal, connection per request (development)
+#   sqlite-wal  write-ahead log, so readers and the writer do not block each
+#               other, busy timeout and persistent connections; pragmas are
+#               run on each new connection, see utils/db.py
+#   postgresql  IHUB_DB_NAME, IHUB_DB_USER, IHUB_DB_PASSWORD, IHUB_DB_HOST,
+#               IHUB_DB_PORT, persistent connections (needs psycopg2)
+DB_PROFILE = os.environ.get('IHUB_DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('IHUB_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        }
     }
-}
+    SQLITE_PRAGMAS = []
+elif DB_PROFILE == 'sqlite-wal':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('IHUB_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': int(os.environ.get('IHUB_DB_CONN_MAX_AGE', 600)),
+            # seconds a writer waits for the lock before "database is locked"
+            'OPTIONS': {'timeout': 20},
+        }
+    }
+    SQLITE_PRAGMAS = [
+        ('journal_mode', 'wal'),
+        # WAL stays consistent without a sync per commit
+        ('synchronous', 'normal'),
+        ('mmap_size', 256 * 1024 * 1024),
+        ('temp_store', 'memory'),
+    ]
+elif DB_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('IHUB_DB_NAME', 'ihub'),
+            'USER': os.environ.get('IHUB_DB_USER', ''),
+            'PASSWORD': os.environ.get('IHUB_DB_PASSWORD', ''),
+            'HOST': os.environ.get('IHUB_DB_HOST', ''),
+            'PORT': os.environ.get('IHUB_DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('IHUB_DB_CONN_MAX_AGE', 600)),
+        }
+    }
+    SQLITE_PRAGMAS = []
+else:
+    raise ImproperlyConfigured("Unknown IHUB_DB_PROFILE '%s'." % DB_PROFILE)
 
 
 # Password validation
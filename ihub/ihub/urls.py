@@ -18,6 +18,7 @@ from django.contrib.auth.views import LogoutView
 from django.urls import path, include
 
 from users.views import redirect_login
+from utils.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,4 +28,6 @@ urlpatterns = [
     path('accounts/', include('users.urls')),
     # duties start and details
     path('duties/', include('duties.urls')),
+    # prometheus scrape
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ihub.settings')
 
 application = get_wsgi_application()
+
+from duties.conf import duty_settings
+
+if duty_settings.SNAPSHOT_PATH:
+    # start from current database state, the file may be left from an older run
+    from duties.snapshot import publish_snapshot
+    publish_snapshot()
+
+# serving processes detach finished duties in background (lazy expiry)
+from duties.sweeper import autostart
+autostart()
@@ -1,10 +1,14 @@
-// main function
+var dutyClockTimer = null;
+
+// main function, times are epoch milliseconds (duty API v2)
 function dutyClock(serverNow, duty_end){
-    var t = getDateTime(duty_end) - getDateTime(serverNow);
+    var t = duty_end - serverNow;
     var clientEnd = new Date().getTime() + t;
     var displayElem = $(".timer-display");
 
-    var x = setInterval(function(){
+    // restarted on every refresh of the duty
+    clearInterval(dutyClockTimer);
+    var x = dutyClockTimer = setInterval(function(){
         let clientNow = new Date().getTime();
         let _t = clientEnd - clientNow;
 
@@ -43,14 +47,3 @@ function durationToRepresentation(duration){
         seconds: seconds
     }
 };
-
-function getDateTime(datetime){
-    const [date, time] = datetime.split(" ")
-    const [mon, day, year] = date.split("/").map(e=>parseInt(e, 10));
-    const [hour, min, sec] = time.split(":").map(e=>parseInt(e, 10));;
-    var result = new Date(
-        year, mon-1, day,
-        hour, min, sec
-    );
-    return result
-};
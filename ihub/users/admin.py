@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import User
+from .models import ApiToken, User
 
 
 class UserAdmin(BaseUserAdmin):
@@ -32,4 +32,20 @@ class UserAdmin(BaseUserAdmin):
     filter_horizontal = ('groups', 'user_permissions',)
 
 
+class ApiTokenAdmin(admin.ModelAdmin):
+    """Tokens are issued with `manage.py issue_api_token`, the admin lists
+    and revokes them.
+    """
+    list_display = ('prefix', 'name', 'user', 'is_active', 'created', 'last_used')
+    list_filter = ('is_active', )
+    search_fields = ('name', 'prefix', 'user__email', 'user__matric')
+    readonly_fields = ('user', 'prefix', 'created', 'last_used')
+    fields = ('name', 'user', 'prefix', 'is_active', 'created', 'last_used')
+    list_select_related = ('user', )
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(User, UserAdmin)
+admin.site.register(ApiToken, ApiTokenAdmin)
@@ -0,0 +1,126 @@
+"""
+Module authentication.py
+
+Token authentication of API clients: `Authorization: Token <key>`.
+
+Resolved tokens are kept in a per-process LRU (API_TOKEN_CACHE_SIZE
+entries) mapping the key digest to the user row, so a known client costs
+one hash and no query. Entries expire after API_TOKEN_CACHE_TTL seconds,
+which bounds how long another process keeps serving a revoked token or a
+deactivated user; local changes drop entries at once (see users/signals.py).
+
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from rest_framework import authentication, exceptions
+
+from users.models import ApiToken
+
+User = get_user_model()
+
+KEYWORD = 'Token'
+
+
+class TokenCache(object):
+    """LRU of {key digest: (expiry, token id, user id, user db alias, user field values)}.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+        return User.from_db(entry[3], [field.attname for field in User._meta.concrete_fields], entry[4])
+
+    def put(self, digest, token):
+        user = token.user
+        values = [getattr(user, field.attname) for field in User._meta.concrete_fields]
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + self.ttl, token.pk, user.pk, user._state.db, values)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest=None, user_id=None):
+        """Drop the entry of a digest, or every entry of a user.
+        """
+        with self._lock:
+            if digest is not None:
+                self._entries.pop(digest, None)
+            if user_id is not None:
+                for key in [key for key, entry in self._entries.items() if entry[2] == user_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    getattr(settings, 'API_TOKEN_CACHE_SIZE', 1024),
+    getattr(settings, 'API_TOKEN_CACHE_TTL', 60),
+)
+
+
+def get_token_user(key):
+    """Active user of a raw token key, None if the token is unknown, revoked
+    or its user inactive.
+    """
+    digest = ApiToken.hash_key(key)
+    user = token_cache.get(digest)
+    if user is not None:
+        return user
+
+    token = ApiToken.objects.get_for_key(key)
+    if token is None or not token.user.is_active:
+        return None
+    # written once per cache fill, not per request
+    ApiToken.objects.filter(pk=token.pk).update(last_used=timezone.now())
+    token_cache.put(digest, token)
+    return token.user
+
+
+def get_authorization_key(header):
+    """Raw key of an `Authorization` header value, None for other schemes.
+    """
+    parts = (header or '').split()
+    if len(parts) != 2 or parts[0] != KEYWORD:
+        return None
+    return parts[1]
+
+
+class ApiTokenAuthentication(authentication.BaseAuthentication):
+    """DRF authentication of `Authorization: Token <key>` requests.
+    """
+    def authenticate(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION')
+        if not header or not header.startswith(KEYWORD + ' '):
+            return None
+        key = get_authorization_key(header)
+        if key is None:
+            raise exceptions.AuthenticationFailed("Invalid token header")
+        user = get_token_user(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed("Invalid or revoked token")
+        return (user, key)
+
+    def authenticate_header(self, request):
+        return KEYWORD
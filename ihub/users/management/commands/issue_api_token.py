@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import ApiToken
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Issue an API token acting as the user with given matric or email. "
+        "The key is printed once, only its digest is stored.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help="Matric or email of the user")
+        parser.add_argument('--name', required=True,
+            help="Label of the client, e.g. 'Kiosk 3'")
+
+    def handle(self, *args, **options):
+        lookup = {'email': options['user']} if '@' in options['user'] else {'matric': options['user']}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError("No user matches '%s'" % options['user'])
+
+        token, key = ApiToken.objects.issue(user, options['name'])
+        self.stderr.write("Issued %s, send it as 'Authorization: Token <key>':" % token)
+        self.stdout.write(key)
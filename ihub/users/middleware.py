@@ -0,0 +1,60 @@
+"""
+Module middleware.py
+
+Drop-in replacements of the session, authentication and messages
+middlewares, doing nothing for token authenticated API requests: those are
+authenticated by ApiTokenAuthentication and never use sessions or
+messages. Every other request goes through the stock middleware.
+
+API routes are the paths under API_TOKEN_PATH_PREFIX.
+
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+
+from users.authentication import KEYWORD
+
+
+def is_token_api_request(request):
+    """Request to an API route carrying a token, checked once per request.
+    """
+    if not hasattr(request, '_token_api_request'):
+        request._token_api_request = (
+            request.path_info.startswith(getattr(settings, 'API_TOKEN_PATH_PREFIX', '/duties/api/'))
+            and request.META.get('HTTP_AUTHORIZATION', '').startswith(KEYWORD + ' ')
+        )
+    return request._token_api_request
+
+
+class LeanSessionMiddleware(SessionMiddleware):
+    def process_request(self, request):
+        if not is_token_api_request(request):
+            super(LeanSessionMiddleware, self).process_request(request)
+
+    def process_response(self, request, response):
+        if is_token_api_request(request):
+            return response
+        return super(LeanSessionMiddleware, self).process_response(request, response)
+
+
+class LeanAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        if is_token_api_request(request):
+            # set by the view from the token
+            request.user = AnonymousUser()
+            return
+        super(LeanAuthenticationMiddleware, self).process_request(request)
+
+
+class LeanMessageMiddleware(MessageMiddleware):
+    def process_request(self, request):
+        if not is_token_api_request(request):
+            super(LeanMessageMiddleware, self).process_request(request)
+
+    def process_response(self, request, response):
+        if is_token_api_request(request):
+            return response
+        return super(LeanMessageMiddleware, self).process_response(request, response)
@@ -1,3 +1,6 @@
+import hashlib
+import secrets
+
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import (
@@ -75,6 +78,10 @@ class User(AbstractBaseUser, PermissionsMixin):
 			return (self.email == other.email) and (self.matric == other.matric)
 		return False
 
+	def __hash__(self):
+		# defining __eq__ drops the inherited hash, deletion needs it
+		return super(User, self).__hash__()
+
 	########################################
 	# Display Purposes
 	########################################
@@ -84,3 +91,57 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 	def __str__(self):
 		return "User of %s" % (self.email)
+
+
+class ApiTokenManager(models.Manager):
+	"""Manager class issuing and resolving API tokens
+	"""
+	def issue(self, user, name):
+		"""Create a token for user, the raw key is only known to the caller.
+
+		Returns:
+			tuple: (ApiToken, raw key)
+		"""
+		key = secrets.token_urlsafe(32)
+		token = self.create(user=user, name=name, prefix=key[:8], digest=ApiToken.hash_key(key))
+		return token, key
+
+	def get_for_key(self, key):
+		"""Active token of raw key with its user, None if unknown or revoked.
+		"""
+		return (self.select_related('user')
+			.filter(digest=ApiToken.hash_key(key), is_active=True)
+			.first())
+
+
+class ApiToken(models.Model):
+	"""API Token Model
+
+	.. Credential of an API client (e.g. a kiosk), acting as its user. Only
+	.. the SHA-256 digest of the key is stored: keys are random, a slow hash
+	.. would not make them harder to guess.
+	"""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+	name = models.CharField(max_length=64)
+	prefix = models.CharField(max_length=8, editable=False)
+	digest = models.CharField(max_length=64, unique=True, editable=False)
+	is_active = models.BooleanField(default=True)
+	created = models.DateTimeField(auto_now_add=True)
+	last_used = models.DateTimeField(null=True, blank=True, editable=False)
+
+	objects = ApiTokenManager()
+
+	########################################
+	# Interface Methods
+	########################################
+
+	@staticmethod
+	def hash_key(key):
+		return hashlib.sha256(key.encode()).hexdigest()
+
+	########################################
+	# Display Purposes
+	########################################
+
+	def __str__(self):
+		return "Token %s... (%s) of %s" % (self.prefix, self.name, self.user.email)
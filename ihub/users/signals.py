@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import token_cache
+from users.models import ApiToken
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=ApiToken)
+@receiver(post_delete, sender=ApiToken)
+def discard_cached_token(sender, instance, **kwargs):
+    # e.g. revoked token, other processes drop it after API_TOKEN_CACHE_TTL
+    token_cache.discard(digest=instance.digest)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def discard_cached_user(sender, instance, **kwargs):
+    # e.g. deactivated user, cached rows would keep it logged in
+    token_cache.discard(user_id=instance.pk)
@@ -1,3 +1,82 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from duties.models import DutyManager
+from duties.tests.base_class import BaseTestCaseMixin
+from users.authentication import token_cache
+from users.models import ApiToken
+
+
+class ApiTokenTests(TestCase, BaseTestCaseMixin):
+    """Tests token authentication of the duty API and its cached lookup.
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = self.generate_ihub_user()
+        self.token, self.key = ApiToken.objects.issue(self.user, "Kiosk 1")
+        DutyManager.load().start_duty(self.user)
+
+    def get_details(self, key):
+        return self.client.get(reverse('duties:duty-details'), HTTP_AUTHORIZATION='Token %s' % key)
+
+    def test_token_authenticates_from_cache(self):
+        """Test only the digest is stored, and after the first request the
+        token is resolved without query nor session.
+        """
+        self.assertNotIn(self.key, self.token.digest)
+        self.assertEqual(self.token.prefix, self.key[:8])
+
+        # Step 1: first request reads the token and stamps its use
+        response1 = self.get_details(self.key)
+        self.assertEqual(response1.status_code, 200)
+        self.token.refresh_from_db()
+        self.assertIsNotNone(self.token.last_used)
+
+        # Step 2: next requests are served from the LRU, without session
+        with self.assertNumQueries(1): # desk row
+            response2 = self.get_details(self.key)
+        self.assertEqual(response2.status_code, 200)
+        self.assertFalse(hasattr(response2.wsgi_request, 'session'))
+        self.assertFalse(hasattr(response2.wsgi_request, '_messages'))
+
+    def test_token_revocation(self):
+        """Test unknown and revoked tokens are refused, and revoking or
+        deactivating the user drops cached tokens at once.
+        """
+        self.assertEqual(self.get_details('nope').status_code, 403)
+
+        # Step 1: revoked token
+        self.assertEqual(self.get_details(self.key).status_code, 200)
+        self.token.is_active = False
+        self.token.save()
+        self.assertEqual(self.get_details(self.key).status_code, 403)
+
+        # Step 2: deactivated user
+        token, key = ApiToken.objects.issue(self.user, "Kiosk 2")
+        self.assertEqual(self.get_details(key).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_details(key).status_code, 403)
+
+    def test_session_requests_unchanged(self):
+        """Test session clients still get sessions and messages on the API.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('duties:duty-details'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertTrue(hasattr(response.wsgi_request, '_messages'))
 
-# Create your tests here.
+    def test_issue_api_token_command(self):
+        """Test the command prints a working key for a user given by matric.
+        """
+        stdout = StringIO()
+        call_command('issue_api_token', self.user.matric, name="Kiosk 3", stdout=stdout, stderr=StringIO())
+        key = stdout.getvalue().strip()
+        self.assertEqual(ApiToken.objects.get(digest=ApiToken.hash_key(key)).name, "Kiosk 3")
+        self.assertEqual(self.get_details(key).status_code, 200)
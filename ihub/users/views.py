@@ -4,6 +4,7 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
 
+from duties.models import UserDutyStats
 from users.forms import SignUpForm
 
 
@@ -44,6 +45,12 @@ class HomeView(LoginRequiredMixin, DetailView):
     def get_object(self, queryset=None):
         return self.request.user
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # single primary key lookup, stats are maintained as duties start
+        context['duty_stats'] = UserDutyStats.objects.for_user(self.object)
+        return context
+
 
 ########################################
 # Sign up
@@ -1,2 +1,4 @@
+default_app_config = 'utils.apps.UtilsConfig'
+
 # import support modules and tools here
 from .random_supports import RandomSupport
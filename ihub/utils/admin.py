@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib import admin
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Profiles are taken by staff requests with `?_profile=1`, see
+    utils/profiling.py, the admin only shows them.
+    """
+    list_display = ('request_id', 'created', 'method', 'path', 'status', 'duration_ms', 'user')
+    list_filter = ('method', 'status')
+    search_fields = ('request_id', 'path')
+    fields = ('request_id', 'created', 'user', 'method', 'path', 'status', 'duration_ms', 'top_functions')
+    readonly_fields = fields
+    list_select_related = ('user', )
+
+    def top_functions(self, obj):
+        return format_html('<pre>{}</pre>', obj.top_functions(getattr(settings, 'PROFILE_TOP_FUNCTIONS', 40)))
+    top_functions.short_description = "Top functions by cumulative time"
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class UtilsConfig(AppConfig):
+    name = 'utils'
+    verbose_name = "Utilities"
+
+    def ready(self):
+        # connect signal receivers
+        import utils.db
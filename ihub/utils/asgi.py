@@ -0,0 +1,228 @@
+"""
+Module asgi.py
+
+Small ASGI (3.0) building blocks for a Django version without ASGI support:
+an adapter running a WSGI application on a bounded thread pool, and a
+minimal asyncio HTTP/1.1 server to host ASGI applications locally (one
+request per connection, streamed responses are chunked).
+
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+STATUS_REASONS = {
+    200: 'OK', 201: 'Created', 204: 'No Content', 301: 'Moved Permanently',
+    302: 'Found', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized',
+    403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+    406: 'Not Acceptable', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+def build_environ(scope, body):
+    """WSGI environ of an ASGI http scope.
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        # tells views they are served through ASGI
+        'asgi.version': scope.get('asgi', {}).get('version', '3.0'),
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        # repeated headers are folded, as WSGI servers do
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    body = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(body)
+
+
+async def send_response(send, status, body, content_type=b'application/json', headers=()):
+    """Send a complete, non-streamed response.
+    """
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', content_type),
+            (b'content-length', str(len(body)).encode())] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class WsgiPool(object):
+    """Run a WSGI application from ASGI on at most `max_workers` threads.
+
+    Each request holds one thread for the whole response, including the
+    iteration of streamed bodies. Requests past the pool size wait in line
+    without holding a thread.
+    """
+    def __init__(self, wsgi_application, max_workers):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+
+    def run(self, func, *args):
+        """Run a blocking callable on the pool.
+        """
+        return asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+
+    async def __call__(self, scope, receive, send):
+        body = await read_body(receive)
+        environ = build_environ(scope, body)
+        loop = asyncio.get_event_loop()
+        await self.run(self.respond, environ, send, loop)
+
+    def respond(self, environ, send, loop):
+        # runs on a pool thread, messages are handed to the loop one by one
+        # and awaited so a slow client slows its own thread only
+        def dispatch(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+            return lambda data: None
+
+        response = {}
+        result = self.wsgi_application(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if not started:
+                    dispatch({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+                    started = True
+                if chunk:
+                    dispatch({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                dispatch({'type': 'http.response.start', 'status': response['status'],
+                    'headers': response['headers']})
+            dispatch({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+########################################
+# Minimal server
+########################################
+
+async def serve_connection(application, reader, writer):
+    """Serve one HTTP/1.1 request of a connection with an ASGI application.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        writer.close()
+        return
+    method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+    length = int(dict(headers).get(b'content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+
+    path, _, query = target.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': version.split('/')[1],
+        'method': method, 'scheme': 'http', 'path': unquote(path),
+        'raw_path': path.encode('latin-1'), 'query_string': query.encode('latin-1'),
+        'root_path': '', 'headers': headers,
+        'client': writer.get_extra_info('peername')[:2],
+        'server': writer.get_extra_info('sockname')[:2],
+    }
+
+    body_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # the client sends nothing more, EOF means it went away
+        await reader.read()
+        disconnected.set()
+        return {'type': 'http.disconnect'}
+
+    chunked = False
+
+    async def send(message):
+        nonlocal chunked
+        if disconnected.is_set():
+            raise ConnectionResetError("Client disconnected")
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            lines = ['HTTP/1.1 %d %s' % (status, STATUS_REASONS.get(status, 'Unknown'))]
+            names = set()
+            for name, value in message.get('headers', []):
+                names.add(name.lower())
+                lines.append('%s: %s' % (name.decode('latin-1'), value.decode('latin-1')))
+            if b'content-length' not in names:
+                chunked = True
+                lines.append('Transfer-Encoding: chunked')
+            lines.append('Connection: close')
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        elif message['type'] == 'http.response.body':
+            data = message.get('body', b'')
+            if chunked and data:
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            elif data:
+                writer.write(data)
+            if chunked and not message.get('more_body'):
+                writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    try:
+        await application(scope, receive, send)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(application, host='127.0.0.1', port=8000):
+    """Start serving `application`, returns the asyncio server.
+    """
+    return await asyncio.start_server(
+        lambda reader, writer: serve_connection(application, reader, writer),
+        host, port, backlog=2048,
+    )
@@ -0,0 +1,22 @@
+"""
+Module db.py
+
+Setup of new database connections: SQLite connections run the pragmas of
+the SQLITE_PRAGMAS setting, a list of (name, value), see the database
+profiles in ihub/settings.py. `journal_mode` is kept in the database file,
+other pragmas last as long as the connection, which CONN_MAX_AGE keeps
+open across requests.
+
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', ()):
+        # on the DB-API connection: setup is not counted as SQL of a request
+        connection.connection.execute('PRAGMA %s = %s' % (name, value))
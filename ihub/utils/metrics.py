@@ -0,0 +1,238 @@
+"""
+Module metrics.py
+
+Per-view request metrics: latency histogram, SQL statement count and SQL
+time, recorded by MetricsMiddleware and scraped from `/metrics` in the
+Prometheus text format. Responses also carry them in a `Server-Timing`
+header (SERVER_TIMING setting), readable in browser dev tools.
+
+Counters are sharded per thread: a request only writes the shard of its own
+thread, without lock, and a scrape adds shards up. A scrape may see a
+request half recorded, never a lost one. The shard of a finished thread is
+added to a retired total, so servers spawning threads do not pile shards
+up. Counters are per process, each worker is scraped on its own.
+
+`/metrics` answers requests bearing METRICS_TOKEN, or staff users. Without
+a token, it also answers METRICS_ALLOWED_IPS: behind a reverse proxy on the
+same host every request comes from its address, set a token there.
+
+"""
+import bisect
+import hmac
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse
+
+from bridge.tracing import span
+
+# upper bounds (seconds) of the latency buckets, +Inf is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNRESOLVED = '<unresolved>'
+
+
+class RequestMetrics(object):
+    """Thread sharded request counters.
+
+    A shard maps a view name to the row [bucket counts (+Inf last), seconds,
+    SQL statements, SQL seconds], and (view, method, status) to a count.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.clear()
+
+    def clear(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {} # shards of finished threads added up
+
+    def _shard(self):
+        try:
+            return self._local.holder.shard
+        except AttributeError:
+            holder = self._local.holder = _ShardHolder()
+            # once per thread, the holder goes with the thread locals
+            with self._lock:
+                self._shards.append(holder.shard)
+            weakref.finalize(holder, self._retire, holder.shard)
+            return holder.shard
+
+    def _retire(self, shard):
+        with self._lock:
+            for i, live in enumerate(self._shards):
+                if live is shard:
+                    del self._shards[i]
+                    add_shard(self._retired, shard)
+                    break
+
+    def observe(self, view, method, status, seconds, queries, sql_seconds):
+        shard = self._shard()
+        row = shard.get(view)
+        if row is None:
+            row = shard[view] = [0] * (len(self.buckets) + 1) + [0.0, 0, 0.0]
+        row[bisect.bisect_left(self.buckets, seconds)] += 1
+        row[-3] += seconds
+        row[-2] += queries
+        row[-1] += sql_seconds
+        key = (view, method, status)
+        shard[key] = shard.get(key, 0) + 1
+
+    def collect(self):
+        """Shards added up.
+
+        Returns:
+            tuple: ({view: row}, {(view, method, status): count})
+        """
+        with self._lock:
+            shards = list(self._shards)
+            total = {}
+            add_shard(total, self._retired)
+        for shard in shards:
+            # copying a dict is atomic, its owner may be writing
+            add_shard(total, dict(shard))
+        views, requests = {}, {}
+        for key, value in total.items():
+            if isinstance(key, tuple):
+                requests[key] = value
+            else:
+                views[key] = value
+        return views, requests
+
+    def render(self):
+        """Counters in the Prometheus text exposition format (0.0.4).
+        """
+        views, requests = self.collect()
+        lines = [
+            '# HELP ihub_request_duration_seconds Request latency by view.',
+            '# TYPE ihub_request_duration_seconds histogram',
+        ]
+        for view, row in sorted(views.items()):
+            label = 'view="%s"' % escape_label(view)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf', ), row):
+                cumulative += count
+                lines.append('ihub_request_duration_seconds_bucket{%s,le="%s"} %d' % (label, bound, cumulative))
+            lines.append('ihub_request_duration_seconds_sum{%s} %r' % (label, row[-3]))
+            lines.append('ihub_request_duration_seconds_count{%s} %d' % (label, cumulative))
+        lines += [
+            '# HELP ihub_request_sql_queries_total SQL statements issued by requests, by view.',
+            '# TYPE ihub_request_sql_queries_total counter',
+        ]
+        for view, row in sorted(views.items()):
+            lines.append('ihub_request_sql_queries_total{view="%s"} %d' % (escape_label(view), row[-2]))
+        lines += [
+            '# HELP ihub_request_sql_seconds_total Time spent in SQL statements by requests, by view.',
+            '# TYPE ihub_request_sql_seconds_total counter',
+        ]
+        for view, row in sorted(views.items()):
+            lines.append('ihub_request_sql_seconds_total{view="%s"} %r' % (escape_label(view), row[-1]))
+        lines += [
+            '# HELP ihub_requests_total Requests by view, method and status.',
+            '# TYPE ihub_requests_total counter',
+        ]
+        for (view, method, status), count in sorted(requests.items()):
+            lines.append('ihub_requests_total{view="%s",method="%s",status="%d"} %d' % (
+                escape_label(view), escape_label(method), status, count))
+        return '\n'.join(lines) + '\n'
+
+
+class _ShardHolder(object):
+    # dicts cannot be weakly referenced
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self):
+        self.shard = {}
+
+
+def add_shard(total, shard):
+    """Add the counters of shard to total, a shard too.
+    """
+    for key, value in shard.items():
+        if isinstance(key, tuple):
+            total[key] = total.get(key, 0) + value
+        elif key in total:
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] = list(value)
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_metrics = RequestMetrics()
+
+
+class SQLTimer(object):
+    """Execute wrapper counting statements and their time.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware(object):
+    """Record latency and SQL of every request under its view name. Goes
+    first in MIDDLEWARE, so time spent in other middlewares is counted.
+
+    Requests are also the root spans of traces, see bridge/tracing.py.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING', True)
+
+    def __call__(self, request):
+        timer = SQLTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer), span(UNRESOLVED) as request_span:
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match is not None else UNRESOLVED
+            if request_span.node is not None:
+                # only known once resolved
+                request_span.node['name'] = view
+        seconds = time.perf_counter() - start
+
+        request_metrics.observe(view, request.method, response.status_code, seconds,
+            timer.queries, timer.seconds)
+        if self.server_timing:
+            response['Server-Timing'] = 'app;dur=%.2f, sql;dur=%.2f;desc="%d queries"' % (
+                seconds * 1000, timer.seconds * 1000, timer.queries)
+        return response
+
+
+def may_scrape(request):
+    """Whether request may read the metrics, see module docstring.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        given = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(given.encode(), ('Bearer %s' % token).encode()):
+            return True
+    else:
+        allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+        if request.META.get('REMOTE_ADDR') in allowed:
+            return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_active and user.is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, hidden from unauthorized clients.
+    """
+    if not may_scrape(request):
+        raise Http404
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,85 @@
+import io
+import marshal
+import pstats
+
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfileManager(models.Manager):
+	"""Manager class storing request profiles, at most PROFILE_MAX_STORED
+	"""
+	def store(self, request_id, user, request, status, duration_ms, stats):
+		"""Save the profile of a request, dropping the oldest ones past the cap.
+
+		Args:
+			stats (dict): `stats` of a cProfile.Profile, after create_stats()
+
+		Returns:
+			RequestProfile: the saved profile
+		"""
+		profile = self.create(
+			request_id=request_id, user=user, method=request.method,
+			path=request.get_full_path()[:255], status=status,
+			duration_ms=duration_ms, stats=marshal.dumps(stats),
+		)
+		cap = getattr(settings, 'PROFILE_MAX_STORED', 50)
+		stale = list(self.order_by('-created', '-pk').values_list('pk', flat=True)[cap:])
+		if stale:
+			self.filter(pk__in=stale).delete()
+		return profile
+
+
+class _LoadedStats(object):
+	# stats source accepted by pstats.Stats
+	def __init__(self, stats):
+		self.stats = stats
+
+	def create_stats(self):
+		pass
+
+
+class RequestProfile(models.Model):
+	"""Request Profile Model
+
+	.. cProfile statistics of one request, asked for by a staff user (see
+	.. utils/profiling.py). Kept as the marshalled stats dictionary, the
+	.. format of `pstats.Stats.dump_stats`.
+	"""
+	request_id = models.CharField(max_length=32, unique=True)
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+		blank=True, null=True, related_name='+')
+	method = models.CharField(max_length=10)
+	path = models.CharField(max_length=255)
+	status = models.PositiveSmallIntegerField()
+	duration_ms = models.FloatField()
+	created = models.DateTimeField(auto_now_add=True, db_index=True)
+	stats = models.BinaryField()
+
+	objects = RequestProfileManager()
+
+	class Meta:
+		ordering = ('-created', )
+
+	########################################
+	# Interface Methods
+	########################################
+
+	def get_stats(self):
+		return pstats.Stats(_LoadedStats(marshal.loads(bytes(self.stats))))
+
+	def top_functions(self, limit):
+		"""Report of the `limit` functions of highest cumulative time.
+		"""
+		stream = io.StringIO()
+		stats = self.get_stats()
+		stats.stream = stream
+		stats.sort_stats('cumulative').print_stats(limit)
+		return stream.getvalue()
+
+	########################################
+	# Display Purposes
+	########################################
+
+	def __str__(self):
+		return "%s %s (%s)" % (self.method, self.path, self.request_id)
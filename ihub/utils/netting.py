@@ -0,0 +1,58 @@
+import heapq
+
+
+def net_positions(balances):
+	"""Collapse pairwise debts into one net position per party.
+
+	Args:
+		balances (iterable): (debtor, creditor, amount) triples
+
+	Returns:
+		dict: party -> net amount, positive when owed, negative when owing
+	"""
+	positions = {}
+	for debtor, creditor, amount in balances:
+		positions[debtor] = positions.get(debtor, 0) - amount
+		positions[creditor] = positions.get(creditor, 0) + amount
+	return positions
+
+
+def settle(positions):
+	"""Compute transfers that clear every net position.
+
+	Greedy matching of the largest debtor with the largest creditor, with
+	two heaps: O(n log n) and at most n - 1 transfers for n parties with a
+	non-zero position. (An exact minimum is NP-hard, greedy is optimal
+	whenever no subgroup of parties nets to zero on its own.)
+
+	Args:
+		positions (dict): party -> net amount, positive when owed, negative
+			when owing; amounts must sum to zero
+
+	Returns:
+		list: (debtor, creditor, amount) transfers
+
+	Raises:
+		ValueError: when positions do not sum to zero
+	"""
+	if sum(positions.values()) != 0:
+		raise ValueError("Net positions must sum to zero")
+
+	# max-heaps on amount, party breaks ties so orderings are deterministic
+	creditors = [(-amount, party) for party, amount in positions.items() if amount > 0]
+	debtors = [(amount, party) for party, amount in positions.items() if amount < 0]
+	heapq.heapify(creditors)
+	heapq.heapify(debtors)
+
+	transfers = []
+	while creditors:
+		credit, creditor = heapq.heappop(creditors)
+		debt, debtor = heapq.heappop(debtors)
+		amount = min(-credit, -debt)
+		transfers.append((debtor, creditor, amount))
+		# push back whichever side is not cleared yet
+		if -credit > amount:
+			heapq.heappush(creditors, (credit + amount, creditor))
+		elif -debt > amount:
+			heapq.heappush(debtors, (debt + amount, debtor))
+	return transfers
@@ -0,0 +1,77 @@
+"""
+Module profiling.py
+
+Profile one request on demand: a staff user adds `?_profile=1` to the URL,
+or sends `X-Profile: 1`, and the rest of the middleware stack and the view
+run under cProfile. The profile is stored as a RequestProfile, its id sent
+back in the `X-Profile-Id` header, and the admin shows its top functions by
+cumulative time. Only the last PROFILE_MAX_STORED profiles are kept.
+
+Other requests, and requests of non staff users asking for a profile, go
+through untouched.
+
+"""
+import cProfile
+import time
+import uuid
+
+from django.urls import reverse
+
+from users.authentication import get_authorization_key, get_token_user
+from users.middleware import is_token_api_request
+from utils.models import RequestProfile
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def wants_profile(request):
+    return request.GET.get(PROFILE_PARAM) == '1' or request.META.get(PROFILE_HEADER) == '1'
+
+
+def get_profile_user(request):
+    """Staff user asking for the profile, None otherwise.
+    """
+    if is_token_api_request(request):
+        # authenticated by the view, the token cache makes this cheap
+        key = get_authorization_key(request.META['HTTP_AUTHORIZATION'])
+        user = get_token_user(key) if key else None
+    else:
+        user = getattr(request, 'user', None)
+    if user is None or not user.is_active or not user.is_staff:
+        return None
+    return user
+
+
+class ProfilingMiddleware(object):
+    """Goes right after the authentication middleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
+        user = get_profile_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active in this thread
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        profiler.create_stats()
+        profile = RequestProfile.objects.store(uuid.uuid4().hex, user, request,
+            response.status_code, duration_ms, profiler.stats)
+        response['X-Profile-Id'] = profile.request_id
+        response['X-Profile-Url'] = reverse('admin:utils_requestprofile_change', args=[profile.pk])
+        return response
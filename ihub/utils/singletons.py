@@ -1,27 +1,155 @@
-from django.db import models
+"""
+Module singletons.py
 
-class Singleton(object):
-    instance = None
+Single row models, read from a per-process cache.
+
+Each process keeps the field values of the row it last read, stamped with
+the version of the model at read time. Versions are counters in a small
+memory-mapped file (SINGLETON_VERSIONS_PATH) shared by the processes of a
+host: saving a singleton bumps its counter once committed, and any process
+reading another counter than its stamp reloads the row. A load hence costs
+one 8 bytes read while the row is unchanged.
+
+By default the file is in the temp directory, named after the user and the
+default database, so checkouts of other users or on other databases do not
+share it. Set SINGLETON_VERSIONS_PATH to None to disable caching (every load
+reads the database), e.g. when workers run on several hosts.
+
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+from django.conf import settings
+from django.db import models, transaction
+
+try:
+	import fcntl
+except ImportError: # pragma: no cover, non POSIX hosts only serialize within process
+	fcntl = None
+
+SLOTS = 512
+COUNTER = struct.Struct('<Q')
+
+_stamps = {}
+_stamps_lock = threading.Lock()
+
+
+class VersionStamps(object):
+	"""Counters shared by every process mapping the same file.
+
+	Keys are hashed to one of `slots` counters, keys sharing a counter only
+	cause extra reloads.
+	"""
+	def __init__(self, path, slots=SLOTS):
+		self.path = path
+		self.slots = slots
+		self._lock = threading.Lock()
+		fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			size = slots * COUNTER.size
+			if os.fstat(fd).st_size < size:
+				os.ftruncate(fd, size)
+			self._map = mmap.mmap(fd, size)
+		finally:
+			os.close(fd)
+
+	def offset(self, key):
+		return zlib.crc32(key.encode()) % self.slots * COUNTER.size
+
+	def get(self, key):
+		return COUNTER.unpack_from(self._map, self.offset(key))[0]
+
+	def bump(self, key):
+		"""Increment the counter of key, for every process.
+		"""
+		offset = self.offset(key)
+		with self._lock:
+			# increments of other processes are serialized by the file lock
+			with open(self.path, 'rb') as lock_file:
+				if fcntl is not None:
+					fcntl.flock(lock_file, fcntl.LOCK_EX)
+				version = COUNTER.unpack_from(self._map, offset)[0] + 1
+				COUNTER.pack_into(self._map, offset, version)
+		return version
+
+
+def default_versions_path():
+	"""Versions file of this user and default database, in the temp directory.
+	"""
+	database = settings.DATABASES['default']
+	key = '%s:%s:%s' % (database['ENGINE'], database.get('HOST', ''), database['NAME'])
+	uid = os.getuid() if hasattr(os, 'getuid') else 0
+	return os.path.join(tempfile.gettempdir(),
+		'ihub-singleton-versions-%d-%08x' % (uid, zlib.crc32(key.encode())))
+
+
+def get_version_stamps():
+	"""Version stamps of the configured path, None when caching is disabled.
+	"""
+	if hasattr(settings, 'SINGLETON_VERSIONS_PATH'):
+		path = settings.SINGLETON_VERSIONS_PATH
+	else:
+		path = default_versions_path()
+	if path is None:
+		return None
+	with _stamps_lock:
+		if path not in _stamps:
+			_stamps[path] = VersionStamps(path)
+		return _stamps[path]
 
-    def __new__(cls, *args, **kwargs):
-        if cls.instance:
-            return cls.instance
-        else:
-            cls.instance = object.__new__(cls, *args, **kwargs)
-            return cls.instance
 
 class SingletonModel(models.Model):
+	"""Model of a single row (pk 1), see module docstring for caching.
+	"""
+	# {model: (version, db alias, field values)}, shared by all subclasses
+	_singletons = {}
+	_singletons_lock = threading.Lock()
+
 	class Meta:
 		abstract = True
 
 	def save(self, *args, **kwargs):
 		self.pk = 1
 		super(SingletonModel, self).save(*args, **kwargs)
+		type(self).clear_cache()
+		stamps = get_version_stamps()
+		if stamps is not None:
+			transaction.on_commit(lambda: stamps.bump(self._meta.label), using=kwargs.get('using'))
 
 	def delete(self, *args, **kwargs):
 		pass
 
 	@classmethod
 	def load(cls):
+		"""The row, from the process cache while its version is unchanged.
+
+		Every call gets its own instance. Rows read inside a transaction are
+		not cached, they may still be rolled back.
+		"""
+		stamps = get_version_stamps()
+		if stamps is None:
+			obj, created = cls.objects.get_or_create(pk=1)
+			return obj
+
+		# read the version first, a save racing the query leaves a stale stamp
+		version = stamps.get(cls._meta.label)
+		with cls._singletons_lock:
+			cached = cls._singletons.get(cls)
+		if cached is not None and cached[0] == version:
+			return cls.from_db(cached[1], [field.attname for field in cls._meta.concrete_fields], cached[2])
+
 		obj, created = cls.objects.get_or_create(pk=1)
+		if not transaction.get_connection(obj._state.db).in_atomic_block:
+			values = [getattr(obj, field.attname) for field in cls._meta.concrete_fields]
+			with cls._singletons_lock:
+				cls._singletons[cls] = (version, obj._state.db, values)
 		return obj
+
+	@classmethod
+	def clear_cache(cls):
+		with cls._singletons_lock:
+			cls._singletons.pop(cls, None)
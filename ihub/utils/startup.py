@@ -0,0 +1,128 @@
+"""
+Module startup.py
+
+Profile of a worker boot: time spent importing each module, and SQL
+statements issued, while settings load, `django.setup()` runs, the WSGI
+handler loads middleware and the URLconf is imported.
+
+Modules already imported are not imported again, so profiles are taken in
+a fresh interpreter: `python -m utils.startup` prints the profile as JSON
+(DJANGO_SETTINGS_MODULE must be set).
+
+"""
+import importlib.abc
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+from importlib import import_module
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Loader delegating to `loader`, timing module execution.
+    """
+    def __init__(self, loader, timer):
+        self.loader = loader
+        self.timer = timer
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.leave(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path hook recording, per imported module, the time spent
+    executing it with (cumulative) and without (self) nested imports.
+    """
+    def __init__(self):
+        self.phase = None
+        self.modules = []
+        self._stack = []
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def enter(self):
+        # [start, time spent in nested imports]
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def leave(self, name):
+        start, nested = self._stack.pop()
+        cumulative = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += cumulative
+        self.modules.append({
+            'name': name, 'phase': self.phase,
+            'cumulative': cumulative, 'self': cumulative - nested,
+        })
+
+
+def profile():
+    """Boot Django in this process, it must not have been set up yet.
+
+    Returns:
+        dict: `phases` (name, seconds, queries) and `modules` (name, phase,
+            cumulative and self seconds) in import completion order
+    """
+    timer = ImportTimer()
+    phases, queries = [], []
+
+    def record(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def run(name, func):
+        timer.phase = name
+        first = len(queries)
+        start = time.perf_counter()
+        func()
+        phases.append({'name': name, 'seconds': time.perf_counter() - start, 'queries': queries[first:]})
+
+    timer.install()
+    try:
+        run('settings', lambda: import_module('django.conf').settings.INSTALLED_APPS)
+        from django.conf import settings
+
+        # connections are opened lazily, wrapping them does not connect
+        from django.db import connections
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(record))
+            run('setup', lambda: import_module('django').setup())
+            run('wsgi', lambda: import_module('django.core.handlers.wsgi').WSGIHandler())
+            run('urls', lambda: import_module('django.urls').get_resolver().url_patterns)
+    finally:
+        timer.uninstall()
+    return {'phases': phases, 'modules': timer.modules}
+
+
+if __name__ == '__main__':
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        sys.exit("DJANGO_SETTINGS_MODULE is not set")
+    json.dump(profile(), sys.stdout)
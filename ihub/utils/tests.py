@@ -0,0 +1,302 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext, isolate_apps
+from django.urls import reverse
+
+from duties.models import DutyManager
+from duties.tests.base_class import BaseTestCaseMixin
+from users.authentication import token_cache
+from users.models import ApiToken
+from utils.metrics import RequestMetrics, request_metrics
+from utils.models import RequestProfile
+from utils.singletons import SingletonModel, VersionStamps, default_versions_path, get_version_stamps
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bump_in_other_process(path, key):
+	"""Bump a version from another Django process, like a second worker.
+	"""
+	script = ("import sys, django; django.setup(); from utils.singletons import VersionStamps; "
+		"VersionStamps(sys.argv[1]).bump(sys.argv[2])")
+	subprocess.run([sys.executable, '-c', script, path, key], cwd=BASE_DIR, check=True)
+
+
+class VersionStampsTests(TestCase):
+	"""Tests version counters shared through a memory-mapped file.
+	"""
+
+	def setUp(self):
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		self.path = os.path.join(directory, 'versions')
+
+	def test_stamps_shared_by_processes(self):
+		"""Test a bump from another process is seen without remapping, and
+		bumps from both processes add up.
+		"""
+		stamps = VersionStamps(self.path)
+		self.assertEqual(stamps.get('app.Config'), 0)
+
+		# Step 1: other process bumps, this mapping sees it
+		bump_in_other_process(self.path, 'app.Config')
+		self.assertEqual(stamps.get('app.Config'), 1)
+
+		# Step 2: both processes bump the same counter
+		self.assertEqual(stamps.bump('app.Config'), 2)
+		bump_in_other_process(self.path, 'app.Config')
+		self.assertEqual(stamps.get('app.Config'), 3)
+		self.assertEqual(VersionStamps(self.path).get('app.Config'), 3)
+
+
+@isolate_apps('utils')
+class SingletonModelTests(TransactionTestCase):
+	"""Tests SingletonModel.load() cache and its invalidation, saves are
+	committed as outside tests.
+	"""
+
+	def setUp(self):
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		self.path = os.path.join(directory, 'versions')
+		override = override_settings(SINGLETON_VERSIONS_PATH=self.path)
+		override.enable()
+		self.addCleanup(override.disable)
+
+		class Config(SingletonModel):
+			value = models.IntegerField(default=0)
+
+			class Meta:
+				app_label = 'utils'
+
+		self.Config = Config
+		with connection.schema_editor() as editor:
+			editor.create_model(Config)
+		self.addCleanup(self.drop_model)
+		self.addCleanup(Config.clear_cache)
+
+	def drop_model(self):
+		with connection.schema_editor() as editor:
+			editor.delete_model(self.Config)
+
+	def test_singleton_load_cached_until_saved(self):
+		"""Test load() reads the database once, then again only after a
+		save in this process or a version bump from another process.
+		"""
+		# Step 1: first load creates the row, the next one caches it
+		self.assertEqual(self.Config.load().value, 0)
+		self.Config.load()
+		with self.assertNumQueries(0):
+			config1 = self.Config.load()
+			config2 = self.Config.load()
+		self.assertIsNot(config1, config2)
+
+		# Step 2: saving bumps the version, the new row is read once
+		config1.value = 7
+		config1.save()
+		with self.assertNumQueries(1):
+			self.assertEqual(self.Config.load().value, 7)
+
+		# Step 3: another worker saved the row (bumped the version)
+		self.Config.objects.filter(pk=1).update(value=9)
+		with self.assertNumQueries(0):
+			self.assertEqual(self.Config.load().value, 7)
+		bump_in_other_process(self.path, self.Config._meta.label)
+		with self.assertNumQueries(1):
+			self.assertEqual(self.Config.load().value, 9)
+
+	def test_singleton_not_cached_in_transaction(self):
+		"""Test rows read inside a transaction are not cached.
+		"""
+		with transaction.atomic():
+			self.Config.load()
+			with self.assertNumQueries(1):
+				self.Config.load()
+
+	def test_singleton_cache_disabled(self):
+		"""Test load() reads the database every time without versions path.
+		"""
+		with override_settings(SINGLETON_VERSIONS_PATH=None):
+			self.assertIsNone(get_version_stamps())
+			self.Config.load()
+			with self.assertNumQueries(1):
+				self.Config.load()
+
+	def test_default_versions_path(self):
+		"""Test default versions file is per user and per database.
+		"""
+		path = default_versions_path()
+		self.assertEqual(os.path.dirname(path), tempfile.gettempdir())
+		if hasattr(os, 'getuid'):
+			self.assertIn('-%d-' % os.getuid(), os.path.basename(path))
+		with mock.patch.dict(settings.DATABASES['default'], NAME='other'):
+			self.assertNotEqual(default_versions_path(), path)
+
+
+class RequestMetricsTests(TestCase, BaseTestCaseMixin):
+	"""Tests per-view request metrics, their header and scrape endpoint.
+	"""
+
+	def setUp(self):
+		request_metrics.clear()
+		self.addCleanup(request_metrics.clear)
+
+	def test_request_metrics_scraped(self):
+		"""Test a request reports its SQL in Server-Timing, and is counted
+		under its view name at /metrics.
+		"""
+		user = self.generate_ihub_user()
+		DutyManager.load().start_duty(user)
+		self.client.force_login(user)
+
+		# Step 1: header carries the statements of the whole request
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get(reverse('duties:duty-details'))
+		queries = len(ctx.captured_queries)
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('desc="%d queries"' % queries, response['Server-Timing'])
+
+		# Step 2: scrape
+		self.client.get('/no-such-page')
+		metrics = self.client.get(reverse('metrics')).content.decode()
+		self.assertIn('ihub_request_duration_seconds_count{view="duties:duty-details"} 1\n', metrics)
+		self.assertIn('ihub_request_duration_seconds_bucket{view="duties:duty-details",le="+Inf"} 1\n', metrics)
+		self.assertIn('ihub_request_sql_queries_total{view="duties:duty-details"} %d\n' % queries, metrics)
+		self.assertIn('ihub_requests_total{view="duties:duty-details",method="GET",status="200"} 1\n', metrics)
+		self.assertIn('ihub_requests_total{view="<unresolved>",method="GET",status="404"} 1\n', metrics)
+
+	def test_metrics_access(self):
+		"""Test the scrape endpoint is hidden from other addresses, and once
+		a token is set, from requests without it, staff users excepted.
+		"""
+		url = reverse('metrics')
+		self.assertEqual(self.client.get(url, REMOTE_ADDR='10.1.2.3').status_code, 404)
+
+		with override_settings(METRICS_TOKEN='s3cret'):
+			self.assertEqual(self.client.get(url).status_code, 404)
+			self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+			self.assertEqual(self.client.get(url, REMOTE_ADDR='10.1.2.3',
+				HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+			staff = self.generate_ihub_user()
+			staff.is_staff = True
+			staff.save()
+			self.client.force_login(staff)
+			self.assertEqual(self.client.get(url).status_code, 200)
+
+	def test_thread_shards_added_up(self):
+		"""Test requests recorded by several threads are all scraped, with
+		cumulative latency buckets.
+		"""
+		metrics = RequestMetrics(buckets=(0.1, 1.0))
+
+		def record():
+			for _ in range(100):
+				metrics.observe('view', 'GET', 200, 0.5, 2, 0.01)
+
+		threads = [threading.Thread(target=record) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		metrics.observe('view', 'GET', 500, 0.05, 1, 0.01)
+
+		# shards of the finished threads were retired
+		self.assertEqual(len(metrics._shards), 1)
+
+		views, requests = metrics.collect()
+		self.assertEqual(views['view'][:3], [1, 400, 0])
+		self.assertEqual(views['view'][-2], 801)
+		self.assertEqual(requests, {('view', 'GET', 200): 400, ('view', 'GET', 500): 1})
+		self.assertIn('ihub_request_duration_seconds_bucket{view="view",le="1.0"} 401\n', metrics.render())
+
+
+class RequestProfileTests(TestCase, BaseTestCaseMixin):
+	"""Tests on demand profiles of staff requests and their admin page.
+	"""
+
+	def setUp(self):
+		token_cache.clear()
+		self.addCleanup(token_cache.clear)
+		self.staff = self.generate_ihub_user()
+		self.staff.is_staff = True
+		self.staff.is_superuser = True
+		self.staff.save()
+		DutyManager.load().start_duty(self.staff)
+
+	def test_staff_request_profiled(self):
+		"""Test a staff request asking for it is profiled, and the admin
+		shows its top functions.
+		"""
+		self.client.force_login(self.staff)
+		response = self.client.get(reverse('duties:duty-details'), {'_profile': '1'})
+		self.assertEqual(response.status_code, 200)
+
+		profile = RequestProfile.objects.get(request_id=response['X-Profile-Id'])
+		self.assertEqual((profile.method, profile.status, profile.user), ('GET', 200, self.staff))
+		self.assertIn('duty_details_response', profile.top_functions(20))
+
+		page = self.client.get(response['X-Profile-Url'])
+		self.assertContains(page, 'duty_details_response')
+
+	def test_token_request_profiled_by_header(self):
+		"""Test token clients of staff users ask with the header.
+		"""
+		token, key = ApiToken.objects.issue(self.staff, "Kiosk")
+		response = self.client.get(reverse('duties:duty-details'),
+			HTTP_AUTHORIZATION='Token %s' % key, HTTP_X_PROFILE='1')
+		self.assertTrue(RequestProfile.objects.filter(request_id=response['X-Profile-Id']).exists())
+
+	def test_other_requests_not_profiled(self):
+		"""Test requests of non staff users, or without asking, are not profiled.
+		"""
+		self.client.force_login(self.generate_ihub_user())
+		response = self.client.get(reverse('duties:duty-details'), {'_profile': '1'})
+		self.assertFalse(response.has_header('X-Profile-Id'))
+
+		self.client.force_login(self.staff)
+		self.assertFalse(self.client.get(reverse('duties:duty-details')).has_header('X-Profile-Id'))
+		self.assertEqual(RequestProfile.objects.count(), 0)
+
+	@override_settings(PROFILE_MAX_STORED=2)
+	def test_stored_profiles_capped(self):
+		"""Test only the most recent profiles are kept.
+		"""
+		self.client.force_login(self.staff)
+		ids = [self.client.get(reverse('duties:duty-details'), {'_profile': '1'})['X-Profile-Id']
+			for _ in range(3)]
+		self.assertEqual(set(RequestProfile.objects.values_list('request_id', flat=True)), set(ids[1:]))
+
+
+class SQLitePragmasTests(TestCase):
+	"""Tests pragmas of the database profile run on new connections.
+	"""
+
+	def test_pragmas_on_new_connection(self):
+		"""Test a new connection runs SQLITE_PRAGMAS, outside request SQL.
+		"""
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		wrapper = connections[DEFAULT_DB_ALIAS].__class__(
+			dict(connection.settings_dict, NAME=os.path.join(directory, 'db.sqlite3')), alias='pragmas')
+		self.addCleanup(wrapper.close)
+
+		pragmas = [('journal_mode', 'wal'), ('synchronous', 'normal'), ('mmap_size', 1024 * 1024)]
+		with override_settings(SQLITE_PRAGMAS=pragmas):
+			with CaptureQueriesContext(wrapper) as ctx:
+				wrapper.ensure_connection()
+		self.assertEqual(len(ctx.captured_queries), 0)
+
+		raw = wrapper.connection
+		self.assertEqual(raw.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+		self.assertEqual(raw.execute('PRAGMA synchronous').fetchone()[0], 1)
+		self.assertEqual(raw.execute('PRAGMA mmap_size').fetchone()[0], 1024 * 1024)